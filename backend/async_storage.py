@@ -0,0 +1,48 @@
+"""
+Асинхронный доступ к хранилищу для async-эндпоинтов.
+
+Методы JSONDatabase/SQLiteDatabase синхронные (чтение и запись файлов, запросы к базе),
+поэтому они выполняются в отдельном пуле потоков хранилища. Цикл событий при этом
+не ждет диск, а медленная запись занимает только поток хранилища, а не обработку запросов.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class AsyncStorage:
+    def __init__(self, db, max_workers: int = None):
+        self.db = db
+        #Отдельный пул, чтобы операции хранилища не конкурировали с пулом потоков FastAPI
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.environ.get("DB_WORKERS", 8)),
+            thread_name_prefix="storage"
+        )
+
+    #Выполнение синхронной функции в пуле хранилища (используется и для методов auth/admin).
+    #Функция выполняется в контексте запроса (contextvars) - так до хранилища доходит трассировка запроса
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, functools.partial(context.run, func, *args, **kwargs))
+
+    #Асинхронный вариант любого публичного метода хранилища: await storage.get_ideas_page(...)
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if not callable(getattr(self.db, name)):
+            raise AttributeError(name)
+
+        async def method(*args, **kwargs):
+            #Метод берется при каждом вызове, чтобы замена self.db сразу действовала
+            return await self.run(getattr(self.db, name), *args, **kwargs)
+
+        method.__name__ = name
+        return method
+
+    #Остановка пула при завершении приложения
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -1,55 +1,113 @@
+import os
+import secrets
+import time
 from typing import Dict, Optional
+from jose import JWTError, jwt
 from database import JSONDatabase
 
+#Алгоритм подписи токенов (общий секретный ключ)
+TOKEN_ALGORITHM = "HS256"
+
+#Время жизни токена в секундах (по умолчанию 12 часов - одна смена)
+TOKEN_TTL = int(os.environ.get("AUTH_TOKEN_TTL", 12 * 60 * 60))
+
+#Секретный ключ подписи токенов: AUTH_SECRET или ключ из файла secret_file (auth_secret в папке данных).
+#Файл создается один раз (O_EXCL), поэтому все процессы сервера (uvicorn --workers N) читают один ключ
+def load_secret(secret_file: str) -> str:
+    secret = os.environ.get("AUTH_SECRET")
+    if secret:
+        return secret
+    os.makedirs(os.path.dirname(secret_file), exist_ok=True)
+    try:
+        fd = os.open(secret_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):  #Другой процесс мог создать файл, но еще не записать ключ
+            with open(secret_file, encoding="utf-8") as f:
+                secret = f.read().strip()
+            if secret:
+                return secret
+            time.sleep(0.01)
+        raise RuntimeError(f"Пустой файл ключа подписи токенов: {secret_file}")
+    secret = secrets.token_urlsafe(48)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(secret)
+    return secret
+
+#Вход выдает подписанный токен; личность пользователя в каждом запросе берется из токена,
+#поэтому сервер не хранит сессий и может работать в нескольких процессах
 class AuthSystem:
-    def __init__(self, db: JSONDatabase):
+    #secret - ключ подписи токенов; по умолчанию - из load_secret: у каждой папки данных (DB_FOLDER,
+    #папка файла DB_PATH) свой ключ, и отдельные установки сервера не принимают токены друг друга
+    def __init__(self, db: JSONDatabase, secret: str = None):
         self.db = db
-        self.current_user: Optional[Dict] = None #Текущий пользователь изначально None
+        self.secret = secret or load_secret(os.path.join(db.db_folder, "auth_secret"))
+
+    #Подписанный токен пользователя: id, логин, роль и срок действия
+    def create_token(self, user: Dict) -> str:
+        now = int(time.time())
+        claims = {"sub": str(user["id"]), "username": user["username"], "role": user["role"],
+                  "iat": now, "exp": now + TOKEN_TTL}
+        return jwt.encode(claims, self.secret, algorithm=TOKEN_ALGORITHM)
+
+    #Пользователь по токену: None, если подпись неверна, срок истек, пользователь удален или заблокирован.
+    #Роль и остальные данные берутся из базы, поэтому блокировка и смена роли действуют сразу
+    def verify_token(self, token: str) -> Optional[Dict]:
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=[TOKEN_ALGORITHM])
+            user_id = int(claims["sub"])
+        except (JWTError, KeyError, ValueError):
+            return None
+        user = self.db.get_user_by_id(user_id)
+        if user is None or not user.get("is_active", True):
+            return None
+        return self._user_info(user)
+
+    #Данные пользователя для клиента и обработчиков запросов
+    @staticmethod
+    def _user_info(user: Dict) -> Dict:
+        return {
+            "id": user["id"], #Id пользователя
+            "username": user["username"], #Логин
+            "role": user["role"], #Роль
+            "full_name": user.get("full_name", ""), #ФИО (если есть)
+            "has_completed_introduction": user.get("has_completed_introduction", False), #Ввел ли ФИО
+            #Нужно ли сменить пароль админу
+            "needs_password_change": user.get("role") == "admin" and user.get("needs_password_change", False)
+        }
 
     #Аутентификация пользователя
     def login(self, username: str, password: str) -> Dict[str, any]:
-        # Загружаем данные пользователя из файла
-        data = self.db._load_json(self.db.users_file)
-        users = data.get("users", []) # Получаем список пользователей или пустой список
-        
-        # Ищем пользователя по логину
-        user_found = False
-        for user in users:
-            if user["username"] == username:
-                user_found = True
-                
-                # ПРОВЕРКА ПАРОЛЯ - ПОДДЕРЖКА ВРЕМЕННЫХ И ХЕШИРОВАННЫХ ПАРОЛЕЙ
-                
-                # 1. Проверяем временный (открытый) пароль
-                if user.get("is_temp_password", False) and "plain_password" in user:
-                    if password == user["plain_password"]:
-                        # Автоматически хешируем пароль при успешном входе
-                        self.__hash_temp_password_on_login(user["id"], password)
-                        return self._create_login_success_response(user)
-                    else:
-                        return {"success": False, "message": "Неверный пароль. Попробуйте снова."}
-                
-                # 2. Проверяем обычный хешированный пароль
-                elif "password" in user:
-                    if self.db.verify_password(password, user["password"]):
-                        return self._create_login_success_response(user)
-                    else:
-                        return {"success": False, "message": "Неверный пароль. Попробуйте снова."}
-                
-                # 3. Если есть password_hash (альтернативное хранение)
-                elif "password_hash" in user:
-                    if self.db.verify_password(password, user["password_hash"]):
-                        return self._create_login_success_response(user)
-                    else:
-                        return {"success": False, "message": "Неверный пароль. Попробуйте снова."}
-                else:
-                    return {"success": False, "message": "Ошибка в данных пользователя. Обратитесь к администратору."}
-    
-        # Если пользователь не найден
-        if not user_found:
+        # Ищем пользователя по логину через индекс БД
+        user = self.db._get_user_record_by_username(username)
+        if user is None:
             return {"success": False, "message": "Пользователь с таким логином не найден."}
+        
+        # ПРОВЕРКА ПАРОЛЯ - ПОДДЕРЖКА ВРЕМЕННЫХ И ХЕШИРОВАННЫХ ПАРОЛЕЙ
+        
+        # 1. Проверяем временный (открытый) пароль
+        if user.get("is_temp_password", False) and "plain_password" in user:
+            if password == user["plain_password"]:
+                # Автоматически хешируем пароль при успешном входе
+                self.__hash_temp_password_on_login(user, password)
+                return self._create_login_success_response(user)
+            else:
+                return {"success": False, "message": "Неверный пароль. Попробуйте снова."}
+        
+        # 2. Проверяем обычный хешированный пароль
+        elif "password" in user:
+            if self.db.verify_password(password, user["password"]):
+                return self.__login_with_hash_upgrade(user, user["password"], password)
+            else:
+                return {"success": False, "message": "Неверный пароль. Попробуйте снова."}
+        
+        # 3. Если есть password_hash (альтернативное хранение)
+        elif "password_hash" in user:
+            if self.db.verify_password(password, user["password_hash"]):
+                return self.__login_with_hash_upgrade(user, user["password_hash"], password)
+            else:
+                return {"success": False, "message": "Неверный пароль. Попробуйте снова."}
         else:
-            return {"success": False, "message": "Неверный пароль. Попробуйте снова."}
+            return {"success": False, "message": "Ошибка в данных пользователя. Обратитесь к администратору."}
     
     #Создание успешного ответа при входе
     def _create_login_success_response(self, user: Dict) -> Dict[str, any]:
@@ -58,35 +116,25 @@ class AuthSystem:
         if not user.get("is_active", True):
             return {"success": False, "message": "Учётная запись заблокирована."}
         
-        #Проверяем, нужно ли админу сменить пароль
-        needs_password_change = (
-            user.get("role") == "admin" and user.get("needs_password_change", False)
-        )
-        
-        #Сохраняем информацию о текущем пользователе
-        self.current_user = {
-            "id": user["id"], #Id пользователя
-            "username": user["username"], #Логин
-            "role": user["role"], #Роль
-            "full_name": user.get("full_name", ""), #ФИО (если есть)
-            "has_completed_introduction": user.get("has_completed_introduction", False), #Ввел ли ФИО
-            "needs_password_change": needs_password_change #Нужно ли сменить пароль админу
-        }
+        user_info = self._user_info(user)
+        token = self.create_token(user) #Токен клиент передает в заголовке Authorization: Bearer
         
         #Если пользователь не ввел ФИО 
         if not user.get("has_completed_introduction", False) and user["role"] != "admin":
             return{
                 "success": True,
-                "user": self.current_user, #Данные пользователя
+                "user": user_info, #Данные пользователя
+                "token": token,
                 "needs_introduction": True, #Требуется ввести ФИО
                 "message": "Пожалуйста, представьтесь - укажите ФИО."
             }
         
         #Если админу нужно сменить пароль
-        if needs_password_change:
+        if user_info["needs_password_change"]:
             return{
                 "success": True,
-                "user": self.current_user, #Данные пользователя
+                "user": user_info, #Данные пользователя
+                "token": token,
                 "needs_password_change": True, #Требуется смена пароля
                 "message": "Пожалуйста, смените пароль для администратора."
             }
@@ -94,48 +142,39 @@ class AuthSystem:
         #Успешный вход без доп требований
         return{
             "success": True,
-            "user": self.current_user, #Данные пользователя
+            "user": user_info, #Данные пользователя
+            "token": token,
             "needs_introduction": False, #ФИО введено
             "needs_password_change": False, #Смена пароля не нужна
             "message": "Добро пожаловать!"
         }
     
+    #Успешный вход по хешу; устаревший хеш (старый формат или другая стоимость bcrypt) пересчитывается,
+    #пока открытый пароль известен. Ошибка пересчета не мешает входу - попробуем при следующем
+    def __login_with_hash_upgrade(self, user: Dict, stored_hash: str, plain_password: str) -> Dict[str, any]:
+        response = self._create_login_success_response(user)
+        if response["success"] and self.db.hasher.needs_update(stored_hash):
+            try:
+                new_hash = self.db.hash_password(plain_password)
+                self.db.upgrade_password_hash(user["id"], stored_hash, new_hash)
+            except Exception as e:
+                print(f"Ошибка при обновлении хеша пароля: {e}")
+        return response
+
     #Хеширование временного пароля при входе
-    def __hash_temp_password_on_login(self, user_id: int, plain_password: str) -> None:
+    def __hash_temp_password_on_login(self, user: Dict, plain_password: str) -> None:
         """Автоматическое хеширование временного пароля при первом входе пользователя"""
         try:
-            # Загружаем данные
-            data = self.db._load_json(self.db.users_file)
-            
-            # Находим пользователя
-            for user in data.get("users", []):
-                if user["id"] == user_id and user.get("is_temp_password", False):
-                    # Хешируем пароль
-                    password_hash = self.db.hash_password(plain_password)
-                    
-                    # Обновляем данные пользователя
-                    user["password"] = password_hash
-                    user["password_hash"] = password_hash
-                    
-                    # Удаляем открытый пароль
-                    if "plain_password" in user:
-                        del user["plain_password"]
-                    
-                    # Снимаем флаг временного пароля
-                    user["is_temp_password"] = False
-                    
-                    # Сохраняем изменения
-                    self.db._save_json(self.db.users_file, data)
-                    print(f"Пароль пользователя {user['username']} автоматически захеширован")
-                    break
-                    
+            # Хешируем пароль и удаляем открытый пароль в БД
+            if self.db.confirm_temp_password(user["id"], plain_password):
+                print(f"Пароль пользователя {user['username']} автоматически захеширован")
         except Exception as e:
             print(f"Ошибка при автоматическом хешировании пароля: {e}")
     
-    #Ввод ФИО
-    def complete_introduction(self, full_name: str) -> Dict[str, any]:
+    #Ввод ФИО (user - пользователь из токена запроса)
+    def complete_introduction(self, user: Dict, full_name: str) -> Dict[str, any]:
         #Проверяем, что пользователь вошел в систему
-        if not self.current_user:
+        if not user:
             return{"success": False, "message": "Вы не вошли в систему."}
         
         #Проверяем, что ФИО уже есть
@@ -143,32 +182,31 @@ class AuthSystem:
             return{"success": False, "message": "ФИО не может быть пустым."}
         
         #Сохраняем ФИО в БД
-        result = self.db.complete_user_introduction(self.current_user["id"], full_name)
+        result = self.db.complete_user_introduction(user["id"], full_name)
         if not result["success"]:
             return result #Возвращаем ошибку из БД
         
-        #Обновляем данные текущего пользователя
-        self.current_user["full_name"] = full_name.strip() #Сохраняем ФИО
-        self.current_user["has_completed_introduction"] = True #Отмечаем, что ФИО введено
+        #Возвращаем обновленные данные пользователя
+        user = {**user, "full_name": full_name.strip(), "has_completed_introduction": True}
         return {
             "success": True,
             "message": "Спасибо за представление!",
-            "user": self.current_user #Возвращаем обновленные данные пользователя
+            "user": user #Возвращаем обновленные данные пользователя
         }
     
     #Смена пароля админа
-    def change_admin_password(self, current_password: str, new_password: str) -> Dict[str, any]:
+    def change_admin_password(self, user: Dict, current_password: str, new_password: str) -> Dict[str, any]:
         #Проверяем, что пользователь вошел в систему
-        if not self.current_user:
+        if not user:
             return{"success": False, "message": "Вы не вошли в систему."}
         
         #Проверяем, что пользователь админ
-        if self.current_user.get("role") != "admin":
+        if user.get("role") != "admin":
             return{"success": False, "message": "Доступ запрещён. Требуются права администратора."}
         
         #Вызываем метод БД для смены пароля
         result = self.db.change_admin_password(
-            self.current_user["id"], #Id пользователя
+            user["id"], #Id пользователя
             current_password, #Текущий пароль
             new_password #Новый пароль
         )
@@ -177,39 +215,31 @@ class AuthSystem:
         if not result["success"]:
             return result #Возвращаем ошибку из БД
         
-        #Обновляем состояние текущего пользователя
-        self.current_user["needs_password_change"] = False #Снимаем флаг смены пароля
         return {
             "success": True,
             "message": "Пароль успешно изменён!",
-            "user": self.current_user #Возвращаем обновленные данные пользователя
+            "user": {**user, "needs_password_change": False} #Возвращаем обновленные данные пользователя
         }
     
-    #Выход из системы
-    def logout(self) -> Dict[str, any]:
+    #Выход из системы: сессий на сервере нет, клиент просто удаляет свой токен
+    def logout(self, user: Dict) -> Dict[str, any]:
         #Проверяем, что пользователь вошел в систему
-        if not self.current_user:
+        if not user:
             return{"success": False, "message": "Вы не вошли в систему."}
-        
-        #Сбрасываем текущего пользователя
-        self.current_user = None
         return{"success": True, "message": "Вы успешно вышли."}
     
-    #Получение данных текущего пользователя
-    def get_current_user(self) -> Optional[Dict]:
-        return self.current_user #Возвращаем данные пользователя или None
-    
-    #Проверка, является ли текущий пользователь админом
-    def is_admin(self) -> bool:
+    #Проверка, является ли пользователь админом
+    @staticmethod
+    def is_admin(user: Optional[Dict]) -> bool:
         #Проверяем, что пользователь существует и его роль админ
-        return bool(self.current_user and self.current_user.get("role") == "admin")
+        return bool(user and user.get("role") == "admin")
     
     #Регистрация нового пользователя (только для админа)
-    def register(self, username: str, password: str, role: str = "user") -> Dict[str, any]:
+    def register(self, user: Dict, username: str, password: str, role: str = "user") -> Dict[str, any]:
         #Проверяем, что текущий пользователь админ
-        if not self.is_admin():
+        if not self.is_admin(user):
             return{"success": False, "message": "Требуются права администратора."}
         
         #Создаём пользователя через БД
         result = self.db.create_user(username, password, role)
-        return result #Возвращаем результат создания пользователя
\ No newline at end of file
+        return result #Возвращаем результат создания пользователя
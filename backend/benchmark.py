@@ -0,0 +1,197 @@
+"""
+Замеры скорости операций JSONDatabase на больших объемах данных.
+
+Для каждого размера (число идей) во временной папке создаются данные: пользователи, идеи,
+голоса (распределяются по идеям поровну) и комментарии, после чего замеряются основные
+операции хранилища и вход. Результаты пишутся в JSON (--output); если указан --baseline,
+выводится сравнение с сохраненными ранее результатами. Запуск из папки backend:
+    python benchmark.py [--ideas 1000,10000,100000] [--users 10000] [--votes 1000000]
+                        [--repeat 5] [--journal] [--rounds 12]
+                        [--output bench.json] [--baseline bench_base.json] [--fail-over 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+from auth import AuthSystem
+from database import JSONDatabase
+from passwords import DEFAULT_ROUNDS, PasswordHasher
+import serialization
+
+CATEGORIES = ["IT", "Документооборот", "Производство", "HR"]
+
+#Пользователь для замера входа (создается при заполнении, пароль известен)
+LOGIN_USER = ("bench_login", "bench-password")
+
+
+#Заполнение папки данными заданного объема. Файлы пишутся напрямую, одним сохранением каждый:
+#через методы хранилища 1М голосов создавались бы часами
+def seed(folder: str, ideas_count: int, users_count: int, votes_count: int, comments_count: int,
+         hasher: PasswordHasher) -> None:
+    rng = random.Random(ideas_count) #Одинаковые данные при каждом запуске
+    now = datetime.now().isoformat()
+    password_hash = hasher.hash(LOGIN_USER[1]) #Один хеш на всех: хеширование не входит в замер
+    users = [{
+        "id": 1, "username": "1QsMeP23", "password": password_hash, "role": "admin", "is_active": True,
+        "full_name": "Администратор", "has_completed_introduction": True, "needs_password_change": False,
+        "created_at": now,
+    }]
+    for user_id in range(2, users_count + 2):
+        users.append({
+            "id": user_id, "username": LOGIN_USER[0] if user_id == 2 else f"user{user_id}",
+            "password": password_hash, "role": "user", "is_active": True, "full_name": f"Сотрудник {user_id}",
+            "has_completed_introduction": True, "needs_password_change": False, "created_at": now,
+        })
+    voter_ids = range(2, users_count + 2)
+    per_idea = min(votes_count // max(1, ideas_count), users_count) #Голосов на одну идею
+    ideas = []
+    for idea_id in range(1, ideas_count + 1):
+        voted = rng.sample(voter_ids, per_idea)
+        votes_for = sum(1 for user_id in voted if user_id % 3)
+        ideas.append({
+            "id": idea_id, "title": f"Идея {idea_id}", "short_description": "Краткое описание идеи",
+            "full_description": "Полное описание идеи " * 10, "expected_effect": "Экономия времени",
+            "author_id": rng.choice(voter_ids), "category": CATEGORIES[idea_id % len(CATEGORIES)],
+            "is_hidden": idea_id % 50 == 0, "is_approved": idea_id % 3 == 0,
+            "votes_for": votes_for, "votes_against": per_idea - votes_for, "voted_users": voted,
+            "created_at": now,
+        })
+    comments = [{
+        "id": comment_id, "idea_id": rng.randint(1, ideas_count), "user_id": rng.choice(voter_ids),
+        "text": f"Комментарий {comment_id}", "created_at": now,
+    } for comment_id in range(1, comments_count + 1)]
+    files = {
+        "users.json": {"users": users, "last_user_id": users_count + 1},
+        "ideas.json": {"ideas": ideas, "last_idea_id": ideas_count},
+        "comments.json": {"comments": comments, "last_comment_id": comments_count},
+        "app_config.json": {"categories": list(CATEGORIES),
+                            "settings": {"default_comments_enabled": True, "items_per_page": 20}},
+    }
+    for name, data in files.items():
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(serialization.dumps(data)) #Тот же формат, что у _save_json
+
+
+#Замер операции: func(i) вызывается repeat раз (i - номер вызова, для уникальных аргументов)
+def measure(func: Callable[[int], object], repeat: int) -> Dict[str, float]:
+    times = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        func(i)
+        times.append(time.perf_counter() - started)
+    return {
+        "runs": repeat,
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "min_ms": round(min(times) * 1000, 3),
+        "max_ms": round(max(times) * 1000, 3),
+    }
+
+
+#Замеры для одного размера данных; возвращает {операция: результат}
+def run_size(ideas_count: int, args) -> Dict[str, Dict[str, float]]:
+    folder = tempfile.mkdtemp(prefix="benchmark_")
+    try:
+        hasher = PasswordHasher(max_workers=0, rounds=args.rounds) #Хеширование в этом же процессе
+        seed(folder, ideas_count, args.users, args.votes, args.comments, hasher)
+        db = JSONDatabase(folder, journal=args.journal, hasher=hasher)
+        auth = AuthSystem(db, secret="benchmark")
+        repeat = args.repeat
+        rng = random.Random(0)
+        results = {}
+
+        def cold_load(i):
+            db._cache.clear() #Сбрасываем кэш: замер разбора файла с диска
+            db._indexes.clear()
+            db.get_all_ideas()
+
+        results["load_ideas_cold"] = measure(cold_load, repeat)
+        results["get_all_ideas"] = measure(lambda i: db.get_all_ideas(), repeat)
+        results["get_idea_by_id"] = measure(lambda i: db.get_idea_by_id(rng.randint(1, ideas_count)), max(repeat, 100))
+        #Голосуют пользователи, которых нет среди проголосовавших (id больше сгенерированных)
+        voter_base = args.users + 100
+        results["vote_for_idea"] = measure(
+            lambda i: db.vote_for_idea(rng.randint(1, ideas_count), voter_base + i, "for"), repeat
+        )
+        results["add_comment"] = measure(lambda i: db.add_comment(rng.randint(1, ideas_count), 2, f"Замер {i}"), repeat)
+        results["create_user"] = measure(lambda i: db.create_user(f"bench_new_{i}", "password"), repeat)
+        results["login"] = measure(lambda i: auth.login(*LOGIN_USER), repeat)
+        results["update_category"] = measure(
+            lambda i: db.update_category(*(("IT", "IT-2") if i % 2 == 0 else ("IT-2", "IT"))), repeat
+        )
+        results["delete_user"] = measure(lambda i: db.delete_user(3 + i), repeat) #Идеи пользователя удаляются вместе с ним
+        return results
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+#Сравнение с базовыми результатами: строки таблицы и список операций, замедлившихся больше порога
+def compare(current: Dict, baseline: Dict, threshold: float) -> tuple:
+    lines, regressions = [], []
+    for size, operations in current["results"].items():
+        base_operations = baseline.get("results", {}).get(size, {})
+        for name, result in operations.items():
+            base = base_operations.get(name)
+            if base is None or not base["median_ms"]:
+                lines.append(f"{size:>14} {name:<18} {result['median_ms']:>12.3f} {'-':>12} {'новая':>9}")
+                continue
+            change = result["median_ms"] / base["median_ms"] - 1
+            lines.append(f"{size:>14} {name:<18} {result['median_ms']:>12.3f} {base['median_ms']:>12.3f} {change:>+9.1%}")
+            if threshold is not None and change > threshold:
+                regressions.append(f"{size} {name}: {change:+.1%}")
+    return lines, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры скорости операций JSONDatabase")
+    parser.add_argument("--ideas", default="1000,10000,100000", help="размеры через запятую (число идей)")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--votes", type=int, default=1000000, help="всего голосов на все идеи")
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5, help="повторов каждой операции")
+    parser.add_argument("--journal", action="store_true", help="режим журнала JSONDatabase")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="стоимость bcrypt для входа и создания")
+    parser.add_argument("--output", help="файл для результатов (JSON)")
+    parser.add_argument("--baseline", help="файл с базовыми результатами для сравнения")
+    parser.add_argument("--fail-over", type=float, default=None,
+                        help="код выхода 1, если операция медленнее базовой больше чем на долю (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(), "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "journal": args.journal,
+            "users": args.users, "votes": args.votes, "comments": args.comments, "repeat": args.repeat,
+            "rounds": args.rounds,
+        },
+        "results": {},
+    }
+    for ideas_count in [int(size) for size in args.ideas.split(",")]:
+        print(f"Идей: {ideas_count}...", file=sys.stderr)
+        report["results"][f"ideas={ideas_count}"] = run_size(ideas_count, args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    lines, regressions = compare(report, baseline, args.fail_over)
+    print(f"{'размер':>14} {'операция':<18} {'медиана, мс':>12} {'база, мс':>12} {'изменение':>9}")
+    for line in lines:
+        print(line)
+    if regressions:
+        print("Замедление больше допустимого:")
+        for regression in regressions:
+            print(" -", regression)
+        sys.exit(1)
@@ -1,47 +1,605 @@
+import base64
+import bisect
+import functools
 import json
+import math
 import os
+import shutil
+import tempfile
+import time
+import zlib
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional
+
+from interprocess import FileLock, SharedCounters
+from passwords import PasswordHasher, get_hasher
+from search import SearchIndex
+import serialization
+
+#Курсор страницы - ключ сортировки последней отданной записи, упакованный в непрозрачную строку
+def encode_cursor(key: tuple) -> str:
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Неверный курсор страницы")
+    if not isinstance(key, list) or not key:
+        raise ValueError("Неверный курсор страницы")
+    return tuple(key)
+
+#Курсор результатов поиска - [оценка, id] последнего результата страницы
+def decode_search_cursor(cursor: Optional[str]) -> Optional[list]:
+    if not cursor:
+        return None
+    after = list(decode_cursor(cursor))
+    if len(after) != 2 or not all(isinstance(value, (int, float)) for value in after):
+        raise ValueError("Неверный курсор страницы")
+    return after
+
+#Порядок выдачи идей для фильтров списка: фильтр -> (ключ сортировки, по убыванию)
+#Ключ всегда заканчивается id (или -id), поэтому он уникален и годится для постраничного вывода курсором
+IDEA_ORDERS = {
+    "new": (lambda idea: (idea["created_at"], idea["id"]), True),  #Новые первые
+    #Популярные первые, при равном рейтинге - более ранние (как при устойчивой сортировке по рейтингу)
+    "popular": (lambda idea: (idea["votes_for"] - idea["votes_against"], -idea["id"]), True),
+}
+DEFAULT_IDEA_ORDER = (lambda idea: (idea["id"],), False)  #В порядке создания
+
+#Поля краткого представления идеи для карточек списка (вместо voted_users - флаг has_voted)
+SUMMARY_FIELDS = ("id", "title", "short_description", "category", "author_id", "created_at",
+                  "votes_for", "votes_against", "is_approved", "is_hidden", "comment_count")
+
+#Проекция идеи для ответа списка: краткое представление (summary) и/или только поля из fields.
+#comment_count (число комментариев из хранилища комментариев) и has_voted вычисляются,
+#has_voted - только если передан user_id
+def project_idea(idea: Dict, summary: bool = False, user_id: Optional[int] = None,
+                 fields: Optional[List[str]] = None, voted: Optional[set] = None,
+                 comment_count: Optional[int] = None) -> Dict:
+    wanted = list(fields) if fields else list(SUMMARY_FIELDS if summary else idea.keys())
+    if comment_count is not None and not fields and not summary:
+        wanted.append("comment_count")
+    if user_id is not None and not fields:
+        wanted.append("has_voted")
+    if summary and fields:
+        wanted = [field for field in wanted if field in SUMMARY_FIELDS or field == "has_voted"]
+    result = {}
+    for field in wanted:
+        if field == "comment_count":
+            result[field] = comment_count if comment_count is not None else len(idea.get("comments", []))
+        elif field == "has_voted":
+            if user_id is not None:
+                result[field] = user_id in (voted if voted is not None else idea.get("voted_users", []))
+        elif field in idea:
+            result[field] = idea[field]
+    return result
+
+#Копии идей с информацией об авторе (author_info), users - словарь id -> пользователь
+def attach_authors(ideas: List[Dict], users: Dict[int, Dict]) -> List[Dict]:
+    result = []
+    for idea in ideas:
+        author = users.get(idea.get("author_id"))
+        if author:
+            idea = {**idea}  #Копия, чтобы не изменять кэшированные данные БД
+            idea["author_info"] = {
+                "id": author["id"],
+                "username": author.get("username", ""),
+                "full_name": author.get("full_name", ""),
+                "role": author.get("role", "user")
+            }
+        result.append(idea)
+    return result
+
+#Действия массовой модерации: действие -> (поле идеи, новое значение, событие для клиентов)
+MODERATION_ACTIONS = {
+    "approve": ("is_approved", True, "idea_approved"),
+    "hide": ("is_hidden", True, "idea_hidden"),
+    "unhide": ("is_hidden", False, "idea_unhidden"),
+}
+
+#Упорядоченные представления идей, которые поддерживаются индексом: имя -> ключ сортировки.
+#Представление - отсортированный по возрастанию список пар (ключ, id идеи)
+IDEA_VIEWS = {
+    "all": DEFAULT_IDEA_ORDER[0],  #Все идеи, включая скрытые (для админа)
+    "visible": DEFAULT_IDEA_ORDER[0],  #Все видимые идеи
+    "new": IDEA_ORDERS["new"][0],
+    "popular": IDEA_ORDERS["popular"][0],
+    "approved": DEFAULT_IDEA_ORDER[0],  #Видимые одобренные
+    "open": DEFAULT_IDEA_ORDER[0],  #Видимые открытые для обсуждения
+}
+
+#Элементы представлений, в которые входит идея: имя представления -> (ключ, id)
+def idea_view_entries(idea: Dict) -> Dict[str, tuple]:
+    names = ["all"]
+    if not idea["is_hidden"]:
+        names += ["visible", "new", "popular", "approved" if idea["is_approved"] else "open"]
+    return {name: (IDEA_VIEWS[name](idea), idea["id"]) for name in names}
+
+#Вид значения ключа сортировки: числа и строки сравниваются только между собой
+def _key_kind(value) -> Optional[str]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return "number"
+    return "str" if isinstance(value, str) else None
+
+#Ключ сортировки из курсора; sample - любой ключ того же порядка сортировки (None - список пуст).
+#Курсор другого порядка (другая длина или виды значений) - ошибка, а не произвольная страница
+def cursor_key(cursor: str, sample: Optional[tuple]) -> tuple:
+    after = decode_cursor(cursor)
+    kinds = [_key_kind(value) for value in after]
+    if None in kinds or (sample is not None and kinds != [_key_kind(value) for value in sample]):
+        raise ValueError("Неверный курсор страницы")
+    return after
+
+#Страница представления: элементы строго после курсора в порядке выдачи (по убыванию ключа при reverse)
+def take_view_page(view: List[tuple], limit: Optional[int], cursor: Optional[str], reverse: bool) -> tuple:
+    if cursor:
+        after = cursor_key(cursor, view[0][0] if view else None)
+        #(after,) меньше любого (after, id), (after, inf) - больше
+        position = bisect.bisect_left(view, (after,) if reverse else (after, math.inf))
+    else:
+        position = len(view) if reverse else 0
+    if reverse:
+        start = 0 if limit is None else max(0, position - limit)
+        entries, has_more = view[start:position][::-1], start > 0
+    else:
+        end = len(view) if limit is None else position + limit
+        entries, has_more = view[position:end], end < len(view)
+    next_cursor = encode_cursor(entries[-1][0]) if limit is not None and has_more and entries else None
+    return entries, next_cursor
+
+#Выбор страницы из отсортированных пар (ключ, запись): записи строго после курсора, не больше limit
+def take_page(keyed: List[tuple], limit: Optional[int], cursor: Optional[str], reverse: bool) -> tuple:
+    if cursor:
+        after = cursor_key(cursor, keyed[0][0] if keyed else None)
+        keyed = [item for item in keyed if (item[0] < after if reverse else item[0] > after)]
+    if limit is None:
+        return [record for _, record in keyed], None  #Без ограничения - весь список
+    page = keyed[:limit]
+    next_cursor = encode_cursor(page[-1][0]) if len(keyed) > limit else None
+    return [record for _, record in page], next_cursor
+
+#Декоратор для методов, изменяющих данные: метод целиком выполняется под блокировками указанных файлов,
+#поэтому цикл "загрузка -> изменение -> сохранение" не может перемешаться с другим потоком
+def _writes(*file_attrs: str):
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self._write_lock(*(getattr(self, attr) for attr in file_attrs)):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
 
 class JSONDatabase:
-    def __init__(self, db_folder: str = None):
+    #journal=True включает режим журнала: изменения идей дописываются компактными записями в ideas.journal,
+    #а полный снимок ideas.json перезаписывается раз в journal_compact_every записей
+    #Комментарии хранятся отдельно от идей в comments.json (в режиме журнала - тоже с журналом comments.journal)
+    #events - шина событий (events.EventBus), в которую публикуются изменения идей для живого обновления клиентов
+    #hasher - хешер паролей (passwords.PasswordHasher); по умолчанию общий хешер процесса
+    #metrics - метрики (metrics.Metrics), в которые записываются чтения и записи файлов
+    #pretty=True - файлы с отступами, удобные для чтения (больше и медленнее); по умолчанию компактный JSON
+    def __init__(self, db_folder: str = None, journal: bool = False, journal_compact_every: int = 1000, events=None,
+                 hasher: PasswordHasher = None, metrics=None, pretty: bool = False):
         base_dir = os.path.dirname(os.path.abspath(__file__)) #Абсолютный путь к текущему файлу
         self.db_folder = db_folder or os.path.join(base_dir, "data") #Папка для хранения данных
         os.makedirs(self.db_folder, exist_ok=True) #Создание папки, если она не существует
         self.users_file = os.path.join(self.db_folder, "users.json") #Файл пользователей
         self.ideas_file = os.path.join(self.db_folder, "ideas.json") #Файл идей
+        self.comments_file = os.path.join(self.db_folder, "comments.json") #Файл комментариев
         self.config_file = os.path.join(self.db_folder, "app_config.json") #Файл с конфигурацией
+        #Кэш разобранных файлов: путь -> {"version": общий счетчик, "stamp": отметка на диске, "data": данные}
+        self._cache: Dict[str, Dict] = {}
+        self._indexes: Dict[str, Dict] = {} #Индексы по ключам для каждого файла: путь -> {"data": данные, индексы...}
+        self.journal_compact_every = journal_compact_every #Через сколько записей журнала делать снимок
+        self._journaled_files = {self.ideas_file, self.comments_file} if journal else set() #Файлы, изменения которых пишутся в журнал
+        self._journal_sizes: Dict[str, int] = {} #Количество записей в журнале каждого файла
+        #Блокировки файлов (между потоками и между процессами, см. interprocess.py);
+        #несколько блокировок всегда берутся в порядке этого списка, чтобы избежать взаимоблокировок
+        self._lock_order = [self.users_file, self.ideas_file, self.comments_file, self.config_file]
+        self._locks = {file_path: FileLock(os.path.splitext(file_path)[0] + ".lock") for file_path in self._lock_order}
+        #Версии файлов - общие счетчики всех процессов, работающих с папкой данных: запись увеличивает
+        #счетчик, и другие процессы перечитывают файл (кэш) и меняют ETag
+        self._data_files = {"users": self.users_file, "ideas": self.ideas_file,
+                            "comments": self.comments_file, "config": self.config_file}
+        self._version_slots = {file_path: slot for slot, file_path in enumerate(self._lock_order)}
+        self._versions = SharedCounters(os.path.join(self.db_folder, "data.version"), len(self._lock_order))
+        self.instance_id = self._versions.epoch
+        self.events = events
+        self.hasher = hasher or get_hasher()
+        self.metrics = metrics
+        self.pretty = pretty
         self.__init__files() #Инициализация файлов (создание их, если нет)
 
-    #Метод для хеширования пароля
-    @staticmethod
-    def hash_password(password: str) -> str:
-        hash_value = 0
-        #Проходим по каждому символу пароля
-        for char in password:
-            #Простой алгоритм хеширования
-            hash_value = (hash_value * 31 + ord(char)) & 0xFFFFFFFF
-        return hex(hash_value)[2:].zfill(8) #Возвращаем 8-значное шестнадцатиричное число
+    #Хеширование пароля (bcrypt в пуле процессов хешера); rounds=None - стоимость по умолчанию
+    def hash_password(self, password: str, rounds: int = None) -> str:
+        return self.hasher.hash(password, rounds)
     
-    #Метод для проверки пароля
+    #Метод для проверки пароля (поддерживаются и старые 8-значные хеши)
+    def verify_password(self, password: str, hashed_password: str) -> bool:
+        return self.hasher.verify(password, hashed_password)
+
+    #Отметка состояния файла на диске (inode, время изменения и размер) для проверки актуальности кэша.
+    #Файлы сохраняются заменой (rename), поэтому каждое сохранение дает новый inode
     @staticmethod
-    def verify_password(password: str, hashed_password: str) -> bool:
-        return JSONDatabase.hash_password(password) == hashed_password #Хешируем введенный пароль и сравниваем с сохраненным хешем
-    
-    #Метод для сохранения данных в json
+    def _file_stamp(file_path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None #Файла нет
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    #Захват блокировок файлов для записи (в фиксированном порядке): потоки этого процесса и другие процессы.
+    #Изменения применяются к кэшу до записи на диск; если запись не удалась (диск заполнен, нет прав)
+    #или метод прервался ошибкой, кэш и индексы этих файлов сбрасываются - следующее чтение загрузит
+    #с диска то, что действительно сохранено, а не изменения, которых там нет
+    @contextmanager
+    def _write_lock(self, *file_paths: str):
+        with ExitStack() as stack:
+            for file_path in sorted(set(file_paths), key=self._lock_order.index):
+                stack.enter_context(self._locks[file_path])
+            try:
+                yield
+            except BaseException:
+                for file_path in file_paths:
+                    self._discard_cache(file_path)
+                raise
+
+    #Сброс кэша и индексов файла (под блокировкой записи)
+    def _discard_cache(self, file_path: str):
+        self._cache.pop(file_path, None)
+        self._indexes.pop(file_path, None)
+
+    #Путь к журналу изменений файла данных (ideas.json -> ideas.journal)
+    @staticmethod
+    def _journal_path(file_path: str) -> str:
+        return os.path.splitext(file_path)[0] + ".journal"
+
+    #Отметка состояния данных: для файлов с журналом учитывается и сам журнал
+    def _data_stamp(self, file_path: str) -> Optional[tuple]:
+        stamp = self._file_stamp(file_path)
+        if stamp is None or file_path not in self._journaled_files:
+            return stamp
+        return stamp + (self._file_stamp(self._journal_path(file_path)),)
+
+    #Текущая версия файла из общих счетчиков (чтение без блокировок)
+    def _version(self, file_path: str) -> int:
+        return self._versions.get(self._version_slots[file_path])
+
+    #Атомарная запись файла: временный файл рядом и замена (rename). Читатели - в том числе
+    #в других процессах и без блокировок - видят либо старый, либо новый файл целиком
+    @staticmethod
+    def _replace_file(file_path: str, content: bytes):
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno()) #Данные на диске до замены: после сбоя не останется пустого файла
+        os.replace(temp_path, file_path)
+
+    #Метод для сохранения данных в json (вызывается под блокировкой записи файла)
+    #Для файлов с журналом это полный снимок: после записи журнал заменяется пустым
     def _save_json(self, file_path: str, data: Dict):
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2) #Сохраняем с отступами
+        started = time.perf_counter()
+        content = serialization.dumps(data, pretty=self.pretty) #Компактный JSON (с отступами при pretty)
+        serialized = time.perf_counter()
+        self._replace_file(file_path, content)
+        if self.metrics is not None:
+            self.metrics.storage_write(file_path, "snapshot", len(content),
+                                       serialized - started, time.perf_counter() - serialized)
+        entry = {"data": data}
+        if file_path in self._journaled_files:
+            #Сначала снимок, затем журнал: читатель, прочитавший журнал до снимка, не пропустит записей
+            self._replace_file(self._journal_path(file_path), b"") #Все записи журнала уже в снимке
+            self._journal_sizes[file_path] = 0
+            entry.update(snapshot=self._file_stamp(file_path), journal=self._file_stamp(self._journal_path(file_path))[0],
+                         offset=0)
+        #Обновляем кэш сразу после записи, чтобы следующее чтение не разбирало файл заново
+        self._bump_version(file_path, entry)
     
+    #Публикация события об изменении (вызывается после записи, под блокировкой файла - порядок событий
+    #совпадает с порядком изменений)
+    def _publish(self, event_type: str, **data):
+        if self.events is not None:
+            self.events.publish(event_type, **data)
+
+    #Новая версия данных файла после записи (под блокировкой записи): кэши других процессов устаревают
+    #Запись кэша заменяется целиком: читатели без блокировки не видят ее заполненной наполовину
+    def _bump_version(self, file_path: str, entry: Dict = None):
+        entry = dict(entry if entry is not None else self._cache[file_path])
+        entry["version"] = self._versions.increment(self._version_slots[file_path])
+        entry["stamp"] = self._data_stamp(file_path)
+        self._cache[file_path] = entry
+
+    #Версия данных для ETag, например data_version("ideas", "users"). Файлы не читаются и блокировки
+    #не берутся: версия - общий счетчик записей и отметка файла на диске (изменение файла в обход
+    #хранилища тоже меняет ETag). Одинакова во всех процессах сервера
+    def data_version(self, *names: str) -> str:
+        versions = []
+        for name in names:
+            file_path = self._data_files[name]
+            stamp = zlib.crc32(repr(self._data_stamp(file_path)).encode("ascii"))
+            versions.append(f"{self._version(file_path)}-{stamp:x}")
+        return self.instance_id + "." + ".".join(versions)
+
     #Метод для загрузки  данных из json
+    #Возвращает общий объект из кэша: методы чтения не должны изменять его без последующего _save_json
     def _load_json(self, file_path: str) -> Dict:
+        version = self._version(file_path)
+        stamp = self._data_stamp(file_path)
+        cached = self._cache.get(file_path)
+        if cached is not None and stamp is not None and cached["version"] == version and cached["stamp"] == stamp:
+            if self.metrics is not None:
+                self.metrics.storage_load(file_path, True)
+            return cached["data"] #Файл не менялся - отдаем данные из кэша
+        #Файлы заменяются атомарно, поэтому перечитывать можно без блокировки других процессов;
+        #блокировка потоков - чтобы один файл не разбирали одновременно несколько потоков
+        with self._locks[file_path].thread_lock:
+            return self._reload_json(file_path)
+
+    #Разбор файла с диска и обновление кэша (вызывается под блокировкой потоков файла)
+    def _reload_json(self, file_path: str) -> Dict:
+        version = self._version(file_path) #Версия читается до данных: данные будут не старее нее
+        stamp = self._data_stamp(file_path)
+        cached = self._cache.get(file_path)
+        if self.metrics is not None:
+            self.metrics.storage_load(file_path, cached is not None and cached["version"] == version
+                                      and cached["stamp"] == stamp)
+        if cached is not None and stamp is not None and cached["version"] == version and cached["stamp"] == stamp:
+            return cached["data"] #Другой поток уже перечитал файл, пока мы ждали блокировку
+        if file_path in self._journaled_files:
+            if cached is not None and self._replay_new_records(file_path, cached):
+                cached.update(version=version, stamp=stamp)
+                return cached["data"] #Изменился только журнал - применили новые записи
+            #Журнал читается до снимка: если снимок успеют заменить, новый снимок уже содержит эти записи
+            journal, records, offset = self._read_journal(file_path)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f) #Загружаем Json данные
+            started = time.perf_counter()
+            with open(file_path, 'rb') as f:
+                snapshot = os.fstat(f.fileno())
+                content = f.read()
+            read = time.perf_counter()
+            data = serialization.loads(content) #Загружаем Json данные
+            if self.metrics is not None:
+                self.metrics.storage_read(file_path, len(content), read - started, time.perf_counter() - read)
         except:
+            self._cache.pop(file_path, None) #Сбрасываем устаревший кэш
             return{} #Есои нет файла или ошибка, то возвращаем пустой словарь
+        entry = {"version": version, "stamp": stamp, "data": data}
+        if file_path in self._journaled_files:
+            self._replay_journal(file_path, data, records) #Досчитываем изменения, записанные после снимка
+            entry.update(snapshot=(snapshot.st_ino, snapshot.st_mtime_ns, snapshot.st_size), journal=journal,
+                         offset=offset)
+        self._cache[file_path] = entry
+        return data
+
+    #Полные записи журнала начиная с offset: (inode журнала, записи, смещение после последней записи).
+    #Чтение останавливается на недописанной записи (сбой или запись другого процесса в процессе)
+    def _read_journal(self, file_path: str, offset: int = 0) -> tuple:
+        started = time.perf_counter()
+        try:
+            with open(self._journal_path(file_path), 'rb') as f:
+                journal = os.fstat(f.fileno()).st_ino
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return None, [], 0 #Журнала еще нет
+        read = time.perf_counter()
+        records = []
+        for line in chunk.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(serialization.loads(line))
+            except serialization.DecodeError:
+                break
+            offset += len(line)
+        if self.metrics is not None and chunk:
+            self.metrics.storage_read(self._journal_path(file_path), len(chunk), read - started,
+                                      time.perf_counter() - read)
+        return journal, records, offset
+
+    #Дочитывание журнала в кэшированные данные, если с прошлого чтения в него только дописывали.
+    #False - снимок или журнал заменены (другой процесс свернул журнал), нужна полная загрузка
+    def _replay_new_records(self, file_path: str, cached: Dict) -> bool:
+        journal, records, offset = self._read_journal(file_path, cached["offset"])
+        #Снимок проверяется после чтения журнала: замена снимка всегда предшествует замене журнала
+        if journal != cached["journal"] or self._file_stamp(file_path) != cached["snapshot"]:
+            return False
+        if records:
+            data, index = cached["data"], self._indexes.get(file_path)
+            if index is None or index["data"] is not data:
+                index = self._indexes[file_path] = self._build_index(file_path, data)
+            self._apply_records(data, index, records)
+            self._journal_sizes[file_path] = self._journal_sizes.get(file_path, 0) + len(records)
+            ideas_index = self._indexes.get(self.ideas_file)
+            if file_path == self.comments_file and ideas_index is not None:
+                #Комментарии другого процесса не попали в полнотекстовый индекс - перестроим при поиске
+                ideas_index["search_comments"] = None
+        cached["offset"] = offset
+        return True
+
+    #Воспроизведение журнала поверх загруженного снимка
+    def _replay_journal(self, file_path: str, data: Dict, records: List[Dict]):
+        index = self._build_index(file_path, data)
+        self._apply_records(data, index, records)
+        self._journal_sizes[file_path] = len(records)
+        self._indexes[file_path] = index #Индексы уже соответствуют воспроизведенным данным
+
+    #Применение записей журнала, еще не вошедших в данные (по порядковому номеру)
+    def _apply_records(self, data: Dict, index: Dict, records: List[Dict]):
+        applied_seq = data.get("journal_seq", 0) #Последняя запись, уже вошедшая в данные
+        for record in records:
+            if record["seq"] <= applied_seq:
+                continue #Запись уже учтена в снимке
+            self._apply_record(data, index, record)
+            data["journal_seq"] = applied_seq = record["seq"]
+
+    #Применение записи об изменении к данным и индексам
+    def _apply_record(self, data: Dict, index: Dict, record: Dict):
+        getattr(self, "_apply_" + record["op"])(data, index, record)
+
+    #Фиксация изменения (под блокировкой записи): запись применяется к данным и сохраняется на диск
+    #В режиме журнала дописывается одна компактная строка вместо перезаписи всего файла
+    def _commit(self, file_path: str, data: Dict, index: Dict, record: Dict):
+        self._apply_record(data, index, record)
+        if file_path not in self._journaled_files:
+            self._save_json(file_path, data)
+            return
+        record["seq"] = data.get("journal_seq", 0) + 1 #Порядковый номер записи
+        data["journal_seq"] = record["seq"]
+        entry = self._cache[file_path]
+        started = time.perf_counter()
+        line = serialization.dumps(record) + b"\n"
+        serialized = time.perf_counter()
+        with open(self._journal_path(file_path), 'ab') as f:
+            if f.tell() != entry["offset"]:
+                f.truncate(entry["offset"]) #Недописанная запись процесса, прерванного во время записи
+            f.write(line)
+            entry["offset"] = f.tell()
+        if self.metrics is not None:
+            self.metrics.storage_write(self._journal_path(file_path), "append", len(line),
+                                       serialized - started, time.perf_counter() - serialized)
+        self._journal_sizes[file_path] = self._journal_sizes.get(file_path, 0) + 1
+        if self._journal_sizes[file_path] >= self.journal_compact_every:
+            self._save_json(file_path, data) #Периодически сворачиваем журнал в снимок
+        else:
+            self._bump_version(file_path)
     
-    #Метод инициализации файлов БД
+    #Построение индексов для загруженных данных файла
+    def _build_index(self, file_path: str, data: Dict) -> Dict:
+        index = {"data": data}
+        if file_path == self.users_file:
+            users = data.get("users", [])
+            index["by_id"] = {user["id"]: user for user in users} #id -> пользователь
+            index["by_username"] = {user["username"]: user for user in users} #логин -> пользователь
+        elif file_path == self.ideas_file:
+            ideas = data.get("ideas", [])
+            index["by_id"] = {idea["id"]: idea for idea in ideas} #id -> идея
+            #id идеи -> множество проголосовавших (проверка повторного голоса и has_voted за O(1))
+            index["voters"] = {idea["id"]: set(idea.get("voted_users", [])) for idea in ideas}
+            #Упорядоченные представления для списков: new, popular, approved, open и т.д.
+            views = {name: [] for name in IDEA_VIEWS}
+            for idea in ideas:
+                for name, entry in idea_view_entries(idea).items():
+                    views[name].append(entry)
+            for view in views.values():
+                view.sort()
+            index["views"] = views
+            #Полнотекстовый индекс строится при первом поиске (см. _search_index)
+            index["search"] = None
+            index["search_comments"] = None #Данные комментариев, по которым построен полнотекстовый индекс
+        elif file_path == self.comments_file:
+            comments = data.get("comments", [])
+            index["by_id"] = {comment["id"]: comment for comment in comments} #id -> комментарий
+            #id идеи -> комментарии идеи по возрастанию id (для постраничного вывода и счетчика)
+            by_idea = {}
+            for comment in comments:
+                by_idea.setdefault(comment["idea_id"], []).append(comment)
+            for thread in by_idea.values():
+                thread.sort(key=lambda comment: comment["id"])
+            index["by_idea"] = by_idea
+        return index
+
+    #Обновление представлений после изменения идеи: old_entries - элементы идеи до изменения
+    @staticmethod
+    def _update_idea_views(index: Dict, idea: Dict, old_entries: Dict[str, tuple]):
+        new_entries = idea_view_entries(idea)
+        for name, view in index["views"].items():
+            old, new = old_entries.get(name), new_entries.get(name)
+            if old == new:
+                continue
+            if old is not None:
+                del view[bisect.bisect_left(view, old)] #Убираем старое положение идеи
+            if new is not None:
+                bisect.insort(view, new) #Вставляем на новое место
+
+    #Загрузка данных вместе с индексами (индексы перестраиваются, только если файл был перечитан)
+    #Методы, изменяющие данные, обязаны поддерживать индексы в актуальном состоянии
+    def _load_indexed(self, file_path: str) -> tuple:
+        data = self._load_json(file_path)
+        index = self._indexes.get(file_path)
+        if index is not None and index["data"] is data:
+            return data, index
+        with self._locks[file_path].thread_lock:
+            data = self._load_json(file_path)
+            index = self._indexes.get(file_path)
+            if index is None or index["data"] is not data:
+                index = self._build_index(file_path, data)
+                self._indexes[file_path] = index
+            return data, index
+
+    #Поиск записи пользователя (с паролем) по логину
+    def _get_user_record_by_username(self, username: str) -> Optional[Dict]:
+        _, index = self._load_indexed(self.users_file)
+        return index["by_username"].get(username)
+
+    #Записи изменений идей (применяются и при изменении, и при воспроизведении журнала)
+
+    def _apply_create_idea(self, data: Dict, index: Dict, record: Dict):
+        idea = record["idea"]
+        data.setdefault("ideas", []).append(idea) #Добавляем идею в список
+        index["by_id"][idea["id"]] = idea #Обновляем индекс
+        index["voters"][idea["id"]] = set(idea["voted_users"])
+        self._update_idea_views(index, idea, {})
+        if index["search"] is not None:
+            index["search"].add_idea(idea)
+        data["last_idea_id"] = idea["id"] #Обновляем последний Id
+
+    def _apply_vote(self, data: Dict, index: Dict, record: Dict):
+        idea = index["by_id"][record["idea_id"]]
+        old_entries = idea_view_entries(idea)
+        idea["votes_" + record["vote"]] += 1 #Увеличиваем голоса "за" или "против"
+        idea["voted_users"].append(record["user_id"]) #Добавляем пользователя в список проголосовавших
+        index["voters"][idea["id"]].add(record["user_id"])
+        self._update_idea_views(index, idea, old_entries) #Идея сдвигается в представлении popular
+
+    #Записи журнала идей, сделанные до переноса комментариев в comments.json:
+    #нужны, чтобы воспроизвести старый журнал перед переносом (см. _migrate_inline_comments)
+    def _apply_add_comment(self, data: Dict, index: Dict, record: Dict):
+        index["by_id"][record["idea_id"]].setdefault("comments", []).append(record["comment"])
+        data["last_comment_id"] = record["comment"]["id"]
+
+    def _apply_delete_comment(self, data: Dict, index: Dict, record: Dict):
+        idea = index["by_id"][record["idea_id"]]
+        idea["comments"] = [comment for comment in idea.get("comments", []) if comment["id"] != record["comment_id"]]
+
+    def _apply_set_idea_flag(self, data: Dict, index: Dict, record: Dict):
+        idea = index["by_id"][record["idea_id"]]
+        old_entries = idea_view_entries(idea)
+        idea[record["field"]] = record["value"] #is_approved / is_hidden
+        self._update_idea_views(index, idea, old_entries) #Идея переходит между представлениями
+
+    #Пакет изменений (массовая модерация): в журнале это одна строка, поэтому пакет применяется целиком или никак
+    def _apply_batch(self, data: Dict, index: Dict, record: Dict):
+        for item in record["records"]:
+            self._apply_record(data, index, item)
+
+    #Записи изменений комментариев (файл comments.json)
+
+    def _apply_new_comment(self, data: Dict, index: Dict, record: Dict):
+        comment = record["comment"]
+        data.setdefault("comments", []).append(comment) #Добавляем комментарий в список
+        index["by_id"][comment["id"]] = comment #Обновляем индексы; id растут, поэтому ветка остается упорядоченной
+        index["by_idea"].setdefault(comment["idea_id"], []).append(comment)
+        data["last_comment_id"] = comment["id"] #Обновляем последний ID комментария
+
+    def _apply_remove_comment(self, data: Dict, index: Dict, record: Dict):
+        comment = index["by_id"].pop(record["comment_id"], None)
+        if comment is None:
+            return
+        data["comments"].remove(comment) #Удаляем комментарий из списка
+        thread = index["by_idea"][comment["idea_id"]]
+        thread.remove(comment)
+        if not thread:
+            del index["by_idea"][comment["idea_id"]]
+
+    #Метод инициализации файлов БД (под блокировками всех файлов: процессы сервера стартуют одновременно)
+    @_writes("users_file", "ideas_file", "comments_file", "config_file")
     def __init__files(self):
         if not os.path.exists(self.users_file): #Инициализация user.json
             default_password = "12345"
@@ -66,7 +624,12 @@ class JSONDatabase:
         if not os.path.exists(self.ideas_file):
             self._save_json(self.ideas_file, {
                 "ideas": [],  #Пустой массив идей
-                "last_idea_id": 0,  #Последний ID идеи
+                "last_idea_id": 0  #Последний ID идеи
+            })
+        #Инициализация файла комментариев (если не существует)
+        if not os.path.exists(self.comments_file):
+            self._save_json(self.comments_file, {
+                "comments": [],  #Пустой массив комментариев
                 "last_comment_id": 0  #Последний ID комментария
             })
         #Инициализация файла конфигурации (если не существует)
@@ -78,22 +641,138 @@ class JSONDatabase:
                     "items_per_page": 20  #Элементов на странице
                 }
             })
+        #Сворачиваем оставшийся с прошлого запуска журнал в снимок
+        for file_path in self._journaled_files:
+            data = self._load_json(file_path)
+            if self._journal_sizes.get(file_path):
+                self._save_json(file_path, data)
+        self._migrate_inline_comments()
+
+    #Перенос комментариев, которые раньше хранились внутри идей, в comments.json
+    @_writes("ideas_file", "comments_file")
+    def _migrate_inline_comments(self):
+        ideas_data = self._load_json(self.ideas_file)
+        inline = [idea for idea in ideas_data.get("ideas", []) if "comments" in idea]
+        if not inline and "last_comment_id" not in ideas_data:
+            return #Данные уже в новом формате
+        comments_data = self._load_json(self.comments_file)
+        comments = comments_data.setdefault("comments", [])
+        known = {comment["id"] for comment in comments}
+        for idea in inline:
+            for comment in idea["comments"]:
+                if comment["id"] not in known: #Повторный перенос после сбоя не создает дублей
+                    comments.append({"id": comment["id"], "idea_id": idea["id"], **comment})
+                    known.add(comment["id"])
+        comments.sort(key=lambda comment: comment["id"])
+        comments_data["last_comment_id"] = max(
+            [comments_data.get("last_comment_id", 0), ideas_data.get("last_comment_id", 0)] + list(known)
+        )
+        #Сначала сохраняем комментарии: при сбое до сохранения идей перенос просто повторится
+        self._indexes.pop(self.comments_file, None)
+        self._save_json(self.comments_file, comments_data)
+        for idea in inline:
+            del idea["comments"]
+        ideas_data.pop("last_comment_id", None)
+        self._indexes[self.ideas_file] = self._build_index(self.ideas_file, ideas_data)
+        self._save_json(self.ideas_file, ideas_data)
         
     #Получение всех идей
     def get_all_ideas(self) -> List[Dict]:
         return self._load_json(self.ideas_file).get("ideas", []) #Возвращаем список идей
-    
-    #Получение идеи по Id
-    def get_idea_by_id(self, idea_id: int) -> Optional[Dict]:
-        data = self._load_json(self.ideas_file) #Загружаем данные
-        for idea in data.get("ideas", []): #Ищем идею по Id
-            if idea["id"] == idea_id:
-                return idea #Возвращаем найденную идею
-        return None #Если не нашли, то возвращаем None
-    
+
+    #Страница списка идей для фильтра (new, popular, approved, open или all)
+    #limit=None - весь список; next_cursor передается в следующий запрос для получения продолжения
+    def get_ideas_page(self, filter: str = "all", limit: Optional[int] = None, cursor: Optional[str] = None,
+                       include_hidden: bool = False) -> Dict[str, any]:
+        if include_hidden:
+            view_name = "all" if filter == "all" else None
+        else:
+            view_name = filter if filter in IDEA_VIEWS and filter != "all" else "visible"
+        if view_name is not None:
+            #Страница берется из готового упорядоченного представления, без фильтрации и сортировки всего списка
+            _, index = self._load_indexed(self.ideas_file)
+            try:
+                entries, next_cursor = take_view_page(
+                    index["views"][view_name], limit, cursor, view_name in IDEA_ORDERS
+                )
+            except ValueError as e:
+                return {"success": False, "message": str(e)}
+            by_id = index["by_id"]
+            ideas = [by_id[idea_id] for _, idea_id in entries if idea_id in by_id]
+            return {"success": True, "ideas": ideas, "next_cursor": next_cursor}
+
+        #Сочетание фильтра со скрытыми идеями без готового представления - фильтруем и сортируем весь список
+        ideas = self.get_all_ideas()
+        if not include_hidden:
+            ideas = [idea for idea in ideas if not idea["is_hidden"]]  #Скрытые идеи видит только админ
+        if filter == "approved":
+            ideas = [idea for idea in ideas if idea["is_approved"]]  #Только одобренные идеи
+        elif filter == "open":
+            ideas = [idea for idea in ideas if not idea["is_approved"]]  #Только открытые для обсуждения
+        key, reverse = IDEA_ORDERS.get(filter, DEFAULT_IDEA_ORDER)
+        keyed = sorted(((key(idea), idea) for idea in ideas), key=lambda item: item[0], reverse=reverse)
+        try:
+            page, next_cursor = take_page(keyed, limit, cursor, reverse)
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+        return {"success": True, "ideas": page, "next_cursor": next_cursor}
+
+    #Полнотекстовый индекс идей вместе с текстом комментариев (строится при первом обращении,
+    #дальше обновляется вместе с данными; перестраивается, если комментарии перечитаны с диска)
+    def _search_index(self) -> Dict:
+        _, index = self._load_indexed(self.ideas_file)
+        comments_data, _ = self._load_indexed(self.comments_file)
+        if index["search"] is None or index["search_comments"] is not comments_data:
+            with self._write_lock(self.ideas_file, self.comments_file):
+                comments_data, _ = self._load_indexed(self.comments_file)
+                if index["search"] is None or index["search_comments"] is not comments_data:
+                    search = SearchIndex.from_ideas(index["data"].get("ideas", []))
+                    for comment in comments_data.get("comments", []):
+                        if comment["idea_id"] in index["by_id"]:
+                            search.add_comment(comment["idea_id"], comment["text"])
+                    index["search"], index["search_comments"] = search, comments_data
+        return index
+
+    #Полнотекстовый поиск идей с ранжированием по релевантности (BM25)
+    #Скрытые идеи ищутся только при include_hidden; cursor - из next_cursor предыдущей страницы
+    def search_ideas(self, query: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                     include_hidden: bool = False) -> Dict[str, any]:
+        try:
+            after = decode_search_cursor(cursor)
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+        index = self._search_index()
+        by_id = index["by_id"]
+        #Поиск под блокировкой файла идей: индекс не должен меняться во время обхода
+        with self._locks[self.ideas_file].thread_lock:
+            results, total, next_after = index["search"].search(
+                query, limit, after,
+                None if include_hidden else (lambda idea_id: not by_id[idea_id]["is_hidden"])
+            )
+            ideas = [by_id[idea_id] for _, idea_id in results]
+        return {
+            "success": True,
+            "ideas": ideas,
+            "total_found": total,
+            "next_cursor": encode_cursor(tuple(next_after)) if next_after else None
+        }
+
+    #Проекция списка идей для ответа (см. project_idea); has_voted берется из индекса проголосовавших,
+    #comment_count - из индекса комментариев
+    def project_ideas(self, ideas: List[Dict], summary: bool = False, user_id: Optional[int] = None,
+                      fields: Optional[List[str]] = None) -> List[Dict]:
+        _, index = self._load_indexed(self.ideas_file)
+        _, comments_index = self._load_indexed(self.comments_file)
+        voters, by_idea = index["voters"], comments_index["by_idea"]
+        return [
+            project_idea(idea, summary, user_id, fields, voters.get(idea["id"]), len(by_idea.get(idea["id"], ())))
+            for idea in ideas
+        ]
+
     #Создание новой идеи
+    @_writes("ideas_file")
     def create_idea(self, idea_data: Dict) -> int:
-        data = self._load_json(self.ideas_file) #Загружаем текущие идеи
+        data, index = self._load_indexed(self.ideas_file) #Загружаем текущие идеи
         new_id = data.get("last_idea_id", 0) + 1 #Генерируем новый Id
         #Создаем объект идеи
         idea = {
@@ -109,128 +788,211 @@ class JSONDatabase:
             "votes_for": 0,  #Голосов "за"
             "votes_against": 0,  #Голосов "против"
             "voted_users": [],  #Список проголосовавших пользователей
-            "created_at": datetime.now().isoformat(),  #Дата создания
-            "comments": []  #Пустой список комментариев
+            "created_at": datetime.now().isoformat()  #Дата создания
         }
-        data["ideas"].append(idea) #Добавляем идею в список
-        data["last_idea_id"] = new_id #Обновляем последний Id
-        self._save_json(self.ideas_file, data) #Сохраняем изменения
+        #Добавляем идею и сохраняем изменения
+        self._commit(self.ideas_file, data, index, {"op": "create_idea", "idea": idea})
+        self._publish("idea_created", idea=idea)
         return new_id #Возвращаем Id созданной идеи
     #Голосование за идею
+    @_writes("ideas_file")
     def vote_for_idea(self, idea_id: int, user_id: int, vote: str) -> Dict:
-        data = self._load_json(self.ideas_file)  #Загружаем данные
-        for idea in data.get("ideas", []):  #Ищем идею
-            if idea["id"] == idea_id:
-                #Проверяем, не скрыта ли идея
-                if idea.get("is_hidden", False):
-                    return {"success": False, "message": "Идея скрыта и недоступна для голосования."}
-                    
-                #Проверяем, не голосовал ли пользователь уже
-                if user_id in idea["voted_users"]:
-                    return {"success": False, "message": "Пользователь уже голосовал за эту идею."}
-
-                #Обрабатываем голос
-                if vote == "for":
-                    idea["votes_for"] += 1  #Увеличиваем голоса "за"
-                elif vote == "against":
-                    idea["votes_against"] += 1  #Увеличиваем голоса "против"
-                else:
-                    return {"success": False, "message": "Неверный тип голоса. Используйте 'for' или 'against'."}
-
-                idea["voted_users"].append(user_id)  #Добавляем пользователя в список проголосовавших
-                self._save_json(self.ideas_file, data)  #Сохраняем изменения
-                
-                return {
-                    "success": True, 
-                    "message": "Голос учтён.",
-                    "votes_for": idea["votes_for"],  #Новое количество голосов "за"
-                    "votes_against": idea["votes_against"]  #Новое количество голосов "против"
-                }
+        data, index = self._load_indexed(self.ideas_file)  #Загружаем данные
+        idea = index["by_id"].get(idea_id)  #Ищем идею
+        if idea is None:
+            return {"success": False, "message": "Идея не найдена."}  #Если идея не найдена
+
+        #Проверяем, не скрыта ли идея
+        if idea.get("is_hidden", False):
+            return {"success": False, "message": "Идея скрыта и недоступна для голосования."}
+            
+        #Проверяем, не голосовал ли пользователь уже
+        if user_id in index["voters"][idea_id]:
+            return {"success": False, "message": "Пользователь уже голосовал за эту идею."}
 
-        return {"success": False, "message": "Идея не найдена."}  #Если идея не найдена
+        #Проверяем тип голоса
+        if vote not in ("for", "against"):
+            return {"success": False, "message": "Неверный тип голоса. Используйте 'for' или 'against'."}
+
+        #Учитываем голос и сохраняем изменения
+        self._commit(self.ideas_file, data, index, {"op": "vote", "idea_id": idea_id, "user_id": user_id, "vote": vote})
+        self._publish("votes_changed", idea_id=idea_id, user_id=user_id,
+                      votes_for=idea["votes_for"], votes_against=idea["votes_against"])
+        
+        return {
+            "success": True, 
+            "message": "Голос учтён.",
+            "votes_for": idea["votes_for"],  #Новое количество голосов "за"
+            "votes_against": idea["votes_against"]  #Новое количество голосов "против"
+        }
 
-    #Добавление комментария к идее
+    #Добавление комментария к идее (файл идей не перезаписывается; блокировка идей держится,
+    #чтобы идея не исчезла во время добавления и чтобы обновить полнотекстовый индекс)
+    @_writes("ideas_file", "comments_file")
     def add_comment(self, idea_id: int, user_id: int, text: str) -> Optional[int]:
-        data = self._load_json(self.ideas_file)  #Загружаем данные
-        for idea in data.get("ideas", []):  #Ищем идею
-            if idea["id"] == idea_id:
-                new_comment_id = data.get("last_comment_id", 0) + 1  #Генерируем ID комментария
-                
-                #Создаем объект комментария
-                comment = {
-                    "id": new_comment_id,  #ID комментария
-                    "user_id": user_id,  #ID пользователя
-                    "text": text,  #Текст комментария
-                    "created_at": datetime.now().isoformat()  #Дата создания
-                }
-                
-                idea["comments"].append(comment)  #Добавляем комментарий к идее
-                data["last_comment_id"] = new_comment_id  #Обновляем последний ID комментария
-                self._save_json(self.ideas_file, data)  #Сохраняем изменения
-                return new_comment_id  #Возвращаем ID нового комментария
-        return None  #Если идея не найдена
+        _, ideas_index = self._load_indexed(self.ideas_file)  #Загружаем данные
+        idea = ideas_index["by_id"].get(idea_id)  #Ищем идею
+        if idea is None:
+            return None  #Если идея не найдена
+        data, index = self._load_indexed(self.comments_file)
+        new_comment_id = data.get("last_comment_id", 0) + 1  #Генерируем ID комментария
+        
+        #Создаем объект комментария
+        comment = {
+            "id": new_comment_id,  #ID комментария
+            "idea_id": idea_id,  #ID идеи
+            "user_id": user_id,  #ID пользователя
+            "text": text,  #Текст комментария
+            "created_at": datetime.now().isoformat()  #Дата создания
+        }
+        
+        #Добавляем комментарий и сохраняем изменения
+        self._commit(self.comments_file, data, index, {"op": "new_comment", "comment": comment})
+        if ideas_index["search"] is not None and ideas_index["search_comments"] is data:
+            ideas_index["search"].add_comment(idea_id, text)
+        if not idea["is_hidden"]:
+            self._publish("comment_added", idea_id=idea_id, comment=comment,
+                          comment_count=len(index["by_idea"][idea_id]))
+        return new_comment_id  #Возвращаем ID нового комментария
 
     #Одобрение идеи (админ)
+    @_writes("ideas_file")
     def approve_idea(self, idea_id: int) -> bool:
-        data = self._load_json(self.ideas_file)  #Загружаем данные
-        for idea in data.get("ideas", []):  #Ищем идею
-            if idea["id"] == idea_id:
-                idea["is_approved"] = True  #Устанавливаем флаг одобрения
-                self._save_json(self.ideas_file, data)  #Сохраняем изменения
-                return True  #Успешно
-        return False  #Идея не найдена
+        data, index = self._load_indexed(self.ideas_file)  #Загружаем данные
+        idea = index["by_id"].get(idea_id)  #Ищем идею
+        if idea is None:
+            return False  #Идея не найдена
+        #Устанавливаем флаг одобрения и сохраняем изменения
+        self._commit(self.ideas_file, data, index, {"op": "set_idea_flag", "idea_id": idea_id, "field": "is_approved", "value": True})
+        self._publish("idea_approved", idea_id=idea_id)
+        return True  #Успешно
 
     #Скрытие идеи (админ)
+    @_writes("ideas_file")
     def hide_idea(self, idea_id: int) -> bool:
-        data = self._load_json(self.ideas_file)  #Загружаем данные
-        for idea in data.get("ideas", []):  #Ищем идею
-            if idea["id"] == idea_id:
-                idea["is_hidden"] = True  #Устанавливаем флаг скрытия
-                self._save_json(self.ideas_file, data)  #Сохраняем изменения
-                return True  #Успешно
-        return False  #Идея не найдена
+        data, index = self._load_indexed(self.ideas_file)  #Загружаем данные
+        idea = index["by_id"].get(idea_id)  #Ищем идею
+        if idea is None:
+            return False  #Идея не найдена
+        #Устанавливаем флаг скрытия и сохраняем изменения
+        self._commit(self.ideas_file, data, index, {"op": "set_idea_flag", "idea_id": idea_id, "field": "is_hidden", "value": True})
+        self._publish("idea_hidden", idea_id=idea_id)
+        return True  #Успешно
 
     #Отображение скрытой идеи (админ)
+    @_writes("ideas_file")
     def unhide_idea(self, idea_id: int) -> bool:
-        data = self._load_json(self.ideas_file)  #Загружаем данные
-        for idea in data.get("ideas", []):  #Ищем идею
-            if idea["id"] == idea_id:
-                idea["is_hidden"] = False  #Снимаем флаг скрытия
-                self._save_json(self.ideas_file, data)  #Сохраняем изменения
-                return True  #Успешно
-        return False  #Идея не найдена
+        data, index = self._load_indexed(self.ideas_file)  #Загружаем данные
+        idea = index["by_id"].get(idea_id)  #Ищем идею
+        if idea is None:
+            return False  #Идея не найдена
+        #Снимаем флаг скрытия и сохраняем изменения
+        self._commit(self.ideas_file, data, index, {"op": "set_idea_flag", "idea_id": idea_id, "field": "is_hidden", "value": False})
+        self._publish("idea_unhidden", idea=self.project_ideas([idea])[0])  #Клиенты добавляют идею обратно в список
+        return True  #Успешно
+
+    #Запись нового пользователя; temp_password=True - открытый пароль сохраняется для показа админу.
+    #Хеш вычисляется заранее, вне блокировки файла пользователей
+    def _new_user_record(self, user_id: int, username: str, password: str, password_hash: str, role: str,
+                         temp_password: bool, created_at: Optional[str] = None) -> Dict:
+        user = {
+            "id": user_id,  #ID пользователя
+            "username": username,  #Логин
+            "password": password_hash,  #Хешированный пароль
+        }
+        if temp_password:
+            user["plain_password"] = password  #Открытый пароль для показа админу
+            user["is_temp_password"] = True  #Флаг, что есть открытый пароль
+        user.update({
+            "role": role,  #Роль
+            "is_active": True,  #Активен
+            "full_name": "",  #Пока нет ФИО
+            "has_completed_introduction": False,  #Не прошел представление
+            "needs_password_change": role == "admin",  #Смена пароля обязательна для администратора
+            "created_at": created_at or datetime.now().isoformat()  #Дата создания
+        })
+        return user
+
+    #Массовое создание пользователей с одной записью users.json.
+    #make_username/make_password - генераторы логина и пароля; занятые логины (в базе и в самой партии)
+    #отсеиваются по индексу логинов. Пароли хешируются до блокировки, всей партией в пуле хешера
+    #с обычной стоимостью (работа делится между процессами пула). Возвращает созданных
+    #пользователей с открытыми паролями
+    def create_users_bulk(self, count: int, make_username: Callable[[], str], make_password: Callable[[], str],
+                          role: str = "user", temp_password: bool = False) -> Dict[str, any]:
+        passwords = [make_password() for _ in range(count)]
+        hashes = self.hasher.hash_many(passwords)
+        with self._write_lock(self.users_file):
+            data, index = self._load_indexed(self.users_file)
+            users = data.setdefault("users", [])
+            by_id, by_username = index["by_id"], index["by_username"]
+            new_id = data.get("last_user_id", 0)
+            created_at = datetime.now().isoformat()
+            created = []
+            for password, password_hash in zip(passwords, hashes):
+                username = make_username()
+                while username in by_username:  #Логин занят - генерируем другой
+                    username = make_username()
+                new_id += 1
+                user = self._new_user_record(new_id, username, password, password_hash, role, temp_password, created_at)
+                users.append(user)
+                by_id[new_id] = by_username[username] = user
+                created.append({"id": new_id, "username": username, "password": password})
+            data["last_user_id"] = new_id
+            self._save_json(self.users_file, data)  #Одна запись на всю партию
+        return {"success": True, "users": created}
+
+    #Массовая модерация идей (approve, hide или unhide) одним изменением и одной записью на диск.
+    #Возвращает результат по каждой идее; ненайденные идеи пропускаются, остальные изменяются
+    @_writes("ideas_file")
+    def moderate_ideas(self, idea_ids: List[int], action: str) -> Dict[str, any]:
+        if action not in MODERATION_ACTIONS:
+            return {"success": False, "message": "Неизвестное действие модерации"}
+        field, value, event_type = MODERATION_ACTIONS[action]
+        data, index = self._load_indexed(self.ideas_file)
+        results, records, changed = [], [], []
+        for idea_id in dict.fromkeys(idea_ids):  #Повторы id обрабатываются один раз
+            idea = index["by_id"].get(idea_id)
+            if idea is None:
+                results.append({"idea_id": idea_id, "success": False, "message": "Идея не найдена."})
+                continue
+            results.append({"idea_id": idea_id, "success": True})
+            if idea[field] != value:  #Уже в нужном состоянии - записывать нечего
+                records.append({"op": "set_idea_flag", "idea_id": idea_id, "field": field, "value": value})
+                changed.append(idea)
+        if records:
+            self._commit(self.ideas_file, data, index, {"op": "batch", "records": records})
+        for idea in changed:
+            if event_type == "idea_unhidden":
+                self._publish(event_type, idea=self.project_ideas([idea])[0])
+            else:
+                self._publish(event_type, idea_id=idea["id"])
+        return {"success": True, "results": results}
 
     #Создание пользователя
     def create_user(self, username: str, password: str, role: str = "user") -> Dict[str, any]:
-        data = self._load_json(self.users_file)  #Загружаем данные пользователей
-        users = data.get("users", [])  #Получаем список пользователей
+        if self._get_user_record_by_username(username) is not None:  #Не тратим время на хеш для занятого логина
+            return {"success": False, "message": "Пользователь с таким именем уже существует"}
+        password_hash = self.hash_password(password)  #Хешируем до блокировки - это долго
+        return self._insert_user(username, password, password_hash, role, temp_password=False)
+
+    #Добавление записи пользователя под блокировкой users.json
+    @_writes("users_file")
+    def _insert_user(self, username: str, password: str, password_hash: str, role: str,
+                     temp_password: bool) -> Dict[str, any]:
+        data, index = self._load_indexed(self.users_file)  #Загружаем данные пользователей
+        users = data.setdefault("users", [])  #Получаем список пользователей
         
         #Проверяем, не существует ли уже пользователь с таким именем
-        for user in users:
-            if user["username"] == username:
-                return {"success": False, "message": "Пользователь с таким именем уже существует"}
+        if username in index["by_username"]:
+            return {"success": False, "message": "Пользователь с таким именем уже существует"}
         
         new_id = data.get("last_user_id", 0) + 1  #Генерируем новый ID
-        password_hash = self.hash_password(password)  #Хешируем пароль
-        
-        #Определяем, нужно ли менять пароль (для администратора обязательно)
-        needs_password_change = (role == "admin")
-        
-        #Создаем объект пользователя
-        new_user = {
-            "id": new_id,  #ID пользователя
-            "username": username,  #Логин
-            "password": password_hash,  #Хешированный пароль
-            "role": role,  #Роль 
-            "is_active": True,  #Активен
-            "full_name": "",  #Пока нет ФИО
-            "has_completed_introduction": False,  #Не прошел представление
-            "needs_password_change": needs_password_change,  #Нужно ли сменить пароль
-            "created_at": datetime.now().isoformat()  #Дата создания
-        }
+        new_user = self._new_user_record(new_id, username, password, password_hash, role, temp_password)
         
         users.append(new_user)  #Добавляем пользователя в список
-        data["users"] = users  #Обновляем список пользователей
+        index["by_id"][new_id] = new_user  #Обновляем индексы
+        index["by_username"][username] = new_user
         data["last_user_id"] = new_id  #Обновляем последний ID
         self._save_json(self.users_file, data)  #Сохраняем изменения
         
@@ -254,115 +1016,160 @@ class JSONDatabase:
         return temp_users
     
     #Завершение представления пользователя (ввод ФИО)
+    @_writes("users_file")
     def complete_user_introduction(self, user_id: int, full_name: str) -> Dict[str, any]:
-        data = self._load_json(self.users_file)  #Загружаем данные пользователей
-        for user in data.get("users", []):  #Ищем пользователя
-            if user["id"] == user_id:
-                user["full_name"] = full_name.strip()  #Сохраняем ФИО
-                user["has_completed_introduction"] = True  #Отмечаем как прошедшего представление
-                self._save_json(self.users_file, data)  #Сохраняем изменения
-                return {"success": True}  #Успешно
-        return {"success": False, "message": "Пользователь не найден"}  #Пользователь не найден
+        data, index = self._load_indexed(self.users_file)  #Загружаем данные пользователей
+        user = index["by_id"].get(user_id)  #Ищем пользователя
+        if user is None:
+            return {"success": False, "message": "Пользователь не найден"}  #Пользователь не найден
+        user["full_name"] = full_name.strip()  #Сохраняем ФИО
+        user["has_completed_introduction"] = True  #Отмечаем как прошедшего представление
+        self._save_json(self.users_file, data)  #Сохраняем изменения
+        return {"success": True}  #Успешно
 
 
-    #Смена пароля администратора
+    #Смена пароля администратора. Проверка и хеширование паролей выполняются без блокировки файла,
+    #новый хеш записывается, только если пароль за это время не сменили
     def change_admin_password(self, user_id: int, current_password: str, new_password: str) -> Dict[str, any]:
-        data = self._load_json(self.users_file)  #Загружаем данные пользователей
-        for user in data.get("users", []):  #Ищем пользователя
-            if user["id"] == user_id:
-                #Проверяем, является ли пользователь администратором
-                if user.get("role") != "admin":
-                    return {"success": False, "message": "Доступ запрещён. Требуются права администратора."}
-                
-                #Проверяем текущий пароль
-                if not self.verify_password(current_password, user["password"]):
-                    return {"success": False, "message": "Текущий пароль неверен."}
-                
-                #Проверяем минимальную длину нового пароля
-                if len(new_password) < 4:
-                    return {"success": False, "message": "Новый пароль должен содержать минимум 4 символа."}
-                
-                user["password"] = self.hash_password(new_password)  #Сохраняем новый хешированный пароль
-                user["needs_password_change"] = False  #Снимаем флаг необходимости смены пароля
-                
-                self._save_json(self.users_file, data)  #Сохраняем изменения
-                return {"success": True}  #Успешно
-        
-        return {"success": False, "message": "Пользователь не найден"}  #Пользователь не найден
+        data, index = self._load_indexed(self.users_file)  #Загружаем данные пользователей
+        user = index["by_id"].get(user_id)  #Ищем пользователя
+        if user is None:
+            return {"success": False, "message": "Пользователь не найден"}  #Пользователь не найден
+
+        #Проверяем, является ли пользователь администратором
+        if user.get("role") != "admin":
+            return {"success": False, "message": "Доступ запрещён. Требуются права администратора."}
+        
+        #Проверяем текущий пароль
+        current_hash = user["password"]
+        if not self.verify_password(current_password, current_hash):
+            return {"success": False, "message": "Текущий пароль неверен."}
+        
+        #Проверяем минимальную длину нового пароля
+        if len(new_password) < 4:
+            return {"success": False, "message": "Новый пароль должен содержать минимум 4 символа."}
+        
+        new_hash = self.hash_password(new_password)
+        with self._write_lock(self.users_file):
+            data, index = self._load_indexed(self.users_file)
+            user = index["by_id"].get(user_id)
+            if user is None or user.get("password") != current_hash:
+                return {"success": False, "message": "Пароль был изменён. Попробуйте снова."}
+            user["password"] = new_hash  #Сохраняем новый хешированный пароль
+            user["needs_password_change"] = False  #Снимаем флаг необходимости смены пароля
+            self._save_json(self.users_file, data)  #Сохраняем изменения
+        return {"success": True}  #Успешно
 
     #Получение списка всех пользователей (без паролей)
     def get_all_users(self) -> List[Dict]:
         data = self._load_json(self.users_file)  #Загружаем данные пользователей
-        users = data.get("users", [])  #Получаем список пользователей
-        for user in users:
-            if "password" in user:
-                del user["password"]  #Удаляем пароли из результата 
+        users = []
+        for user in data.get("users", []):
+            user_copy = user.copy()  #Копия, чтобы не испортить данные в кэше
+            user_copy.pop("password", None)  #Удаляем пароли из результата 
+            users.append(user_copy)
         return users  #Возвращаем список пользователей
 
+    #Страница списка пользователей (без паролей) в порядке id
+    #Пользователи хранятся по возрастанию id (новые добавляются в конец), поэтому страница находится
+    #двоичным поиском без сортировки - потоковая выгрузка всех пользователей порциями остается линейной
+    def get_users_page(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, any]:
+        users = self._load_json(self.users_file).get("users", [])
+        start = 0
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                return {"success": False, "message": str(e)}
+            if len(after) != 1 or not isinstance(after[0], int):
+                return {"success": False, "message": "Неверный курсор страницы"}
+            start = bisect.bisect_right(users, after[0], key=lambda user: user["id"])
+        end = len(users) if limit is None else start + limit
+        page = users[start:end]
+        next_cursor = encode_cursor((page[-1]["id"],)) if limit is not None and page and end < len(users) else None
+        #Копируем без пароля только пользователей этой страницы
+        page = [{key: value for key, value in user.items() if key != "password"} for user in page]
+        return {"success": True, "users": page, "next_cursor": next_cursor}
+
     #Блокировка пользователя (админ)
+    @_writes("users_file")
     def block_user(self, user_id: int) -> Dict[str, any]:
-        data = self._load_json(self.users_file)  #Загружаем данные пользователей
-        for user in data.get("users", []):  #Ищем пользователя
-            if user["id"] == user_id:
-                #Нельзя блокировать администраторов
-                if user.get("role") == "admin":
-                    return {"success": False, "message": "Нельзя заблокировать администратора"}
-                user["is_active"] = False  #Деактивируем пользователя
-                self._save_json(self.users_file, data)  #Сохраняем изменения
-                return {"success": True}  #Успешно
-        return {"success": False, "message": "Пользователь не найден"}  #Пользователь не найден
+        data, index = self._load_indexed(self.users_file)  #Загружаем данные пользователей
+        user = index["by_id"].get(user_id)  #Ищем пользователя
+        if user is None:
+            return {"success": False, "message": "Пользователь не найден"}  #Пользователь не найден
+        #Нельзя блокировать администраторов
+        if user.get("role") == "admin":
+            return {"success": False, "message": "Нельзя заблокировать администратора"}
+        user["is_active"] = False  #Деактивируем пользователя
+        self._save_json(self.users_file, data)  #Сохраняем изменения
+        return {"success": True}  #Успешно
 
     #Разблокировка пользователя (админ)
+    @_writes("users_file")
     def unblock_user(self, user_id: int) -> Dict[str, any]:
-        data = self._load_json(self.users_file)  #Загружаем данные пользователей
-        for user in data.get("users", []):  #Ищем пользователя
-            if user["id"] == user_id:
-                user["is_active"] = True  #Активируем пользователя
-                self._save_json(self.users_file, data)  #Сохраняем изменения
-                return {"success": True}  #Успешно
-        return {"success": False, "message": "Пользователь не найден"}  #Пользователь не найден
+        data, index = self._load_indexed(self.users_file)  #Загружаем данные пользователей
+        user = index["by_id"].get(user_id)  #Ищем пользователя
+        if user is None:
+            return {"success": False, "message": "Пользователь не найден"}  #Пользователь не найден
+        user["is_active"] = True  #Активируем пользователя
+        self._save_json(self.users_file, data)  #Сохраняем изменения
+        return {"success": True}  #Успешно
 
 
     def create_user_temp_password(self, username: str, password: str, role: str = "user") -> Dict[str, any]:
-        data = self._load_json(self.users_file)
-        users = data.get("users", [])
-        
         # Проверяем существование пользователя
-        for user in users:
-            if user["username"] == username:
-                return {"success": False, "message": "Пользователь с таким именем уже существует"}
-        
-        new_id = data.get("last_user_id", 0) + 1
+        if self._get_user_record_by_username(username) is not None:
+            return {"success": False, "message": "Пользователь с таким именем уже существует"}
         
         # СОХРАНЯЕМ ОТКРЫТЫЙ ПАРОЛЬ ОТДЕЛЬНО ДЛЯ ПОКАЗА АДМИНУ
-        needs_password_change = (role == "admin")
-        
-        new_user = {
-            "id": new_id,
-            "username": username,
-            "password": self.hash_password(password),  # Хешированный пароль для входа
-            "plain_password": password,  # Открытый пароль для показа админу
-            "is_temp_password": True,  # Флаг, что есть открытый пароль
-            "role": role,
-            "is_active": True,
-            "full_name": "",
-            "has_completed_introduction": False,
-            "needs_password_change": needs_password_change,
-            "created_at": datetime.now().isoformat()
-        }
-        
-        users.append(new_user)
-        data["users"] = users
-        data["last_user_id"] = new_id
-        self._save_json(self.users_file, data)
+        result = self._insert_user(username, password, self.hash_password(password), role, temp_password=True)
+        if not result["success"]:
+            return result
         
         return {
             "success": True, 
-            "user_id": new_id,
+            "user_id": result["user_id"],
             "username": username,
             "password": password  # Возвращаем пароль в открытом виде
         }
 
+    #Хеширование временного пароля пользователя (при первом входе)
+    def confirm_temp_password(self, user_id: int, plain_password: str) -> bool:
+        password_hash = self.hash_password(plain_password)  #Хешируем до блокировки - это долго
+        return self._set_confirmed_password(user_id, password_hash)
+
+    @_writes("users_file")
+    def _set_confirmed_password(self, user_id: int, password_hash: str) -> bool:
+        data, index = self._load_indexed(self.users_file)
+        user = index["by_id"].get(user_id)
+        if user is None or not user.get("is_temp_password", False):
+            return False
+        user["password"] = password_hash
+        user["password_hash"] = password_hash
+        user.pop("plain_password", None)  # Удаляем открытый пароль
+        user["is_temp_password"] = False  # Снимаем флаг временного пароля
+        self._save_json(self.users_file, data)
+        return True
+
+    #Замена устаревшего хеша пароля новым (после успешного входа). Хеш заменяется, только если
+    #он не изменился с момента проверки пароля - параллельная смена пароля не перезаписывается
+    @_writes("users_file")
+    def upgrade_password_hash(self, user_id: int, old_hash: str, new_hash: str) -> bool:
+        data, index = self._load_indexed(self.users_file)
+        user = index["by_id"].get(user_id)
+        if user is None:
+            return False
+        field = "password" if "password" in user else "password_hash"
+        if user.get(field) != old_hash:
+            return False
+        user[field] = new_hash
+        if user.get("password_hash") == old_hash:
+            user["password_hash"] = new_hash
+        self._save_json(self.users_file, data)
+        return True
+
+    @_writes("users_file")
     def hash_temp_passwords(self) -> Dict[str, any]:
         data = self._load_json(self.users_file)
         users = data.get("users", [])
@@ -384,55 +1191,131 @@ class JSONDatabase:
             "hashed_count": hashed_count
         }
     #Удаление пользователя (админ)
+    @_writes("users_file", "ideas_file", "comments_file")
     def delete_user(self, user_id: int) -> Dict[str, any]:
-        data = self._load_json(self.users_file)  #Загружаем данные пользователей
-        users = data.get("users", [])  #Получаем список пользователей
-        
-        for i, user in enumerate(users):  #Ищем пользователя
-            if user["id"] == user_id:
-                #Нельзя удалять администраторов
-                if user.get("role") == "admin":
-                    return {"success": False, "message": "Нельзя удалить администратора"}
-                
-                users.pop(i)  #Удаляем пользователя из списка
-                data["users"] = users  #Обновляем список
-                self._save_json(self.users_file, data)  #Сохраняем изменения
-                
-                #Также удаляем все идеи этого пользователя
-                ideas_data = self._load_json(self.ideas_file)  #Загружаем данные идей
-                #Фильтруем идеи, оставляем только те, у которых author_id не равен удаляемому пользователю
-                data["ideas"] = [idea for idea in ideas_data.get("ideas", []) if idea.get("author_id") != user_id]
-                self._save_json(self.ideas_file, data)  #Сохраняем изменения
-                
-                return {"success": True}  #Успешно
-        
-        return {"success": False, "message": "Пользователь не найден"}  #Пользователь не найден
+        data, index = self._load_indexed(self.users_file)  #Загружаем данные пользователей
+        user = index["by_id"].get(user_id)  #Ищем пользователя
+        if user is None:
+            return {"success": False, "message": "Пользователь не найден"}  #Пользователь не найден
+
+        #Нельзя удалять администраторов
+        if user.get("role") == "admin":
+            return {"success": False, "message": "Нельзя удалить администратора"}
+        
+        data["users"].remove(user)  #Удаляем пользователя из списка
+        del index["by_id"][user_id]  #Удаляем пользователя из индексов
+        index["by_username"].pop(user["username"], None)
+        self._save_json(self.users_file, data)  #Сохраняем изменения
+        
+        #Также удаляем все идеи этого пользователя
+        ideas_data = self._load_json(self.ideas_file)  #Загружаем данные идей
+        #Фильтруем идеи, оставляем только те, у которых author_id не равен удаляемому пользователю
+        removed_ids = [idea["id"] for idea in ideas_data.get("ideas", []) if idea.get("author_id") == user_id]
+        ideas_data["ideas"] = [idea for idea in ideas_data.get("ideas", []) if idea.get("author_id") != user_id]
+        #Индексы идей перестраиваем целиком - удаление пользователя редкая операция
+        self._indexes[self.ideas_file] = self._build_index(self.ideas_file, ideas_data)
+        self._save_json(self.ideas_file, ideas_data)  #Сохраняем изменения
+        if removed_ids:
+            #И комментарии к удаленным идеям
+            comments_data = self._load_json(self.comments_file)
+            removed = set(removed_ids)
+            comments_data["comments"] = [
+                comment for comment in comments_data.get("comments", []) if comment["idea_id"] not in removed
+            ]
+            self._indexes[self.comments_file] = self._build_index(self.comments_file, comments_data)
+            self._save_json(self.comments_file, comments_data)
+            self._publish("ideas_deleted", idea_ids=removed_ids)
+        
+        return {"success": True}  #Успешно
 
     #Получение всех идей (включая скрытые) для администратора
     def get_all_ideas_admin(self) -> List[Dict]:
         return self._load_json(self.ideas_file).get("ideas", [])  #Возвращаем все идеи
     
     #Удаление комментария (админ)
+    @_writes("ideas_file", "comments_file")
     def delete_comment(self, idea_id: int, comment_id: int) -> Dict[str, any]:
-        data = self._load_json(self.ideas_file)  #Загружаем данные идей
-        for idea in data.get("ideas", []):  #Ищем идею
-            if idea["id"] == idea_id:
-                comments = idea.get("comments", [])  #Получаем комментарии идеи
-                for i, comment in enumerate(comments):  #Ищем комментарий
-                    if comment["id"] == comment_id:
-                        comments.pop(i)  #Удаляем комментарий
-                        idea["comments"] = comments  #Обновляем список комментариев
-                        self._save_json(self.ideas_file, data)  #Сохраняем изменения
-                        return {"success": True, "message": f"Комментарий #{comment_id} удалён"}  #Успешно
-                return {"success": False, "message": "Комментарий не найден"}  #Комментарий не найден
-        return {"success": False, "message": "Идея не найдена"}  #Идея не найдена
+        _, ideas_index = self._load_indexed(self.ideas_file)  #Загружаем данные идей
+        if idea_id not in ideas_index["by_id"]:
+            return {"success": False, "message": "Идея не найдена"}  #Идея не найдена
+        data, index = self._load_indexed(self.comments_file)
+        comment = index["by_id"].get(comment_id)
+        if comment is None or comment["idea_id"] != idea_id:  #Комментарий должен принадлежать этой идее
+            return {"success": False, "message": "Комментарий не найден"}  #Комментарий не найден
+        #Удаляем комментарий и сохраняем изменения
+        self._commit(self.comments_file, data, index, {"op": "remove_comment", "comment_id": comment_id})
+        if ideas_index["search"] is not None and ideas_index["search_comments"] is data:
+            ideas_index["search"].remove_comment(idea_id, comment["text"])
+        self._publish("comment_deleted", idea_id=idea_id, comment_id=comment_id,
+                      comment_count=len(index["by_idea"].get(idea_id, ())))
+        return {"success": True, "message": f"Комментарий #{comment_id} удалён"}  #Успешно
+
+    #Массовое удаление комментариев одной записью на диск; comments - пары (id идеи, id комментария).
+    #Возвращает результат по каждому комментарию
+    @_writes("ideas_file", "comments_file")
+    def delete_comments(self, comments: List[tuple]) -> Dict[str, any]:
+        _, ideas_index = self._load_indexed(self.ideas_file)
+        data, index = self._load_indexed(self.comments_file)
+        results, records, removed = [], [], {}
+        for idea_id, comment_id in comments:
+            comment = index["by_id"].get(comment_id)
+            if idea_id not in ideas_index["by_id"]:
+                results.append({"idea_id": idea_id, "comment_id": comment_id, "success": False, "message": "Идея не найдена"})
+            elif comment is None or comment["idea_id"] != idea_id or comment_id in removed:
+                results.append({"idea_id": idea_id, "comment_id": comment_id, "success": False, "message": "Комментарий не найден"})
+            else:
+                results.append({"idea_id": idea_id, "comment_id": comment_id, "success": True})
+                records.append({"op": "remove_comment", "comment_id": comment_id})
+                removed[comment_id] = comment
+        if records:
+            self._commit(self.comments_file, data, index, {"op": "batch", "records": records})
+        search = ideas_index["search"] if ideas_index["search_comments"] is data else None
+        for comment_id, comment in removed.items():
+            if search is not None:
+                search.remove_comment(comment["idea_id"], comment["text"])
+            self._publish("comment_deleted", idea_id=comment["idea_id"], comment_id=comment_id,
+                          comment_count=len(index["by_idea"].get(comment["idea_id"], ())))
+        return {"success": True, "results": results}
+
+    #Страница комментариев идеи по возрастанию id; cursor - из next_cursor предыдущей страницы
+    #Комментарии скрытой идеи отдаются только при include_hidden
+    def get_comments_page(self, idea_id: int, limit: Optional[int] = None, cursor: Optional[str] = None,
+                          include_hidden: bool = False) -> Dict[str, any]:
+        _, ideas_index = self._load_indexed(self.ideas_file)
+        idea = ideas_index["by_id"].get(idea_id)
+        if idea is None or (idea["is_hidden"] and not include_hidden):
+            return {"success": False, "message": "Идея не найдена"}
+        _, index = self._load_indexed(self.comments_file)
+        thread = index["by_idea"].get(idea_id, [])
+        start = 0
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except ValueError as e:
+                return {"success": False, "message": str(e)}
+            if len(after) != 1 or not isinstance(after[0], int):
+                return {"success": False, "message": "Неверный курсор страницы"}
+            start = bisect.bisect_right(thread, after[0], key=lambda comment: comment["id"])
+        end = len(thread) if limit is None else start + limit
+        comments = thread[start:end]
+        return {
+            "success": True,
+            "comments": comments,
+            "total": len(thread),
+            "next_cursor": encode_cursor((comments[-1]["id"],)) if comments and end < len(thread) else None
+        }
 
     #Получение списка категорий
     def get_categories(self) -> List[str]:
         data = self._load_json(self.config_file)  #Загружаем конфигурацию
         return data.get("categories", [])  #Возвращаем список категорий
 
+    #Получение настроек приложения (items_per_page и т.д.)
+    def get_settings(self) -> Dict[str, any]:
+        return self._load_json(self.config_file).get("settings", {})
+
     #Добавление новой категории (админ)
+    @_writes("config_file")
     def add_category(self, category_name: str) -> Dict[str, any]:
         #Проверяем, что название не пустое
         if not category_name.strip():
@@ -452,6 +1335,7 @@ class JSONDatabase:
         return {"success": True, "message": f"Категория '{category_name}' успешно добавлена"}  #Успешно
 
     #Обновление названия категории (админ)
+    @_writes("config_file", "ideas_file")
     def update_category(self, old_name: str, new_name: str) -> Dict[str, any]:
         #Проверяем, что новое название не пустое
         if not new_name.strip():
@@ -485,6 +1369,7 @@ class JSONDatabase:
 
     
     #Удаление категории (админ)
+    @_writes("config_file", "ideas_file")
     def delete_category(self, category_name: str) -> Dict[str, any]:
         data = self._load_json(self.config_file)  # Загружаем конфигурацию
         categories = data.get("categories", [])  # Получаем список категорий
@@ -513,32 +1398,65 @@ class JSONDatabase:
 
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
         """Получение пользователя по ID"""
-        data = self._load_json(self.users_file)
-        for user in data.get("users", []):
-            if user["id"] == user_id:
-                # Создаем копию без пароля
-                user_copy = user.copy()
-                if "password" in user_copy:
-                    del user_copy["password"]
-                if "plain_password" in user_copy:
-                    del user_copy["plain_password"]
-                return user_copy
-        return None
+        _, index = self._load_indexed(self.users_file)
+        user = index["by_id"].get(user_id)
+        if user is None:
+            return None
+        # Создаем копию без пароля
+        user_copy = user.copy()
+        user_copy.pop("password", None)
+        user_copy.pop("plain_password", None)
+        return user_copy
 
-    # Также обновить метод get_idea_by_id для включения информации об авторе
+    def get_users_by_ids(self, user_ids) -> Dict[int, Dict]:
+        """Получение нескольких пользователей (без паролей) из одного снимка users.json: id -> пользователь"""
+        _, index = self._load_indexed(self.users_file)
+        users = {}
+        for user_id in set(user_ids):
+            user = index["by_id"].get(user_id)
+            if user is not None:
+                user = user.copy()
+                user.pop("password", None)
+                user.pop("plain_password", None)
+                users[user_id] = user
+        return users
+
+    #Добавление информации об авторах к списку идей (один запрос пользователей на весь список)
+    def with_authors(self, ideas: List[Dict]) -> List[Dict]:
+        authors = self.get_users_by_ids(idea["author_id"] for idea in ideas if idea.get("author_id"))
+        return attach_authors(ideas, authors)
+
+    #Получение идеи по Id (с информацией об авторе и числом комментариев; сами комментарии -
+    #постранично через get_comments_page)
     def get_idea_by_id(self, idea_id: int) -> Optional[Dict]:
-        data = self._load_json(self.ideas_file)
-        for idea in data.get("ideas", []):
-            if idea["id"] == idea_id:
-                # Добавляем информацию об авторе
-                if idea.get("author_id"):
-                    author = self.get_user_by_id(idea["author_id"])
-                    if author:
-                        idea["author_info"] = {
-                            "id": author["id"],
-                            "username": author.get("username", ""),
-                            "full_name": author.get("full_name", ""),
-                            "role": author.get("role", "user")
-                        }
-                return idea
-        return None
\ No newline at end of file
+        _, index = self._load_indexed(self.ideas_file)
+        idea = index["by_id"].get(idea_id)
+        if idea is None:
+            return None
+        return self.with_authors(self.project_ideas([idea]))[0]
+
+#Файлы данных папки JSON-хранилища и журналы изменений
+DATA_FILES = ("users.json", "ideas.json", "comments.json", "app_config.json")
+JOURNAL_FILES = ("ideas.journal", "comments.journal")
+
+
+#Чтение папки JSON-хранилища без изменений в ней (выгрузка, перенос в SQLite). Конструктор JSONDatabase
+#создает недостающие файлы, переносит старые комментарии и сворачивает журналы - поэтому файлы копируются
+#во временную папку, и JSONDatabase работает с копией. Папка должна существовать и содержать users.json
+#и ideas.json: опечатка в пути не должна молча дать новую пустую базу
+@contextmanager
+def open_read_only(db_folder: str):
+    if not os.path.isdir(db_folder):
+        raise FileNotFoundError(f"Папка {db_folder} не найдена")
+    missing = [name for name in ("users.json", "ideas.json") if not os.path.isfile(os.path.join(db_folder, name))]
+    if missing:
+        raise FileNotFoundError(f"В папке {db_folder} нет {', '.join(missing)}")
+    with tempfile.TemporaryDirectory() as copy_folder:
+        #Журналы копируются раньше снимков: если сервер свернет журнал во время копирования,
+        #новый снимок уже содержит скопированные записи (как в _reload_json)
+        for name in JOURNAL_FILES + DATA_FILES:
+            try:
+                shutil.copyfile(os.path.join(db_folder, name), os.path.join(copy_folder, name))
+            except FileNotFoundError:
+                pass
+        yield JSONDatabase(copy_folder, journal=True)
@@ -0,0 +1,97 @@
+"""
+Внутрипроцессная публикация событий об изменении идей для живого обновления клиентов (SSE).
+
+Хранилище публикует события из своих потоков (publish потокобезопасен), подписчики
+читают их в цикле событий asyncio. У каждого подписчика своя ограниченная очередь:
+медленный клиент не задерживает остальных, а при переполнении получает событие resync
+и перезагружает список целиком.
+"""
+import asyncio
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import serialization
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    #Постановка события в очередь (вызывается в потоке цикла событий подписчика)
+    def _put(self, event: Dict):
+        if self.queue.full():
+            #Клиент не успевает читать: пропущенные события заменяем одним resync
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"id": event["id"], "type": "resync", "data": "{}"})
+        else:
+            self.queue.put_nowait(event)
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None #Событий не было - пора отправить keep-alive
+
+
+class EventBus:
+    def __init__(self, max_queue: int = 100, history: int = 1000):
+        self.max_queue = max_queue #Размер очереди каждого подписчика
+        self._lock = threading.Lock()
+        self._last_id = 0 #Сквозная нумерация событий (id в SSE)
+        self._history = deque(maxlen=history) #Последние события для переподключения с Last-Event-ID
+        #Подписчики по циклам событий: на каждое событие один вызов call_soon_threadsafe на цикл.
+        #Кортежи не изменяются, а заменяются при подписке/отписке, поэтому publish их не копирует
+        self._subscribers: Dict[asyncio.AbstractEventLoop, Tuple[Subscription, ...]] = {}
+
+    #Публикация события. Может вызываться из любого потока; данные сразу сериализуются в JSON
+    #(один раз на все подписчиков и до того, как хранилище снова изменит переданные объекты)
+    def publish(self, event_type: str, **data):
+        payload = serialization.dumps(data).decode("utf-8")
+        with self._lock:
+            self._last_id += 1
+            event = {"id": self._last_id, "type": event_type, "data": payload}
+            self._history.append(event)
+            targets = list(self._subscribers.items())
+        for loop, subscriptions in targets:
+            try:
+                loop.call_soon_threadsafe(self._deliver, subscriptions, event)
+            except RuntimeError:
+                pass #Цикл событий уже закрыт
+
+    @staticmethod
+    def _deliver(subscriptions: Tuple[Subscription, ...], event: Dict):
+        for subscription in subscriptions:
+            subscription._put(event)
+
+    #Подписка в текущем цикле событий; last_event_id - id последнего полученного события
+    #(пропущенные события досылаются из истории, если она их еще хранит, иначе приходит resync)
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(loop, self.max_queue)
+        with self._lock:
+            self._subscribers[loop] = self._subscribers.get(loop, ()) + (subscription,)
+            if last_event_id is not None and last_event_id != self._last_id:
+                if last_event_id < self._last_id and self._history and self._history[0]["id"] <= last_event_id + 1:
+                    for event in self._history:
+                        if event["id"] > last_event_id:
+                            subscription._put(event)
+                else:
+                    #Часть событий уже вытеснена из истории (или сервер перезапущен)
+                    subscription._put({"id": self._last_id, "type": "resync", "data": "{}"})
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = tuple(item for item in self._subscribers.get(subscription.loop, ()) if item is not subscription)
+            if subscriptions:
+                self._subscribers[subscription.loop] = subscriptions
+            else:
+                self._subscribers.pop(subscription.loop, None)
+
+    #Количество активных подписчиков
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscribers.values())
@@ -0,0 +1,47 @@
+"""
+Выгрузка данных JSON-хранилища в читаемом виде (с отступами).
+
+Хранилище пишет файлы компактно (без пробелов), чтобы запись и чтение были быстрее.
+Скрипт сохраняет копии users.json, ideas.json, comments.json и app_config.json с отступами
+(с учетом журнала изменений, если он есть) - для просмотра, сравнения и резервных копий.
+Запуск из папки backend:
+    python export_json.py --out export [--json-folder data] [--compact]
+"""
+import argparse
+import os
+import sys
+
+import serialization
+from database import open_read_only
+
+
+#Выгрузка всех файлов данных в папку target; возвращает {имя файла: размер в байтах}
+def export(json_folder: str, target: str, pretty: bool = True) -> dict:
+    #Журнал изменений учитывается, исходная папка не меняется (см. open_read_only)
+    with open_read_only(json_folder) as source:
+        os.makedirs(target, exist_ok=True)
+        sizes = {}
+        for file_path in (source.users_file, source.ideas_file, source.comments_file, source.config_file):
+            content = serialization.dumps(source._load_json(file_path), pretty=pretty)
+            name = os.path.basename(file_path)
+            with open(os.path.join(target, name), "wb") as f:
+                f.write(content)
+            sizes[name] = len(content)
+    return sizes
+
+
+if __name__ == "__main__":
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Выгрузка данных JSON-хранилища с отступами")
+    parser.add_argument("--json-folder", default=os.path.join(base_dir, "data"))
+    parser.add_argument("--out", required=True, help="папка для выгрузки")
+    parser.add_argument("--compact", action="store_true", help="без отступов (как хранит сервер)")
+    args = parser.parse_args()
+
+    try:
+        sizes = export(args.json_folder, args.out, pretty=not args.compact)
+    except FileNotFoundError as e:
+        print(e)
+        sys.exit(1)
+    for name, size in sizes.items():
+        print(f"{name}: {size} байт")
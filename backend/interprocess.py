@@ -0,0 +1,92 @@
+"""
+Согласование нескольких процессов сервера (uvicorn --workers N), работающих с одной папкой данных.
+
+FileLock - блокировка файла данных: внутри процесса - RLock, между процессами - flock на файле
+<имя>.lock рядом с данными. SharedCounters - общие для всех процессов счетчики версий файлов
+в небольшом файле, отображенном в память: запись увеличивает счетчик своего файла, и остальные
+процессы по нему понимают, что их кэш устарел, не дожидаясь изменения времени файла на диске.
+"""
+import mmap
+import os
+import secrets
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  #Windows: только блокировки внутри процесса
+    fcntl = None
+
+
+class FileLock:
+    def __init__(self, lock_path: str):
+        self.lock_path = lock_path
+        self.thread_lock = threading.RLock()  #Блокировка внутри процесса (повторно входимая)
+        self._fd = None
+        self._depth = 0  #Вложенность захвата текущим потоком; flock берется только на внешнем уровне
+
+    #Захват блокировки для записи: сначала потоки процесса, затем другие процессы
+    def __enter__(self):
+        self.thread_lock.acquire()
+        try:
+            if self._depth == 0 and fcntl is not None:
+                if self._fd is None:
+                    self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | getattr(os, "O_CLOEXEC", 0), 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self.thread_lock.release()
+            raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            #Явное снятие, а не закрытие: дескриптор мог унаследовать дочерний процесс (fork)
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
+        return False
+
+
+class SharedCounters:
+    HEADER = struct.Struct("<Q")  #Эпоха: случайное число, задается при создании файла
+    COUNTER = struct.Struct("<Q")
+
+    def __init__(self, path: str, count: int):
+        self.count = count
+        size = self.HEADER.size + self.COUNTER.size * count
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_CLOEXEC", 0), 0o644)
+        try:
+            #Создание файла и эпохи - под блокировкой, чтобы одновременно стартующие процессы не затерли друг друга
+            with self._locked(fd):
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+                self._map = mmap.mmap(fd, size)
+                if self.HEADER.unpack_from(self._map, 0)[0] == 0:
+                    self.HEADER.pack_into(self._map, 0, secrets.randbits(63) or 1)
+        finally:
+            os.close(fd)  #Отображение в память остается действительным и после закрытия файла
+        #Эпоха отличает счетчики от прежних, если файл версий удалили (ETag не должны совпасть случайно)
+        self.epoch = format(self.HEADER.unpack_from(self._map, 0)[0], "x")
+
+    @staticmethod
+    @contextmanager
+    def _locked(fd: int):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    #Текущее значение счетчика (чтение без блокировок)
+    def get(self, slot: int) -> int:
+        return self.COUNTER.unpack_from(self._map, self.HEADER.size + self.COUNTER.size * slot)[0]
+
+    #Увеличение счетчика; вызывается под блокировкой записи соответствующего файла (FileLock)
+    def increment(self, slot: int) -> int:
+        value = self.get(slot) + 1
+        self.COUNTER.pack_into(self._map, self.HEADER.size + self.COUNTER.size * slot, value)
+        return value
@@ -0,0 +1,407 @@
+"""
+Нагрузочная проверка сервера по HTTP с проверкой целостности данных после нагрузки.
+
+Скрипт запускает приложение из main.py (uvicorn) на свободном порту с пустой временной папкой
+данных, создает пользователей и начальные идеи, после чего сотни клиентов (потоков)
+одновременно входят в систему и выполняют типичную смесь запросов: списки идей, просмотр
+идеи, голоса, комментарии, новые идеи; администраторы одобряют идеи. В конце выводятся
+задержки p50/p95/p99 и пропускная способность по каждому маршруту и проверяется, что:
+votes_for + votes_against = len(voted_users), повторных id и голосов нет, все подтвержденные
+голоса, комментарии и идеи сохранены. Запуск из папки backend:
+    python load_test.py [--clients 200] [--admins 2] [--duration 30] [--workers 1]
+                        [--backend json|sqlite] [--journal] [--rounds 12] [--ideas 50]
+Код выхода 1 - нарушена целостность данных или были ошибки сервера.
+"""
+import argparse
+import csv
+import http.client
+import io
+import json
+import os
+import random
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ADMIN_LOGIN = {"username": "1QsMeP23", "password": "12345"} #Администратор по умолчанию
+
+#Смесь запросов обычного клиента: (действие, вес)
+CLIENT_MIX = [("list", 40), ("view", 15), ("vote", 20), ("comment", 15), ("create", 5), ("comments", 5)]
+
+
+#Свободный порт для сервера
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+#HTTP-клиент одного пользователя: одно постоянное соединение и замеры задержек по маршрутам
+class Client:
+    def __init__(self, port: int, stats: "Stats"):
+        self.port = port
+        self.stats = stats
+        self.token: Optional[str] = None
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    #Запрос к серверу; route - имя маршрута для статистики (без id). Возвращает (статус, тело)
+    def request(self, method: str, path: str, route: str, body=None, raw: bool = False):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = json.dumps(body) if body is not None else None
+        started = time.perf_counter()
+        for attempt in range(2):
+            reused = self._conn is not None
+            try:
+                if self._conn is None:
+                    self._conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=120)
+                self._conn.request(method, path, body=payload, headers=headers)
+                response = self._conn.getresponse()
+                data = response.read()
+                status = response.status
+                break
+            except (OSError, http.client.HTTPException) as e:
+                self.close() #Соединение разорвано - при следующем запросе откроем новое
+                #Сервер мог закрыть простаивающее соединение: GET безопасно повторить на новом
+                if reused and method == "GET" and attempt == 0:
+                    continue
+                self.stats.record(route, 0, time.perf_counter() - started, f"{type(e).__name__}: {e}")
+                return 0, None
+        self.stats.record(route, status, time.perf_counter() - started, None if status < 500 else data[:200])
+        if raw:
+            return status, data.decode("utf-8")
+        return status, json.loads(data) if data else None
+
+    def login(self, username: str, password: str) -> Dict:
+        status, result = self.request("POST", "/login", "POST /login", {"username": username, "password": password})
+        if status != 200 or not result.get("success"):
+            raise RuntimeError(f"Не удалось войти как {username}: {status} {result}")
+        self.token = result["token"]
+        return result
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+#Задержки и коды ответов по маршрутам (общие для всех клиентов)
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.errors: List[str] = [] #Первые ошибки сервера и сети (для отчета)
+
+    def record(self, route: str, status: int, seconds: float, error=None):
+        with self._lock:
+            self.latencies[route].append(seconds)
+            self.statuses[route][status] += 1
+            if error is not None and len(self.errors) < 20:
+                self.errors.append(f"{route}: {status} {error}")
+
+    #Строки отчета: маршрут, число запросов, ошибки 5xx/сети, запросов в секунду, p50/p95/p99 в мс
+    def report(self, elapsed: float) -> List[str]:
+        lines = [f"{'маршрут':<34} {'запросов':>9} {'ошибок':>7} {'в сек':>8} {'p50':>8} {'p95':>8} {'p99':>8}"]
+        total = 0
+        for route in sorted(self.latencies):
+            times = sorted(self.latencies[route])
+            failed = sum(count for status, count in self.statuses[route].items() if status == 0 or status >= 500)
+            total += len(times)
+            lines.append(
+                f"{route:<34} {len(times):>9} {failed:>7} {len(times) / elapsed:>8.1f} "
+                + " ".join(f"{percentile(times, p) * 1000:>8.1f}" for p in (50, 95, 99))
+            )
+        lines.append(f"{'всего':<34} {total:>9} {'':>7} {total / elapsed:>8.1f}")
+        return lines
+
+    def server_errors(self) -> int:
+        return sum(count for statuses in self.statuses.values()
+                   for status, count in statuses.items() if status == 0 or status >= 500)
+
+
+#Процентиль по отсортированному списку (ближайший ранг)
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+#Что сервер подтвердил клиентам: по этим данным проверяется целостность после нагрузки
+class Ledger:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.votes: Dict[int, Dict[int, str]] = defaultdict(dict) #id идеи -> {id пользователя: голос}
+        self.comments: Dict[int, List[str]] = defaultdict(list) #id идеи -> тексты подтвержденных комментариев
+        self.created_ids: List[int] = [] #id созданных идей (в порядке ответов)
+        self.approved: set = set()
+
+    def idea_ids(self) -> List[int]:
+        with self._lock:
+            return list(self.created_ids)
+
+
+#Цикл обычного пользователя: вход (все одновременно), представление, смесь запросов до истечения времени
+def user_loop(client: Client, credentials: Dict, ledger: Ledger, start: threading.Barrier, deadline: list,
+              think: float, seed: int):
+    rng = random.Random(seed)
+    start.wait()
+    result = client.login(credentials["username"], credentials["password"])
+    user_id = result["user"]["id"]
+    if result.get("needs_introduction"):
+        client.request("POST", "/complete-introduction", "POST /complete-introduction",
+                       {"full_name": f"Сотрудник {credentials['username']}"})
+    actions, weights = zip(*CLIENT_MIX)
+    voted = set()
+    sequence = 0
+    while time.monotonic() < deadline[0]:
+        action = rng.choices(actions, weights)[0]
+        idea_ids = ledger.idea_ids()
+        idea_id = rng.choice(idea_ids)
+        if action == "list":
+            client.request("GET", f"/ideas?filter={rng.choice(['new', 'popular', 'open'])}&limit=20&view=summary",
+                           "GET /ideas")
+        elif action == "view":
+            client.request("GET", f"/idea/{idea_id}", "GET /idea/{id}")
+        elif action == "comments":
+            client.request("GET", f"/idea/{idea_id}/comments?limit=20", "GET /idea/{id}/comments")
+        elif action == "vote":
+            candidates = [i for i in idea_ids if i not in voted]
+            if not candidates:
+                continue
+            idea_id = rng.choice(candidates)
+            vote = rng.choice(["for", "against"])
+            status, _ = client.request("POST", f"/idea/{idea_id}/vote", "POST /idea/{id}/vote", {"vote": vote})
+            voted.add(idea_id) #Повторно за эту идею не голосуем, даже если ответ не получен
+            if status == 200:
+                with ledger._lock:
+                    ledger.votes[idea_id][user_id] = vote
+        elif action == "comment":
+            sequence += 1
+            text = f"Нагрузочный комментарий {credentials['username']}-{sequence}"
+            status, result = client.request("POST", f"/idea/{idea_id}/comment", "POST /idea/{id}/comment",
+                                            {"text": text})
+            if status == 200 and result.get("success"):
+                with ledger._lock:
+                    ledger.comments[idea_id].append(text)
+        elif action == "create":
+            status, result = client.request("POST", "/idea", "POST /idea", new_idea(rng))
+            if status == 200:
+                with ledger._lock:
+                    ledger.created_ids.append(result["idea_id"])
+        if think:
+            time.sleep(rng.uniform(0, 2 * think))
+
+
+#Цикл администратора: просмотр всех идей и одобрение
+def admin_loop(client: Client, ledger: Ledger, start: threading.Barrier, deadline: list, think: float, seed: int):
+    rng = random.Random(seed)
+    start.wait()
+    while time.monotonic() < deadline[0]:
+        client.request("GET", "/admin/ideas?limit=50&view=summary", "GET /admin/ideas")
+        idea_id = rng.choice(ledger.idea_ids())
+        status, _ = client.request("POST", f"/admin/idea/{idea_id}/approve", "POST /admin/idea/{id}/approve")
+        if status == 200:
+            with ledger._lock:
+                ledger.approved.add(idea_id)
+        time.sleep(rng.uniform(0, 2 * max(think, 0.05))) #Администраторы действуют реже пользователей
+
+
+def new_idea(rng: random.Random) -> Dict:
+    number = rng.randint(1, 10 ** 9)
+    return {"title": f"Идея {number}", "short_description": "Краткое описание",
+            "full_description": "Полное описание идеи для нагрузочной проверки", "expected_effect": "Экономия",
+            "category": rng.choice(["IT", "Документооборот", "Производство", "HR"])}
+
+
+#Все страницы списка: path - адрес с limit, key - поле со списком в ответе
+def fetch_all(client: Client, path: str, route: str, key: str) -> List[Dict]:
+    items, cursor = [], None
+    while True:
+        status, result = client.request("GET", path + (f"&cursor={cursor}" if cursor else ""), route)
+        if status != 200:
+            raise RuntimeError(f"{route}: ответ {status} {result}")
+        items.extend(result[key])
+        cursor = result.get("next_cursor")
+        if not cursor:
+            return items
+
+
+#Проверка целостности данных после нагрузки; возвращает список нарушений
+def check_invariants(admin: Client, ledger: Ledger) -> List[str]:
+    errors = []
+    ideas = fetch_all(admin, "/admin/ideas?limit=100", "check /admin/ideas", "ideas")
+    by_id = {}
+    for idea in ideas:
+        if idea["id"] in by_id:
+            errors.append(f"идея {idea['id']} встречается в списке дважды")
+        by_id[idea["id"]] = idea
+    if len(set(ledger.created_ids)) != len(ledger.created_ids):
+        errors.append("сервер выдал один id нескольким новым идеям")
+    for idea_id in ledger.created_ids:
+        if idea_id not in by_id:
+            errors.append(f"созданная идея {idea_id} потеряна")
+    for idea_id, idea in by_id.items():
+        voters = idea["voted_users"]
+        if idea["votes_for"] + idea["votes_against"] != len(voters):
+            errors.append(f"идея {idea_id}: голосов {idea['votes_for']}+{idea['votes_against']}, "
+                          f"проголосовавших {len(voters)}")
+        if len(set(voters)) != len(voters):
+            errors.append(f"идея {idea_id}: повторные голоса одного пользователя")
+        expected = ledger.votes.get(idea_id, {})
+        if set(voters) != set(expected):
+            errors.append(f"идея {idea_id}: потеряно голосов {len(set(expected) - set(voters))}, "
+                          f"лишних {len(set(voters) - set(expected))}")
+        expected_for = sum(1 for vote in expected.values() if vote == "for")
+        if idea["votes_for"] != expected_for:
+            errors.append(f"идея {idea_id}: голосов за {idea['votes_for']}, подтверждено {expected_for}")
+        if idea_id in ledger.approved and not idea["is_approved"]:
+            errors.append(f"идея {idea_id}: одобрение потеряно")
+        comments = fetch_all(admin, f"/admin/idea/{idea_id}/comments?limit=100", "check /admin/idea/{id}/comments",
+                             "comments")
+        comment_ids = [comment["id"] for comment in comments]
+        if len(set(comment_ids)) != len(comment_ids):
+            errors.append(f"идея {idea_id}: повторные id комментариев")
+        texts = [comment["text"] for comment in comments]
+        missing = set(ledger.comments.get(idea_id, [])) - set(texts)
+        if missing:
+            errors.append(f"идея {idea_id}: потеряно комментариев {len(missing)}")
+        if len(texts) != len(ledger.comments.get(idea_id, [])):
+            errors.append(f"идея {idea_id}: комментариев {len(texts)}, подтверждено {len(ledger.comments.get(idea_id, []))}")
+    return errors
+
+
+#Запуск сервера (uvicorn main:app) с временной папкой данных; возвращает процесс после ответа /health
+def start_server(port: int, folder: str, args) -> subprocess.Popen:
+    env = dict(os.environ, DB_FOLDER=folder, DB_PATH=os.path.join(folder, "ideas.sqlite3"),
+               AUTH_SECRET=secrets.token_urlsafe(32))
+    env.pop("DB_BACKEND", None)
+    if args.backend == "sqlite":
+        env["DB_BACKEND"] = "sqlite"
+    env["DB_JOURNAL"] = "1" if args.journal else "0"
+    if args.rounds:
+        env["PASSWORD_ROUNDS"] = str(args.rounds)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Сервер завершился с кодом {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Сервер не ответил на /health за 60 секунд")
+
+
+def run(args) -> int:
+    folder = tempfile.mkdtemp(prefix="load_test_")
+    port = free_port()
+    server = start_server(port, folder, args)
+    stats = Stats()
+    try:
+        #Подготовка: пользователи (CSV с паролями) и начальные идеи
+        setup = Client(port, Stats())
+        setup.login(**ADMIN_LOGIN)
+        status, text = setup.request("POST", f"/admin/provision-users?count={args.clients}",
+                                     "POST /admin/provision-users", raw=True)
+        if status != 200:
+            raise RuntimeError(f"Не удалось создать пользователей: {status} {text}")
+        users = list(csv.DictReader(io.StringIO(text)))
+        ledger = Ledger()
+        rng = random.Random(0)
+        for _ in range(args.ideas):
+            ledger.created_ids.append(setup.request("POST", "/idea", "POST /idea", new_idea(rng))[1]["idea_id"])
+
+        deadline = [float("inf")] #Устанавливается, когда все клиенты готовы стартовать
+        start = threading.Barrier(len(users) + args.admins + 1)
+        failures = []
+
+        def guarded(target, *target_args):
+            try:
+                target(*target_args)
+            except Exception as e:
+                failures.append(f"{type(e).__name__}: {e}")
+            finally:
+                target_args[0].close()
+
+        threads = []
+        for i, credentials in enumerate(users):
+            threads.append(threading.Thread(target=guarded, args=(
+                user_loop, Client(port, stats), credentials, ledger, start, deadline, args.think, i)))
+        for i in range(args.admins):
+            admin_client = Client(port, stats)
+            admin_client.login(**ADMIN_LOGIN)
+            threads.append(threading.Thread(target=guarded, args=(
+                admin_loop, admin_client, ledger, start, deadline, args.think, -1 - i)))
+        for thread in threads:
+            thread.start()
+        deadline[0] = time.monotonic() + args.duration
+        started = time.monotonic()
+        start.wait() #Все клиенты входят одновременно (всплеск входов)
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        print(f"Клиентов: {len(users)}, администраторов: {args.admins}, процессов сервера: {args.workers}, "
+              f"хранилище: {args.backend}{' (журнал)' if args.journal else ''}, время: {elapsed:.1f} с")
+        for line in stats.report(elapsed):
+            print(line)
+
+        errors = check_invariants(setup, ledger)
+        setup.close()
+        if failures:
+            errors.extend(f"клиент остановлен: {failure}" for failure in failures[:10])
+        if stats.server_errors():
+            errors.append(f"ошибок сервера и сети: {stats.server_errors()}")
+            errors.extend(stats.errors)
+        confirmed_votes = sum(len(votes) for votes in ledger.votes.values())
+        confirmed_comments = sum(len(texts) for texts in ledger.comments.values())
+        print(f"Подтверждено: голосов {confirmed_votes}, комментариев {confirmed_comments}, "
+              f"идей {len(ledger.created_ids)}, одобрений {len(ledger.approved)}")
+        if errors:
+            print("Нарушения:")
+            for error in errors:
+                print(" -", error)
+            return 1
+        print("OK: данные целы")
+        return 0
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка сервера по HTTP")
+    parser.add_argument("--clients", type=int, default=200, help="число одновременных пользователей")
+    parser.add_argument("--admins", type=int, default=2, help="число одновременных администраторов")
+    parser.add_argument("--duration", type=float, default=30, help="длительность нагрузки, секунд")
+    parser.add_argument("--think", type=float, default=0.0, help="средняя пауза клиента между запросами, секунд")
+    parser.add_argument("--ideas", type=int, default=50, help="идей до начала нагрузки")
+    parser.add_argument("--workers", type=int, default=1, help="процессов сервера (uvicorn --workers)")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--journal", action="store_true", help="режим журнала JSONDatabase")
+    parser.add_argument("--rounds", type=int, default=None, help="стоимость bcrypt (по умолчанию - как у сервера)")
+    sys.exit(run(parser.parse_args()))
@@ -1,10 +1,25 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from typing import List, Optional
 from database import JSONDatabase
+from sqlite_database import SQLiteDatabase
+from async_storage import AsyncStorage
+from events import EventBus
+from metrics import Metrics, MetricsMiddleware, hasher_collector
+from tracing import TraceMiddleware
+import serialization
+from passwords import PasswordHasher
 from auth import AuthSystem
-from admin import AdminSystem
+from admin import AdminSystem, MAX_GENERATED_USERS
+import csv
+import hmac
+import io
 import logging
+import os
 import sys
 import uvicorn
 
@@ -12,13 +27,44 @@ import uvicorn
 logging.getLogger("uvicorn").setLevel(logging.WARNING)  # Уменьшаем логи uvicorn
 logging.getLogger("fastapi").setLevel(logging.WARNING)  # Уменьшаем логи fastapi
 
+# Ответы API сериализуются библиотекой из serialization.py (orjson, если установлена) в компактный JSON
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return serialization.dumps(content)
+
 # Создание экземпляра FastAPI приложения
-app = FastAPI(title="Idea Management System")
+app = FastAPI(title="Idea Management System", default_response_class=FastJSONResponse)
 
 # Инициализация компонентов системы
-db = JSONDatabase()  # Создаем базу данных
+# DB_BACKEND=sqlite переключает хранилище на SQLite (данные переносятся скриптом migrate_json_to_sqlite.py)
+# DB_JOURNAL=1 включает журнал изменений идей вместо перезаписи ideas.json при каждом голосе
+# DB_FOLDER - папка с JSON-файлами (по умолчанию backend/data), DB_PATH - файл базы SQLite
+# DB_PRETTY=1 - JSON-файлы с отступами (по умолчанию компактные; читаемая копия - скрипт export_json.py)
+# METRICS_TOKEN - токен сборщика метрик для /metrics (без него метрики доступны только администратору)
+# AUTH_SECRET - ключ подписи токенов (по умолчанию - файл auth_secret в папке данных, создается при первом запуске)
+# Пароли хешируются bcrypt в пуле процессов: HASH_WORKERS процессов, стоимость PASSWORD_ROUNDS,
+# очередь не длиннее HASH_QUEUE задач (см. passwords.py)
+events = EventBus()  # Шина событий об изменениях идей для живого обновления клиентов (/events)
+metrics = Metrics()  # Метрики запросов, хранилища и хешера паролей (/metrics)
+hasher = PasswordHasher()
+hasher.start()  # Процессы хеширования запускаются до создания хранилища и потоков сервера
+if os.environ.get("DB_BACKEND") == "sqlite":
+    db = SQLiteDatabase(os.environ.get("DB_PATH"), events=events, hasher=hasher)  # Создаем базу данных SQLite
+else:
+    db = JSONDatabase(os.environ.get("DB_FOLDER"), journal=os.environ.get("DB_JOURNAL") == "1", events=events, hasher=hasher,
+                      metrics=metrics, pretty=os.environ.get("DB_PRETTY") == "1")  # Создаем базу данных
 auth = AuthSystem(db)  # Создаем систему аутентификации с привязкой к БД
 admin = AdminSystem(db, auth)  # Создаем систему администратора
+# Асинхронный доступ к БД: файловые операции выполняются в отдельном пуле потоков (DB_WORKERS),
+# поэтому эндпоинты объявлены как async def и не занимают потоки обработки запросов
+storage = AsyncStorage(db)
+metrics.add_collector(hasher_collector(hasher))
+
+# Остановка пула хранилища при завершении сервера (дожидаемся незавершенных записей)
+@app.on_event("shutdown")
+def shutdown_storage():
+    storage.shutdown()
+    hasher.shutdown()
 
 # Настройка CORS (Cross-Origin Resource Sharing) для разрешения запросов из браузера
 app.add_middleware(
@@ -28,6 +74,142 @@ app.add_middleware(
     allow_headers=["*"],  # Разрешаем все заголовки
 )
 
+# Трассировка хранилища в запросе: заголовок Server-Timing по X-Debug-Timing: 1 или ?debug_timing=1,
+# запросы дольше SLOW_REQUEST_MS мс пишутся в лог (см. tracing.py)
+app.add_middleware(TraceMiddleware)
+
+# Учет запросов для /metrics (добавлен последним - внешний слой, время включает все остальные middleware)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+# Максимальный размер страницы для списков с постраничным выводом
+MAX_PAGE_SIZE = 100
+
+# Размер страницы: явный limit или settings.items_per_page из конфигурации, если клиент передал только курсор.
+# Без limit и cursor возвращается весь список (прежний формат ответа)
+async def page_limit(limit: Optional[int], cursor: Optional[str]) -> Optional[int]:
+    if limit is None and cursor is None:
+        return None
+    return limit or (await storage.get_settings()).get("items_per_page", 20)
+
+# Проекция списка идей: к идеям добавляется comment_count (сами комментарии - через /idea/{id}/comments),
+# view=summary - краткие карточки (без описаний и списка голосовавших),
+# fields=id,title,... - только перечисленные поля, user_id - флаг has_voted для этого пользователя (из токена)
+async def project_ideas(ideas: list, view: str, fields: Optional[str], user_id: Optional[int]) -> list:
+    return await storage.project_ideas(ideas, view == "summary", user_id, parse_fields(fields))
+
+# Список полей из параметра fields=id,title,... (None - все поля)
+def parse_fields(fields: Optional[str]) -> Optional[list]:
+    return [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+
+# Условный GET: ETag - версия данных, от которых зависит ответ (names - "ideas", "comments", "users", "config").
+# Если клиент прислал тот же ETag в If-None-Match, сразу отвечаем 304 без загрузки и сериализации данных
+# Вызывается в цикле событий: data_version обоих хранилищ не берет блокировок и не обращается к базе.
+# negotiated=True - формат ответа выбирается по Accept (JSON или NDJSON, см. stream_listing): у форматов разные
+# ETag и ответ помечается Vary: Accept, чтобы кэш не отдал тело одного формата на запрос другого.
+# personal=True - ответ зависит от пользователя из токена (has_voted), user - этот пользователь (None - анонимный):
+# ETag свой у каждого пользователя, ответ помечается Vary: Authorization
+def not_modified(request: Request, response: Response, *names: str, negotiated: bool = False,
+                 personal: bool = False, user: Optional[dict] = None) -> Optional[Response]:
+    version = db.data_version(*names)
+    headers = {"Cache-Control": "no-cache"}  # Браузер хранит ответ, но всегда сверяет ETag
+    vary = []
+    if negotiated:
+        version += "-ndjson" if wants_ndjson(request) else ""
+        vary.append("Accept")
+    if personal:
+        version += f"-u{user['id']}" if user is not None else ""
+        vary.append("Authorization")
+    if vary:
+        headers["Vary"] = ", ".join(vary)
+    headers["ETag"] = etag = f'W/"{version}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# Ответ с данными хранилища без обхода jsonable_encoder: данные уже состоят только из типов JSON,
+# поэтому сразу сериализуются. Заголовки (ETag, Cache-Control), выставленные в response, переносятся в ответ
+def json_response(response: Response, content) -> FastJSONResponse:
+    return FastJSONResponse(content, headers=dict(response.headers))
+
+# Записей в одной порции потоковой выгрузки (одно обращение к хранилищу и одна сериализация)
+STREAM_CHUNK = 500
+
+# Типы NDJSON в заголовке Accept
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson")
+
+# Просит ли клиент NDJSON (заголовок Accept)
+def wants_ndjson(request: Request) -> bool:
+    accept = [media_type.split(";")[0].strip() for media_type in request.headers.get("accept", "").split(",")]
+    return any(media_type in NDJSON_TYPES for media_type in accept)
+
+# Потоковая выгрузка полного списка (идеи, пользователи): хранилище отдает его порциями по курсору,
+# каждая порция сериализуется отдельно и сразу отправляется клиенту. Память не растет с размером списка,
+# а первая порция уходит, не дожидаясь остальных. fetch(limit, cursor) - страница вида
+# {"success", key: [...], "next_cursor"}, transform - обработка записей порции (в потоке хранилища).
+# Формат по заголовку Accept: application/x-ndjson - по записи в строке, иначе прежний JSON {"success", key: [...]}
+# (ETag и Vary для таких маршрутов - not_modified с negotiated=True)
+async def stream_listing(request: Request, response: Response, key: str, fetch, transform=None) -> StreamingResponse:
+    ndjson = wants_ndjson(request)
+
+    def encode_chunk(cursor: Optional[str], first: bool) -> tuple:
+        result = fetch(STREAM_CHUNK, cursor)
+        if not result["success"]:
+            raise HTTPException(status_code=400, detail=result["message"])
+        items = result[key] if transform is None else transform(result[key])
+        if ndjson:
+            return b"".join(serialization.dumps(item) + b"\n" for item in items), result["next_cursor"]
+        chunk = b",".join(serialization.dumps(item) for item in items)
+        return (chunk if first or not chunk else b"," + chunk), result["next_cursor"]
+
+    # Первая порция - до начала ответа: ошибка хранилища еще может стать ответом 400
+    first_chunk, first_cursor = await storage.run(encode_chunk, None, True)
+
+    async def body():
+        if not ndjson:
+            yield b'{"success":true,"next_cursor":null,"' + key.encode("ascii") + b'":['
+        chunk, cursor, first = first_chunk, first_cursor, not first_chunk
+        yield chunk
+        while cursor is not None:
+            chunk, cursor = await storage.run(encode_chunk, cursor, first)
+            first = first and not chunk
+            yield chunk
+        if not ndjson:
+            yield b"]}"
+
+    media_type = "application/x-ndjson" if ndjson else "application/json"
+    return StreamingResponse(body(), media_type=media_type, headers=dict(response.headers))
+
+# Аутентификация запросов: клиент передает токен, полученный при входе, в заголовке Authorization: Bearer.
+# Пользователь определяется по подписанному токену в каждом запросе - сессий на сервере нет,
+# поэтому сервер можно запускать в нескольких процессах (uvicorn --workers N)
+bearer_scheme = HTTPBearer(auto_error=False)
+
+# Зависимость: пользователь из токена запроса (401, если токена нет, он неверен или истек)
+async def current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> dict:
+    user = await storage.run(auth.verify_token, credentials.credentials) if credentials else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="Не авторизован", headers={"WWW-Authenticate": "Bearer"})
+    return user
+
+# Зависимость для публичных эндпоинтов: пользователь из токена, если он передан
+# (None - запрос без токена или с неверным токеном, отвечаем как анонимному)
+async def optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> Optional[dict]:
+    return await storage.run(auth.verify_token, credentials.credentials) if credentials else None
+
+# Зависимость для эндпоинтов администратора (403 для остальных пользователей)
+async def admin_user(user: dict = Depends(current_user)) -> dict:
+    if user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Доступ запрещён. Требуются права администратора.")
+    return user
+
+# ID пользователя, от имени которого выполняется действие: всегда из токена.
+# Старые клиенты передают ID и в теле запроса - он должен совпадать с токеном
+def acting_user_id(user: dict, claimed_id: Optional[int]) -> int:
+    if claimed_id is not None and claimed_id != user["id"]:
+        raise HTTPException(status_code=403, detail="Нельзя действовать от имени другого пользователя")
+    return user["id"]
+
 # Модели данных (Data Transfer Objects) для валидации входящих запросов
 
 # Модель для запроса входа в систему
@@ -35,14 +217,14 @@ class LoginRequest(BaseModel):
     username: str  # Имя пользователя
     password: str  # Пароль
 
-# Модель для запроса голосования
+# Модель для запроса голосования (пользователь определяется по токену; user_id, если передан, должен совпадать)
 class VoteRequest(BaseModel):
-    user_id: int   # ID пользователя
+    user_id: Optional[int] = None  # ID пользователя
     vote: str      # Тип голоса за или против
 
 # Модель для запроса добавления комментария
 class CommentRequest(BaseModel):
-    user_id: int  # ID пользователя
+    user_id: Optional[int] = None  # ID пользователя
     text: str     # Текст комментария
 
 # Модель для запроса создания идеи
@@ -52,7 +234,7 @@ class IdeaCreateRequest(BaseModel):
     full_description: str    # Полное описание
     expected_effect: str     # Ожидаемый эффект
     category: str            # Категория
-    author_id: int           # ID автора
+    author_id: Optional[int] = None  # ID автора (определяется по токену)
 
 # Модель для запроса завершения знакомства (ввод ФИО)
 class IntroductionRequest(BaseModel):
@@ -74,22 +256,31 @@ class CategoryUpdateRequest(BaseModel):
 class CategoryDeleteRequest(BaseModel):
     name: str  # Название категории для удаления
 
+# Модели для массовой модерации
+class BulkIdeasRequest(BaseModel):
+    action: str          # approve, hide или unhide
+    idea_ids: List[int]  # ID идей
+
+class CommentRef(BaseModel):
+    idea_id: int     # ID идеи
+    comment_id: int  # ID комментария
+
+class BulkCommentsDeleteRequest(BaseModel):
+    comments: List[CommentRef]  # Удаляемые комментарии
+
 # Эндпоинт для входа в систему
 @app.post("/login")
-def login(login_data: LoginRequest):
-    # Вызываем метод аутентификации с переданными данными
-    result = auth.login(login_data.username, login_data.password)
+async def login(login_data: LoginRequest):
+    # Вызываем метод аутентификации с переданными данными. Вход выполняется не в пуле хранилища:
+    # проверка пароля ждет процесс хеширования, и всплеск входов не должен занимать потоки хранилища
+    result = await run_in_threadpool(auth.login, login_data.username, login_data.password)
     return result
 
 # Эндпоинт для завершения знакомства (ввод ФИО)
 @app.post("/complete-introduction")
-def complete_introduction(data: IntroductionRequest):
-    # Проверяем, авторизован ли пользователь
-    if not auth.current_user:
-        raise HTTPException(status_code=401, detail="Не авторизован")
-    
+async def complete_introduction(data: IntroductionRequest, user: dict = Depends(current_user)):
     # Вызываем метод завершения знакомства
-    result = auth.complete_introduction(data.full_name)
+    result = await storage.run(auth.complete_introduction, user, data.full_name)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -99,13 +290,9 @@ def complete_introduction(data: IntroductionRequest):
 
 # Эндпоинт для смены пароля администратора
 @app.post("/change-password")
-def change_password(data: ChangePasswordRequest):
-    # Проверяем, авторизован ли пользователь
-    if not auth.current_user:
-        raise HTTPException(status_code=401, detail="Не авторизован")
-    
-    # Вызываем метод смены пароля
-    result = auth.change_admin_password(data.current_password, data.new_password)
+async def change_password(data: ChangePasswordRequest, user: dict = Depends(current_user)):
+    # Вызываем метод смены пароля (проверка и хеширование ждут процесс хеширования - вне пула хранилища)
+    result = await run_in_threadpool(auth.change_admin_password, user, data.current_password, data.new_password)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -115,24 +302,15 @@ def change_password(data: ChangePasswordRequest):
 
 # Эндпоинт для выхода из системы
 @app.post("/logout")
-def logout():
-    # Вызываем метод выхода
-    return auth.logout()
+async def logout(user: dict = Depends(current_user)):
+    # Вызываем метод выхода (клиент удаляет токен)
+    return await storage.run(auth.logout, user)
 
 # Эндпоинт для генерации случайных пользователей (только админ) - СТАРЫЙ МЕТОД
 @app.post("/admin/generate-users")
-def generate_random_users(count: int = 10):
-    # Устанавливаем текущего пользователя как администратора (для обхода проверок)
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def generate_random_users(count: int = 10, user: dict = Depends(admin_user)):
     # Вызываем метод генерации пользователей (старый)
-    result = admin.generate_random_users(count)
+    result = await storage.run(admin.generate_random_users, user, count)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -142,36 +320,46 @@ def generate_random_users(count: int = 10):
 
 # Эндпоинт для генерации пользователей с возвратом паролей (НОВЫЙ МЕТОД)
 @app.post("/admin/generate-users-with-passwords")
-def generate_users_with_passwords(count: int = 10):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def generate_users_with_passwords(count: int = 10, user: dict = Depends(admin_user)):
     # Вызываем НОВЫЙ метод из admin.py
-    result = admin.generate_random_users_with_passwords(count)
+    result = await storage.run(admin.generate_random_users_with_passwords, user, count)
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     
     return result
 
+# Строки CSV с учетными данными созданных пользователей (отдаются порциями, а не одной строкой)
+def credentials_csv(users: list, chunk_size: int = 1000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["id", "username", "password"])
+    for start in range(0, len(users), chunk_size):
+        writer.writerows([user["id"], user["username"], user["password"]] for user in users[start:start + chunk_size])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+# Эндпоинт для массового создания пользователей (только админ): все пользователи создаются одной записью,
+# логины и пароли возвращаются в CSV (id,username,password); в базе пароли хранятся только в виде хешей
+@app.post("/admin/provision-users")
+async def provision_users(count: int = Query(..., ge=1, le=MAX_GENERATED_USERS), role: str = "user", user: dict = Depends(admin_user)):
+    result = await storage.run(admin.provision_users, user, count, role)
+    
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    return StreamingResponse(
+        credentials_csv(result["users"]),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="users.csv"'}
+    )
+
 # Эндпоинт для хеширования всех временных паролей
 @app.post("/admin/hash-temp-passwords")
-def hash_temp_passwords():
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
-    result = admin.hash_all_temp_passwords()
+async def hash_temp_passwords(user: dict = Depends(admin_user)):
+    result = await storage.run(admin.hash_all_temp_passwords, user)
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
@@ -180,16 +368,11 @@ def hash_temp_passwords():
 
 # Эндпоинт для получения пользователей с временными паролями
 @app.get("/admin/temp-password-users")
-def get_temp_password_users():
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
-    result = admin.get_temp_password_users()
+async def get_temp_password_users(request: Request, response: Response, user: dict = Depends(admin_user)):
+    unchanged = not_modified(request, response, "users")  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
+    result = await storage.run(admin.get_temp_password_users, user)
     
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
@@ -197,75 +380,97 @@ def get_temp_password_users():
     return result
 
 # Эндпоинт для получения списка идей (публичный)
+# filter: new - новые первые, popular - по разнице голосов, approved - одобренные, open - открытые для обсуждения.
+# С параметрами limit/cursor возвращается страница {"ideas": [...], "next_cursor": ...}, без них - весь список
+# view=summary и fields уменьшают ответ (см. project_ideas); has_voted - для пользователя из токена, если он передан
 @app.get("/ideas")
-def list_ideas(filter: str = "open"):
-    # Получаем все идеи и фильтруем скрытые
-    ideas = [i for i in db.get_all_ideas() if not i["is_hidden"]]
-    
-    # Применяем фильтры сортировки
-    if filter == "new":
-        # Сортировка по дате создания (новые первые)
-        ideas.sort(key=lambda x: x["created_at"], reverse=True)
-    elif filter == "popular":
-        # Сортировка по популярности (разница между голосами "за" и "против")
-        ideas.sort(key=lambda x: x["votes_for"] - x["votes_against"], reverse=True)
-    elif filter == "approved":
-        # Только одобренные идеи
-        ideas = [i for i in ideas if i["is_approved"]]
-    elif filter == "open":
-        # Только неодобренные идеи (открытые для обсуждения)
-        ideas = [i for i in ideas if not i["is_approved"]]
-    
-    return ideas
+async def list_ideas(request: Request, response: Response, filter: str = "open", limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+               view: str = "full", fields: Optional[str] = None, user: Optional[dict] = Depends(optional_user)):
+    unchanged = not_modified(request, response, "ideas", "comments", "config", personal=True, user=user)  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
+    # Получаем нужную страницу видимых идей в порядке фильтра
+    result = await storage.get_ideas_page(filter, await page_limit(limit, cursor), cursor)
+    
+    # Если курсор неверный, возвращаем ошибку
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    ideas = await project_ideas(result["ideas"], view, fields, user["id"] if user else None)
+    if limit is None and cursor is None:
+        return json_response(response, ideas)  # Прежний формат - просто список идей
+    return json_response(response, {"ideas": ideas, "next_cursor": result["next_cursor"]})
+
+# Полнотекстовый поиск по идеям (заголовок, описания, ожидаемый эффект и комментарии), скрытые идеи не ищутся
+# Результаты упорядочены по релевантности; limit/cursor - постраничный вывод
+@app.get("/ideas/search")
+async def search_ideas(request: Request, response: Response, query: str = "", limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                 view: str = "full", fields: Optional[str] = None, user: Optional[dict] = Depends(optional_user)):
+    unchanged = not_modified(request, response, "ideas", "comments", "config", personal=True, user=user)  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
+    result = await storage.search_ideas(query, await page_limit(limit, cursor), cursor)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    return json_response(response, {**result, "ideas": await project_ideas(result["ideas"], view, fields,
+                                                                          user["id"] if user else None),
+                                    "search_query": query})
 
 # Эндпоинт для получения всех идей (включая скрытые) - только для админа
 @app.get("/admin/ideas")
-def list_all_ideas_admin():
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin", 
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
-    # Получаем все идеи через админ-систему
-    result = admin.get_all_ideas_admin()
+async def list_all_ideas_admin(request: Request, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None,
+                         view: str = "full", fields: Optional[str] = None, user: dict = Depends(admin_user)):
+    unchanged = not_modified(request, response, "ideas", "comments", "config", negotiated=True)  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
+    # Полный список - потоком порциями (JSON или NDJSON, см. stream_listing)
+    if limit is None and cursor is None:
+        field_list = parse_fields(fields)
+        return await stream_listing(
+            request, response, "ideas",
+            lambda chunk_limit, chunk_cursor: admin.get_all_ideas_admin(user, chunk_limit, chunk_cursor),
+            lambda ideas: storage.db.project_ideas(ideas, view == "summary", None, field_list)
+        )
+    # Получаем идеи через админ-систему
+    result = await storage.run(admin.get_all_ideas_admin, user, await page_limit(limit, cursor), cursor)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     
-    return result 
+    return json_response(response, {**result, "ideas": await project_ideas(result["ideas"], view, fields, None)})
 
 # Эндпоинт для получения конкретной идеи по ID
 @app.get("/idea/{idea_id}")
-def get_idea(idea_id: int):
+async def get_idea(request: Request, response: Response, idea_id: int):
+    unchanged = not_modified(request, response, "ideas", "comments", "users")  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
     # Получаем идею из базы данных
-    idea = db.get_idea_by_id(idea_id)
+    idea = await storage.get_idea_by_id(idea_id)
     
     # Если идея не найдена или скрыта, возвращаем ошибку 404
     if not idea or idea["is_hidden"]:
         raise HTTPException(status_code=404, detail="Идея не найдена")
     
-    return idea
+    return json_response(response, idea)
 
 # Эндпоинт для создания новой идеи
 @app.post("/idea")
-def create_idea(data: IdeaCreateRequest):
-    # Преобразуем модель Pydantic в словарь
+async def create_idea(data: IdeaCreateRequest, user: dict = Depends(current_user)):
+    # Преобразуем модель Pydantic в словарь, автор - пользователь из токена
     idea_data = data.dict()
+    idea_data["author_id"] = acting_user_id(user, data.author_id)
     
     # Создаем идею в базе данных
-    idea_id = db.create_idea(idea_data)
+    idea_id = await storage.create_idea(idea_data)
     
     # Возвращаем успешный результат с ID созданной идеи
     return {"success": True, "idea_id": idea_id}
 
 # Эндпоинт для голосования за идею
 @app.post("/idea/{idea_id}/vote")
-def vote_idea(idea_id: int, vote_data: VoteRequest):
+async def vote_idea(idea_id: int, vote_data: VoteRequest, user: dict = Depends(current_user)):
     # Проверяем, что тип голоса корректен
     if vote_data.vote not in ["for", "against"]:
         raise HTTPException(
@@ -274,7 +479,7 @@ def vote_idea(idea_id: int, vote_data: VoteRequest):
         )
     
     # Вызываем метод голосования
-    result = db.vote_for_idea(idea_id, vote_data.user_id, vote_data.vote)
+    result = await storage.vote_for_idea(idea_id, acting_user_id(user, vote_data.user_id), vote_data.vote)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -284,27 +489,33 @@ def vote_idea(idea_id: int, vote_data: VoteRequest):
 
 # Эндпоинт для добавления комментария к идее
 @app.post("/idea/{idea_id}/comment")
-def add_comment(idea_id: int, comment_data: CommentRequest):
+async def add_comment(idea_id: int, comment_data: CommentRequest, user: dict = Depends(current_user)):
     # Добавляем комментарий в базу данных
-    comment_id = db.add_comment(idea_id, comment_data.user_id, comment_data.text)
+    comment_id = await storage.add_comment(idea_id, acting_user_id(user, comment_data.user_id), comment_data.text)
     
     # Возвращаем успешность операции (True если комментарий был создан)
     return {"success": bool(comment_id)}
 
+# Эндпоинт для получения комментариев идеи по возрастанию id (скрытой идеи - нет)
+# С limit/cursor возвращается страница и next_cursor, без них - все комментарии; total - всего комментариев
+@app.get("/idea/{idea_id}/comments")
+async def get_idea_comments(request: Request, response: Response, idea_id: int, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    unchanged = not_modified(request, response, "ideas", "comments")  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
+    result = await storage.get_comments_page(idea_id, await page_limit(limit, cursor), cursor)
+    
+    # Если идея не найдена или курсор неверный, возвращаем ошибку
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    return json_response(response, result)
+
 # Эндпоинт для одобрения идеи (только админ)
 @app.post("/admin/idea/{idea_id}/approve")
-def approve_idea(idea_id: int):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def approve_idea(idea_id: int, user: dict = Depends(admin_user)):
     # Вызываем метод одобрения идеи
-    result = admin.approve_idea(idea_id)
+    result = await storage.run(admin.approve_idea, user, idea_id)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -314,18 +525,9 @@ def approve_idea(idea_id: int):
 
 # Эндпоинт для скрытия идеи (только админ)
 @app.post("/admin/idea/{idea_id}/hide")
-def hide_idea(idea_id: int):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def hide_idea(idea_id: int, user: dict = Depends(admin_user)):
     # Вызываем метод скрытия идеи
-    result = admin.hide_idea(idea_id)
+    result = await storage.run(admin.hide_idea, user, idea_id)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -335,18 +537,9 @@ def hide_idea(idea_id: int):
 
 # Эндпоинт для отображения скрытой идеи (только админ)
 @app.post("/admin/idea/{idea_id}/unhide")
-def unhide_idea(idea_id: int):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def unhide_idea(idea_id: int, user: dict = Depends(admin_user)):
     # Вызываем метод отображения идеи
-    result = admin.unhide_idea(idea_id)
+    result = await storage.run(admin.unhide_idea, user, idea_id)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -356,18 +549,9 @@ def unhide_idea(idea_id: int):
 
 # Эндпоинт для регистрации пользователя (только админ)
 @app.post("/admin/register")
-def admin_register_user(username: str, password: str, role: str = "user"):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def admin_register_user(username: str, password: str, role: str = "user", user: dict = Depends(admin_user)):
     # Вызываем метод регистрации пользователя
-    result = admin.register_user(username, password, role)
+    result = await storage.run(admin.register_user, user, username, password, role)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -377,39 +561,30 @@ def admin_register_user(username: str, password: str, role: str = "user"):
 
 # Эндпоинт для получения всех пользователей (только админ)
 @app.get("/admin/users")
-def get_all_users():
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
-    # Получаем всех пользователей через админ-систему
-    result = admin.get_all_users()
+async def get_all_users(request: Request, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, user: dict = Depends(admin_user)):
+    unchanged = not_modified(request, response, "users", "config", negotiated=True)  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
+    # Полный список - потоком порциями (JSON или NDJSON, см. stream_listing)
+    if limit is None and cursor is None:
+        return await stream_listing(
+            request, response, "users",
+            lambda chunk_limit, chunk_cursor: admin.get_all_users(user, chunk_limit, chunk_cursor)
+        )
+    # Получаем пользователей через админ-систему
+    result = await storage.run(admin.get_all_users, user, await page_limit(limit, cursor), cursor)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result["message"])
     
-    return result
+    return json_response(response, result)
 
 # Эндпоинт для блокировки пользователя (только админ)
 @app.post("/admin/users/{user_id}/block")
-def block_user(user_id: int):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def block_user(user_id: int, user: dict = Depends(admin_user)):
     # Вызываем метод блокировки пользователя
-    result = admin.block_user(user_id)
+    result = await storage.run(admin.block_user, user, user_id)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -419,18 +594,9 @@ def block_user(user_id: int):
 
 # Эндпоинт для разблокировки пользователя (только админ)
 @app.post("/admin/users/{user_id}/unblock")
-def unblock_user(user_id: int):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def unblock_user(user_id: int, user: dict = Depends(admin_user)):
     # Вызываем метод разблокировки пользователя
-    result = admin.unblock_user(user_id)
+    result = await storage.run(admin.unblock_user, user, user_id)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -440,18 +606,9 @@ def unblock_user(user_id: int):
 
 # Эндпоинт для удаления пользователя (только админ)
 @app.delete("/admin/users/{user_id}")
-def delete_user(user_id: int):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def delete_user(user_id: int, user: dict = Depends(admin_user)):
     # Вызываем метод удаления пользователя напрямую из БД
-    result = db.delete_user(user_id)
+    result = await storage.delete_user(user_id)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -459,20 +616,45 @@ def delete_user(user_id: int):
     
     return result
 
+# Эндпоинт для массовой модерации идей (только админ): одно изменение и одна запись на диск на весь список.
+# Возвращает результат по каждой идее: {"results": [{"idea_id", "success", "message"?}, ...]}
+@app.post("/admin/ideas/bulk")
+async def bulk_moderate_ideas(data: BulkIdeasRequest, user: dict = Depends(admin_user)):
+    result = await storage.run(admin.moderate_ideas, user, data.idea_ids, data.action)
+    
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    return result
+
+# Эндпоинт для массового удаления комментариев (только админ), результат по каждому комментарию
+@app.post("/admin/comments/bulk-delete")
+async def bulk_delete_comments(data: BulkCommentsDeleteRequest, user: dict = Depends(admin_user)):
+    comments = [(item.idea_id, item.comment_id) for item in data.comments]
+    result = await storage.run(admin.delete_comments, user, comments)
+    
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    return result
+
+# Эндпоинт для получения комментариев идеи, в том числе скрытой (только админ)
+@app.get("/admin/idea/{idea_id}/comments")
+async def admin_get_idea_comments(request: Request, response: Response, idea_id: int, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, user: dict = Depends(admin_user)):
+    unchanged = not_modified(request, response, "ideas", "comments")  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
+    result = await storage.get_comments_page(idea_id, await page_limit(limit, cursor), cursor, include_hidden=True)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    return json_response(response, result)
+
 # Эндпоинт для удаления комментария (только админ)
 @app.delete("/admin/idea/{idea_id}/comment/{comment_id}")
-def admin_delete_comment(idea_id: int, comment_id: int):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def admin_delete_comment(idea_id: int, comment_id: int, user: dict = Depends(admin_user)):
     # Вызываем метод удаления комментария через админ-систему
-    result = admin.delete_comment(idea_id, comment_id)
+    result = await storage.run(admin.delete_comment, user, idea_id, comment_id)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -482,18 +664,12 @@ def admin_delete_comment(idea_id: int, comment_id: int):
 
 # Эндпоинт для получения всех категорий (только админ)
 @app.get("/admin/categories")
-def get_categories():
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def get_categories(request: Request, response: Response, user: dict = Depends(admin_user)):
+    unchanged = not_modified(request, response, "config")  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
     # Получаем категории через админ-систему
-    result = admin.get_categories()
+    result = await storage.run(admin.get_categories, user)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -503,18 +679,9 @@ def get_categories():
 
 # Эндпоинт для добавления категории (только админ)
 @app.post("/admin/categories")
-def add_category(category_data: CategoryCreateRequest):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def add_category(category_data: CategoryCreateRequest, user: dict = Depends(admin_user)):
     # Вызываем метод добавления категории
-    result = admin.add_category(category_data.name)
+    result = await storage.run(admin.add_category, user, category_data.name)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -524,18 +691,9 @@ def add_category(category_data: CategoryCreateRequest):
 
 # Эндпоинт для обновления категории (только админ)
 @app.put("/admin/categories")
-def update_category(category_data: CategoryUpdateRequest):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def update_category(category_data: CategoryUpdateRequest, user: dict = Depends(admin_user)):
     # Вызываем метод обновления категории
-    result = admin.update_category(category_data.old_name, category_data.new_name)
+    result = await storage.run(admin.update_category, user, category_data.old_name, category_data.new_name)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -545,18 +703,9 @@ def update_category(category_data: CategoryUpdateRequest):
 
 # Эндпоинт для удаления категории (только админ)
 @app.delete("/admin/categories")
-def delete_category(category_data: CategoryDeleteRequest):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def delete_category(category_data: CategoryDeleteRequest, user: dict = Depends(admin_user)):
     # Вызываем метод удаления категории
-    result = admin.delete_category(category_data.name)
+    result = await storage.run(admin.delete_category, user, category_data.name)
     
     # Если операция неуспешна, возвращаем ошибку
     if not result["success"]:
@@ -566,92 +715,123 @@ def delete_category(category_data: CategoryDeleteRequest):
 
 # Эндпоинт для получения категорий 
 @app.get("/categories")
-def get_categories_public():
+async def get_categories_public(request: Request, response: Response):
+    unchanged = not_modified(request, response, "config")  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
     # Получаем категории напрямую из базы данных
-    categories = db.get_categories()
+    categories = await storage.get_categories()
     
     return {"categories": categories}
 
+# Интервал keep-alive комментариев в потоке событий (секунды): держит соединение через прокси
+# и позволяет заметить отключившегося клиента
+EVENTS_KEEPALIVE = 15
+
+# Поток событий об изменениях идей (Server-Sent Events): idea_created, votes_changed, comment_added,
+# comment_deleted, idea_approved, idea_hidden, idea_unhidden, ideas_deleted и resync (перезагрузить список).
+# При переподключении браузер присылает Last-Event-ID, и пропущенные события досылаются
+@app.get("/events")
+async def stream_events(request: Request, last_event_id: Optional[int] = Header(None)):
+    subscription = events.subscribe(last_event_id)
+    
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"  # Пауза перед переподключением браузера
+            while True:
+                event = await subscription.get(EVENTS_KEEPALIVE)
+                if event is None:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {event['data']}\n\n"
+        finally:
+            events.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # nginx не должен буферизовать поток
+    )
+
 # Эндпоинт для проверки здоровья сервера
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "ok", "message": "Server is running"}
 
+# Метрики в текстовом формате Prometheus: запросы по маршрутам (число, ошибки, гистограммы времени),
+# чтение и запись файлов хранилища (вызовы, байты, время разбора, сериализации и записи), очередь хешера.
+# Метрики у каждого процесса сервера свои.
+# Доступ - только администратору или сборщику метрик с токеном METRICS_TOKEN (Authorization: Bearer <токен>):
+# метрики раскрывают нагрузку по маршрутам, очередь хешера и время работы хранилища
+async def metrics_access(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)):
+    metrics_token = os.environ.get("METRICS_TOKEN")
+    if metrics_token and credentials and hmac.compare_digest(credentials.credentials, metrics_token):
+        return
+    await admin_user(await current_user(credentials))
+
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(metrics_access)])
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/admin/ideas-with-authors")
-def get_ideas_with_authors():
+async def get_ideas_with_authors(request: Request, response: Response, limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, user: dict = Depends(admin_user)):
     """Получение всех идей с информацией об авторах (только для админа)"""
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
-    # Получаем все идеи
-    ideas = db.get_all_ideas_admin()
-    
-    # Обогащаем идеи информацией об авторах
-    enriched_ideas = []
-    for idea in ideas:
-        if idea.get("author_id"):
-            author = db.get_user_by_id(idea["author_id"])
-            if author:
-                idea["author_info"] = {
-                    "id": author["id"],
-                    "username": author.get("username", ""),
-                    "full_name": author.get("full_name", ""),
-                    "role": author.get("role", "user")
-                }
-        enriched_ideas.append(idea)
-    
-    return {"success": True, "ideas": enriched_ideas}
+    unchanged = not_modified(request, response, "ideas", "comments", "users", "config", negotiated=True)  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
+    # Полный список - потоком порциями (JSON или NDJSON, см. stream_listing)
+    if limit is None and cursor is None:
+        return await stream_listing(
+            request, response, "ideas",
+            lambda chunk_limit, chunk_cursor: storage.db.get_ideas_page("all", chunk_limit, chunk_cursor, include_hidden=True),
+            lambda ideas: storage.db.with_authors(storage.db.project_ideas(ideas, False, None, None))
+        )
+    # Получаем одну страницу идей
+    result = await storage.get_ideas_page("all", await page_limit(limit, cursor), cursor, include_hidden=True)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
+    
+    # Обогащаем идеи числом комментариев и информацией об авторах (все авторы загружаются одним запросом)
+    enriched_ideas = await storage.with_authors(await project_ideas(result["ideas"], "full", None, None))
+    
+    return json_response(response, {"success": True, "ideas": enriched_ideas, "next_cursor": result["next_cursor"]})
 
 # Эндпоинт для поиска идей (только админ)
 @app.get("/admin/ideas/search")
-def search_ideas_admin(query: str = ""):
-    # Устанавливаем текущего пользователя как администратора
-    auth.current_user = {
-        "id": 1,
-        "username": "admin",
-        "role": "admin",
-        "full_name": "Администратор",
-        "has_completed_introduction": True
-    }
-    
+async def search_ideas_admin(request: Request, response: Response, query: str = "", limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None, user: dict = Depends(admin_user)):
+    unchanged = not_modified(request, response, "ideas", "comments", "config")  # 304, если данные не менялись
+    if unchanged is not None:
+        return unchanged
     # Если поисковый запрос пустой, возвращаем все идеи
     if not query:
-        result = admin.get_all_ideas_admin()
+        result = await storage.run(admin.get_all_ideas_admin, user, await page_limit(limit, cursor), cursor)
         if not result["success"]:
             raise HTTPException(status_code=400, detail=result["message"])
-        return result
-    
-    # Получаем все идеи для админа
-    ideas = db.get_all_ideas_admin()
-    filtered_ideas = []
+        return json_response(response, {**result, "ideas": await project_ideas(result["ideas"], "full", None, None)})
     
-    # Фильтруем идеи по заголовку 
-    for idea in ideas:
-        title = idea.get('title', '').lower()
-        if query.lower() in title:
-            filtered_ideas.append(idea)
+    # Полнотекстовый поиск по всем идеям, включая скрытые, с ранжированием по релевантности
+    result = await storage.search_ideas(query, await page_limit(limit, cursor), cursor, include_hidden=True)
+    if not result["success"]:
+        raise HTTPException(status_code=400, detail=result["message"])
     
     # Возвращаем результат поиска
-    return {
+    return json_response(response, {
         "success": True,
-        "ideas": filtered_ideas,
+        "ideas": await project_ideas(result["ideas"], "full", None, None),
         "search_query": query,
-        "total_found": len(filtered_ideas),
-        "search_field": "title"
-    }
+        "total_found": result["total_found"],
+        "next_cursor": result["next_cursor"],
+        "search_field": "text"
+    })
 
 # Точка входа для запуска сервера
 if __name__ == "__main__":
     # Выводим сообщение о запуске
     print("Запуск сервера на http://localhost:8000")
     
-    # Запускаем сервер Uvicorn
+    # Запускаем сервер Uvicorn (несколько процессов: uvicorn main:app --workers N или WEB_CONCURRENCY=N)
     uvicorn.run(
         app, 
         host="0.0.0.0",  # Принимаем соединения с любых IP-адресов
@@ -0,0 +1,216 @@
+"""
+Метрики сервера в текстовом формате Prometheus (эндпоинт /metrics).
+
+Metrics - реестр счетчиков и гистограмм процесса. MetricsMiddleware считает запросы,
+ошибки и время ответа по маршрутам (шаблон пути, а не конкретный адрес, чтобы число рядов
+не росло с числом идей), хранилище сообщает о чтении и записи файлов: сколько раз, сколько
+байт и сколько времени ушло на чтение с диска, разбор JSON, сериализацию и запись.
+Метрики свои у каждого процесса сервера (uvicorn --workers N), рядом с ними отдается pid.
+"""
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from tracing import current_trace
+
+#Границы корзин гистограмм времени, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+#Экранирование значения метки
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.label_names = name, help, labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.label_names = name, help, labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {} #Метки -> [счетчики корзин..., сумма, количество]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        position = bisect.bisect_left(self.buckets, value) #Первая корзина с границей >= значения
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            if position < len(self.buckets):
+                series[position] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((label_values, list(values)) for label_values, values in self._series.items())
+        for label_values, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count #Корзины в формате Prometheus накопительные
+                bucket = _labels(self.label_names, label_values, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            bucket = _labels(self.label_names, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket} {values[-1]}")
+            labels = _labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(values[-2])}")
+            lines.append(f"{self.name}_count{labels} {values[-1]}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.started_at = time.time()
+        #Запросы HTTP
+        self.requests = Counter("http_requests_total", "HTTP requests by route and status code",
+                                ("method", "route", "status"))
+        self.request_errors = Counter("http_request_errors_total", "HTTP requests that failed with 5xx or an exception",
+                                      ("method", "route"))
+        self.request_seconds = Histogram("http_request_duration_seconds", "HTTP request latency",
+                                         ("method", "route"))
+        #Файлы хранилища: file - имя файла (ideas.json), cache - hit (из памяти) или miss (чтение с диска)
+        self.storage_loads = Counter("storage_load_total", "Data file loads (_load_json) by cache result",
+                                     ("file", "cache"))
+        self.storage_saves = Counter("storage_save_total", "Data file writes: full snapshots and journal appends",
+                                     ("file", "kind"))
+        self.storage_bytes = Counter("storage_bytes_total", "Bytes read from and written to data files",
+                                     ("file", "direction"))
+        #stage: read - чтение с диска, parse - разбор JSON, serialize - сериализация, write - запись и замена файла
+        self.storage_seconds = Histogram("storage_stage_duration_seconds", "Time spent per storage stage",
+                                         ("file", "stage"))
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    #Дополнительный источник строк метрик (например, статистика хешера паролей)
+    def add_collector(self, collector: Callable[[], Iterable[str]]):
+        self._collectors.append(collector)
+
+    #Вызовы хранилища (file_path - полный путь, в метках - только имя файла);
+    #учитываются и в трассировке текущего запроса, если она включена (см. tracing.py)
+
+    def storage_load(self, file_path: str, hit: bool):
+        self.storage_loads.inc(os.path.basename(file_path), "hit" if hit else "miss")
+        trace = current_trace()
+        if trace is not None:
+            trace.load()
+
+    def storage_read(self, file_path: str, size: int, read_seconds: float, parse_seconds: float):
+        name = os.path.basename(file_path)
+        self.storage_bytes.inc(name, "read", amount=size)
+        self.storage_seconds.observe(read_seconds, name, "read")
+        self.storage_seconds.observe(parse_seconds, name, "parse")
+        trace = current_trace()
+        if trace is not None:
+            trace.read(size, read_seconds + parse_seconds)
+
+    def storage_write(self, file_path: str, kind: str, size: int, serialize_seconds: float, write_seconds: float):
+        name = os.path.basename(file_path)
+        self.storage_saves.inc(name, kind)
+        self.storage_bytes.inc(name, "written", amount=size)
+        self.storage_seconds.observe(serialize_seconds, name, "serialize")
+        self.storage_seconds.observe(write_seconds, name, "write")
+        trace = current_trace()
+        if trace is not None:
+            trace.write(size, serialize_seconds + write_seconds)
+
+    #Все метрики в текстовом формате Prometheus
+    def render(self) -> str:
+        lines = [
+            "# HELP process_start_time_seconds Start time of the process since unix epoch",
+            "# TYPE process_start_time_seconds gauge",
+            f"process_start_time_seconds {self.started_at}",
+            "# HELP process_pid Server process id (metrics are per process)",
+            "# TYPE process_pid gauge",
+            f"process_pid {os.getpid()}",
+        ]
+        for metric in (self.requests, self.request_errors, self.request_seconds,
+                       self.storage_loads, self.storage_saves, self.storage_bytes, self.storage_seconds):
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+#Метрики хешера паролей (passwords.PasswordHasher.stats) для Metrics.add_collector
+def hasher_collector(hasher) -> Callable[[], List[str]]:
+    def collect() -> List[str]:
+        stats = hasher.stats()
+        rows = [
+            ("password_hash_queue_waiting", "gauge", "Callers waiting for a free slot in the hashing queue", stats["waiting"]),
+            ("password_hash_in_pool", "gauge", "Hashing tasks running or queued in the process pool", stats["in_pool"]),
+            ("password_hash_total", "counter", "Passwords hashed", stats["hashed"]),
+            ("password_verify_total", "counter", "Password checks", stats["verified"]),
+            ("password_hash_seconds_total", "counter", "Time spent hashing, including queue wait", stats["hash_seconds"]),
+            ("password_verify_seconds_total", "counter", "Time spent verifying, including queue wait", stats["verify_seconds"]),
+        ]
+        lines = []
+        for name, kind, help, value in rows:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+        return lines
+    return collect
+
+
+#ASGI-middleware: время ответа, коды и ошибки по маршрутам. Маршрут - шаблон пути FastAPI
+#(/idea/{idea_id}), его роутер записывает в scope; запросы без маршрута учитываются как "unmatched"
+class MetricsMiddleware:
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status: Optional[int] = None
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException:
+            status = status or 500
+            raise
+        finally:
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            self.metrics.requests.inc(method, route, str(status or 500))
+            if status is None or status >= 500:
+                self.metrics.request_errors.inc(method, route)
+            self.metrics.request_seconds.observe(time.perf_counter() - started, method, route)
@@ -0,0 +1,134 @@
+"""
+Одноразовый перенос данных из data/*.json в базу SQLite.
+
+Запуск из папки backend:
+    python migrate_json_to_sqlite.py [--json-folder data] [--sqlite data/ideas.sqlite3]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+from database import open_read_only
+from sqlite_database import SCHEMA
+
+
+#Перенос всех данных из папки с JSON-файлами в новую базу SQLite
+def migrate(json_folder: str, sqlite_path: str) -> dict:
+    if os.path.exists(sqlite_path):
+        raise FileExistsError(f"База {sqlite_path} уже существует, перенос выполняется только в новую базу")
+
+    #Читаем данные через JSONDatabase, чтобы учесть и журнал изменений, если он есть (комментарии старого
+    #формата, хранившиеся внутри идей, при этом переносятся в comments.json). JSONDatabase работает с копией
+    #папки, исходные файлы не меняются; без users.json или ideas.json - FileNotFoundError
+    with open_read_only(json_folder) as source:
+        users_data = source._load_json(source.users_file)
+        ideas_data = source._load_json(source.ideas_file)
+        comments_data = source._load_json(source.comments_file)
+        config = source._load_json(source.config_file)
+
+    os.makedirs(os.path.dirname(os.path.abspath(sqlite_path)), exist_ok=True)
+    conn = sqlite3.connect(sqlite_path)
+    stats = {"users": 0, "ideas": 0, "votes": 0, "comments": 0, "categories": 0}
+    try:
+        with conn:
+            conn.executescript(SCHEMA)
+            for user in users_data.get("users", []):
+                conn.execute(
+                    "INSERT INTO users (id, username, password, plain_password, is_temp_password, role, is_active, "
+                    "full_name, has_completed_introduction, needs_password_change, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        user["id"],
+                        user["username"],
+                        user.get("password") or user.get("password_hash", ""),
+                        user.get("plain_password"),
+                        int(bool(user.get("is_temp_password", False))),
+                        user.get("role", "user"),
+                        int(bool(user.get("is_active", True))),
+                        user.get("full_name", ""),
+                        #В старых данных администратора поле записано как hash_completes_introduction
+                        int(bool(user.get("has_completed_introduction", user.get("hash_completes_introduction", False)))),
+                        int(bool(user.get("needs_password_change", False))),
+                        user.get("created_at", ""),
+                    )
+                )
+                stats["users"] += 1
+
+            for idea in ideas_data.get("ideas", []):
+                conn.execute(
+                    "INSERT INTO ideas (id, title, short_description, full_description, expected_effect, author_id, "
+                    "category, is_hidden, is_approved, votes_for, votes_against, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        idea["id"],
+                        idea.get("title", ""),
+                        idea.get("short_description", ""),
+                        idea.get("full_description", ""),
+                        idea.get("expected_effect", ""),
+                        idea.get("author_id", 0),
+                        idea.get("category", "IT"),
+                        int(bool(idea.get("is_hidden", False))),
+                        int(bool(idea.get("is_approved", False))),
+                        idea.get("votes_for", 0),
+                        idea.get("votes_against", 0),
+                        idea.get("created_at", ""),
+                    )
+                )
+                stats["ideas"] += 1
+                #В JSON не хранится, за что голосовал пользователь, поэтому тип голоса восстанавливаем
+                #по счетчикам: первые votes_for голосов считаем голосами "за"
+                for position, user_id in enumerate(dict.fromkeys(idea.get("voted_users", []))):
+                    vote = "for" if position < idea.get("votes_for", 0) else "against"
+                    conn.execute("INSERT INTO votes (idea_id, user_id, vote) VALUES (?, ?, ?)", (idea["id"], user_id, vote))
+                    stats["votes"] += 1
+
+            for comment in comments_data.get("comments", []):
+                conn.execute(
+                    "INSERT INTO comments (id, idea_id, user_id, text, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (comment["id"], comment["idea_id"], comment.get("user_id", 0), comment.get("text", ""), comment.get("created_at", ""))
+                )
+                stats["comments"] += 1
+
+            for name in dict.fromkeys(config.get("categories", [])):
+                conn.execute("INSERT INTO categories (name) VALUES (?)", (name,))
+                stats["categories"] += 1
+            settings = {"default_comments_enabled": True, "items_per_page": 20, **config.get("settings", {})}
+            conn.executemany(
+                "INSERT INTO settings (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value)) for key, value in settings.items()]
+            )
+
+            #Счетчики id продолжаются с последних значений из JSON (удаленные id не переиспользуются)
+            for table, last_id in (
+                ("users", users_data.get("last_user_id", 0)),
+                ("ideas", ideas_data.get("last_idea_id", 0)),
+                ("comments", comments_data.get("last_comment_id", 0)),
+            ):
+                conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+                conn.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) VALUES (?, MAX(?, (SELECT COALESCE(MAX(id), 0) FROM "
+                    + table + ")))",
+                    (table, last_id)
+                )
+    except Exception:
+        conn.close()
+        os.remove(sqlite_path) #Не оставляем наполовину заполненную базу
+        raise
+    conn.close()
+    return stats
+
+
+if __name__ == "__main__":
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Перенос данных из JSON-файлов в SQLite")
+    parser.add_argument("--json-folder", default=os.path.join(base_dir, "data"), help="папка с users.json, ideas.json и app_config.json")
+    parser.add_argument("--sqlite", default=os.path.join(base_dir, "data", "ideas.sqlite3"), help="путь к создаваемой базе SQLite")
+    args = parser.parse_args()
+    try:
+        result = migrate(args.json_folder, args.sqlite)
+    except (FileExistsError, FileNotFoundError) as e:
+        print(e)
+        sys.exit(1)
+    print("Перенесено: " + ", ".join(f"{name} - {count}" for name, count in result.items()))
@@ -0,0 +1,201 @@
+"""
+Хеширование паролей (bcrypt) в ограниченном пуле процессов.
+
+bcrypt намеренно медленный: при стоимости 12 один хеш занимает сотни миллисекунд процессора.
+Вычисления выполняются в отдельных процессах, поэтому не держат GIL и не тормозят
+обработку остальных запросов, а число ожидающих задач ограничено: при всплеске входов
+(начало смены) лишние вызовы ждут свободного места в очереди, а не копят работу без предела.
+
+Старые 8-значные хеши (32-битный полиномиальный хеш) по-прежнему проверяются,
+needs_update сообщает, что такой хеш (или bcrypt с другой стоимостью) пора пересчитать.
+"""
+import hmac
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import bcrypt
+
+#Стоимость bcrypt по умолчанию (каждая единица удваивает время хеширования)
+DEFAULT_ROUNDS = 12
+
+#bcrypt учитывает только первые 72 байта пароля
+MAX_PASSWORD_BYTES = 72
+
+LEGACY_HASH_RE = re.compile(r"^[0-9a-f]{8}$")
+
+
+#Старый 32-битный хеш; нужен только для проверки паролей, сохраненных до перехода на bcrypt
+def legacy_hash(password: str) -> str:
+    hash_value = 0
+    for char in password:
+        hash_value = (hash_value * 31 + ord(char)) & 0xFFFFFFFF
+    return hex(hash_value)[2:].zfill(8)
+
+
+def _encode(password: str) -> bytes:
+    return password.encode("utf-8")[:MAX_PASSWORD_BYTES]
+
+
+#Функции, выполняемые в процессах пула (на уровне модуля, чтобы их можно было передать процессу)
+def _hash_batch(passwords: List[str], rounds: int) -> List[str]:
+    return [bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode("ascii") for password in passwords]
+
+
+def _verify(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(_encode(password), hashed.encode("ascii"))
+    except ValueError:
+        return False  #Поврежденный хеш
+
+
+def _noop() -> None:
+    return None
+
+
+#Стоимость bcrypt из хеша вида $2b$12$...; None - не bcrypt
+def hash_rounds(hashed: str) -> Optional[int]:
+    parts = hashed.split("$") if hashed else []
+    if len(parts) == 4 and parts[1] in ("2a", "2b", "2y") and parts[2].isdigit():
+        return int(parts[2])
+    return None
+
+
+class PasswordHasher:
+    #max_workers - число процессов (0 - хешировать в вызывающем потоке, для скриптов),
+    #rounds - стоимость bcrypt (одна для всех паролей, в том числе массово созданных),
+    #max_queue - сколько задач может одновременно находиться в пуле (выполняться или ждать процесса)
+    def __init__(self, max_workers: int = None, rounds: int = None, max_queue: int = None):
+        if max_workers is None:
+            max_workers = int(os.environ.get("HASH_WORKERS", os.cpu_count() or 1))
+        self.max_workers = max_workers
+        self.rounds = rounds or int(os.environ.get("PASSWORD_ROUNDS", DEFAULT_ROUNDS))
+        self.max_queue = max_queue or int(os.environ.get("HASH_QUEUE", max(1, max_workers) * 4))
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        #Метрики очереди и времени хеширования
+        self._stats_lock = threading.Lock()
+        self._waiting = 0  #Вызовы, ожидающие места в очереди
+        self._in_pool = 0  #Задачи в пуле (выполняются или ждут свободного процесса)
+        self._counts = {"hash": 0, "verify": 0}
+        self._seconds = {"hash": 0.0, "verify": 0.0}
+
+    #Пул процессов создается при первом использовании. Где доступен fork, процессы копируют текущий,
+    #а не импортируют заново запускаемый скрипт (main.py при импорте создает хранилище);
+    #все процессы пула запускаются сразу при первой задаче
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context(method)
+                )
+            return self._executor
+
+    #Запуск процессов заранее - до появления потоков сервера, чтобы первый вход не ждал их старта
+    def start(self):
+        if self.max_workers > 0:
+            self._pool().submit(_noop).result()
+
+    #Выполнение задачи в пуле с ограничением очереди; kind - "hash" или "verify" для метрик
+    def _run(self, kind: str, count: int, func, *args):
+        started = time.perf_counter()
+        if self.max_workers == 0:
+            result = func(*args)
+        else:
+            with self._stats_lock:
+                self._waiting += 1
+            self._slots.acquire()  #Очередь заполнена - ждем (обратное давление на вызывающих)
+            with self._stats_lock:
+                self._waiting -= 1
+                self._in_pool += 1
+            try:
+                result = self._pool().submit(func, *args).result()
+            finally:
+                self._slots.release()
+                with self._stats_lock:
+                    self._in_pool -= 1
+        with self._stats_lock:
+            self._counts[kind] += count
+            self._seconds[kind] += time.perf_counter() - started
+        return result
+
+    #Хеш пароля; rounds=None - стоимость по умолчанию
+    def hash(self, password: str, rounds: int = None) -> str:
+        return self._run("hash", 1, _hash_batch, [password], rounds or self.rounds)[0]
+
+    #Хеши для партии паролей: партия делится на части по числу процессов, каждая часть - одна задача пула
+    def hash_many(self, passwords: List[str], rounds: int = None) -> List[str]:
+        if not passwords:
+            return []
+        rounds = rounds or self.rounds
+        chunk_size = -(-len(passwords) // max(1, self.max_workers * 4))
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        if self.max_workers == 0:
+            return self._run("hash", len(passwords), _hash_batch, passwords, rounds)
+        results: List[List[str]] = [None] * len(chunks)
+
+        def run_chunk(position: int):
+            results[position] = self._run("hash", len(chunks[position]), _hash_batch, chunks[position], rounds)
+
+        #Части отправляются из нескольких потоков, чтобы заняты были все процессы пула
+        threads = [threading.Thread(target=run_chunk, args=(i,)) for i in range(len(chunks))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if any(chunk is None for chunk in results):
+            raise RuntimeError("Не удалось вычислить хеши паролей")
+        return [hashed for chunk in results for hashed in chunk]
+
+    #Проверка пароля по сохраненному хешу (bcrypt или старому 8-значному)
+    def verify(self, password: str, hashed: str) -> bool:
+        if not hashed:
+            return False
+        if LEGACY_HASH_RE.match(hashed):
+            return hmac.compare_digest(legacy_hash(password), hashed)
+        return self._run("verify", 1, _verify, password, hashed)
+
+    #Нужно ли пересчитать хеш: старый формат или bcrypt с другой стоимостью
+    def needs_update(self, hashed: str) -> bool:
+        return hash_rounds(hashed) != self.rounds
+
+    #Состояние очереди и счетчики для мониторинга
+    def stats(self) -> Dict[str, any]:
+        with self._stats_lock:
+            return {
+                "workers": self.max_workers,
+                "rounds": self.rounds,
+                "max_queue": self.max_queue,
+                "waiting": self._waiting,
+                "in_pool": self._in_pool,
+                "hashed": self._counts["hash"],
+                "verified": self._counts["verify"],
+                "hash_seconds": round(self._seconds["hash"], 6),
+                "verify_seconds": round(self._seconds["verify"], 6),
+            }
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_default_hasher: Optional[PasswordHasher] = None
+_default_lock = threading.Lock()
+
+
+#Общий хешер процесса (параметры из переменных окружения); его используют хранилища,
+#если хешер не передан явно
+def get_hasher() -> PasswordHasher:
+    global _default_hasher
+    with _default_lock:
+        if _default_hasher is None:
+            _default_hasher = PasswordHasher()
+        return _default_hasher
@@ -0,0 +1,146 @@
+"""
+Полнотекстовый поиск по идеям: инвертированный индекс в памяти с ранжированием BM25.
+
+Текст приводится к нижнему регистру, "ё" заменяется на "е", слова обрезаются
+простым стеммером (отбрасываются частые окончания русских и английских слов).
+"""
+import functools
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional
+
+#Поля идеи, по которым ведется поиск, и вес каждого (совпадение в заголовке важнее)
+IDEA_FIELDS = {"title": 3, "short_description": 2, "full_description": 1, "expected_effect": 1}
+COMMENT_WEIGHT = 1
+
+#Параметры BM25
+K1 = 1.2
+B = 0.75
+
+#Слово - последовательность букв или цифр (подчеркивание разделяет слова)
+_WORD = re.compile(r"[^\W_]+")
+
+#Окончания, отбрасываемые стеммером
+_RU_ENDINGS = frozenset((
+    "иями", "ями", "ами", "иях", "ях", "ах", "ией", "ный", "ная", "ное", "ные", "ных", "ным", "ной", "ную",
+    "ого", "его", "ому", "ему", "ыми", "ими", "ая", "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой", "ых", "их", "ую", "юю",
+    "ом", "ем", "ам", "ям", "ов", "ев", "ей", "ью", "ия", "ию", "ии", "ть", "ться", "ет", "ут", "ют",
+    "ит", "ат", "ят", "ешь", "ишь", "им", "ете", "ите", "ал", "ял", "ил", "ла", "ло", "ли",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+))
+_EN_ENDINGS = frozenset(("ings", "ing", "ies", "es", "ed", "s"))
+_MAX_ENDING = max(len(ending) for ending in _RU_ENDINGS | _EN_ENDINGS)
+_MIN_STEM = 3  #Основа слова не короче трех символов
+
+
+#Основа слова: отбрасываем самое длинное подходящее окончание
+#Словарь текстов ограничен, поэтому результаты кэшируются
+@functools.lru_cache(maxsize=200000)
+def stem(word: str) -> str:
+    endings = _EN_ENDINGS if word.isascii() else _RU_ENDINGS
+    for length in range(min(_MAX_ENDING, len(word) - _MIN_STEM), 0, -1):
+        if word[-length:] in endings:
+            return word[:-length]
+    return word
+
+
+#Разбиение текста на нормализованные термины
+def tokenize(text: str) -> List[str]:
+    if not text:
+        return []
+    return [stem(word) for word in _WORD.findall(text.lower().replace("ё", "е"))]
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}  #термин -> {id идеи: частота с учетом веса}
+        self.lengths: Dict[int, int] = {}  #id идеи -> длина документа
+        self.total_length = 0
+
+    #Построение индекса по списку идей
+    @classmethod
+    def from_ideas(cls, ideas: Iterable[Dict]) -> "SearchIndex":
+        index = cls()
+        for idea in ideas:
+            index.add_idea(idea)
+        return index
+
+    def _add_terms(self, doc_id: int, terms: Counter, sign: int = 1):
+        for term, count in terms.items():
+            docs = self.postings.setdefault(term, {})
+            tf = docs.get(doc_id, 0) + sign * count
+            if tf > 0:
+                docs[doc_id] = tf
+            else:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        delta = sign * sum(terms.values())
+        self.lengths[doc_id] = self.lengths.get(doc_id, 0) + delta
+        self.total_length += delta
+
+    @staticmethod
+    def _idea_terms(idea: Dict) -> Counter:
+        terms = Counter()
+        for field, weight in IDEA_FIELDS.items():
+            for term in tokenize(idea.get(field, "")):
+                terms[term] += weight
+        return terms
+
+    #Добавление идеи вместе с ее комментариями
+    def add_idea(self, idea: Dict):
+        terms = self._idea_terms(idea)
+        for comment in idea.get("comments", []):
+            terms.update(self._comment_terms(comment.get("text", "")))
+        self._add_terms(idea["id"], terms)
+
+    @staticmethod
+    def _comment_terms(text: str) -> Counter:
+        return Counter({term: COMMENT_WEIGHT * count for term, count in Counter(tokenize(text)).items()})
+
+    #Текст комментария относится к документу идеи
+    def add_comment(self, idea_id: int, text: str):
+        self._add_terms(idea_id, self._comment_terms(text))
+
+    def remove_comment(self, idea_id: int, text: str):
+        self._add_terms(idea_id, self._comment_terms(text), -1)
+
+    #Оценки BM25 всех идей, содержащих хотя бы один термин запроса: id идеи -> оценка
+    def score(self, query: str) -> Dict[int, float]:
+        terms = set(tokenize(query))
+        if not terms or not self.lengths:
+            return {}
+        count = len(self.lengths)
+        average = self.total_length / count or 1
+        scores: Dict[int, float] = {}
+        lengths, get_score = self.lengths, scores.get
+        base, per_length = K1 * (1 - B), K1 * B / average  #Нормировка BM25: base + per_length * длина
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            weight = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5)) * (K1 + 1)
+            for doc_id, tf in docs.items():
+                scores[doc_id] = get_score(doc_id, 0.0) + weight * tf / (tf + base + per_length * lengths[doc_id])
+        return scores
+
+    #Страница результатов по убыванию оценки. after - курсор [оценка, id] последнего результата
+    #предыдущей страницы, allow - фильтр идей. Возвращает (пары (оценка, id), всего найдено, курсор)
+    def search(self, query: str, limit: Optional[int] = None, after: Optional[list] = None,
+               allow: Optional[Callable[[int], bool]] = None) -> tuple:
+        #Оценки округляются, чтобы курсор из JSON точно совпадал с ключом сортировки
+        ranked = [(-round(score, 6), doc_id) for doc_id, score in self.score(query).items()
+                  if allow is None or allow(doc_id)]
+        total = len(ranked)
+        if after is not None:
+            after_key = (-after[0], after[1])
+            ranked = [key for key in ranked if key > after_key]
+        if limit is None:
+            page, has_more = sorted(ranked), False
+        else:
+            page = heapq.nsmallest(limit + 1, ranked)  #Полная сортировка всех совпадений не нужна
+            page, has_more = page[:limit], len(page) > limit
+        results = [(-score, doc_id) for score, doc_id in page]
+        return results, total, (list(results[-1]) if has_more else None)
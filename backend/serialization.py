@@ -0,0 +1,72 @@
+"""
+Сериализация JSON для файлов хранилища, журнала, событий и ответов API.
+
+Используется самая быстрая доступная библиотека: orjson, затем msgspec, иначе стандартный json.
+JSON_BACKEND=orjson|msgspec|json выбирает библиотеку явно (например, для сравнения скорости).
+dumps возвращает UTF-8 байты: компактно (без пробелов и отступов) или, с pretty=True, с отступами
+для чтения человеком. Все варианты выдают один и тот же JSON, поэтому файлы, записанные
+одной библиотекой, читаются любой другой.
+"""
+import json
+import os
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _choose_backend() -> str:
+    requested = os.environ.get("JSON_BACKEND")
+    available = {"orjson": orjson is not None, "msgspec": msgspec is not None, "json": True}
+    if requested:
+        if not available.get(requested):
+            raise RuntimeError(f"JSON_BACKEND={requested}: библиотека недоступна")
+        return requested
+    return next(name for name, ok in available.items() if ok)
+
+
+#Библиотека, выбранная при импорте
+BACKEND = _choose_backend()
+
+#Ошибки разбора некорректного JSON
+if msgspec is not None:
+    DecodeError = (ValueError, msgspec.DecodeError)
+else:
+    DecodeError = (ValueError,)
+
+if BACKEND == "orjson":
+    _COMPACT = orjson.OPT_NON_STR_KEYS #Ключи-числа превращаются в строки, как в json
+    _PRETTY = orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+
+    def dumps(obj: Any, pretty: bool = False) -> bytes:
+        return orjson.dumps(obj, option=_PRETTY if pretty else _COMPACT)
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+elif BACKEND == "msgspec":
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+    def dumps(obj: Any, pretty: bool = False) -> bytes:
+        data = _encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if pretty else data
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return _decoder.decode(data)
+
+else:
+    def dumps(obj: Any, pretty: bool = False) -> bytes:
+        if pretty:
+            return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
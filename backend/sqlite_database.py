@@ -0,0 +1,802 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from database import MODERATION_ACTIONS, JSONDatabase, attach_authors, decode_cursor, decode_search_cursor, encode_cursor, project_idea
+from interprocess import FileLock, SharedCounters
+from passwords import PasswordHasher, get_hasher
+from search import SearchIndex
+
+#Схема базы: отдельные таблицы вместо вложенных списков JSON-файлов
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL DEFAULT '',
+    plain_password TEXT,
+    is_temp_password INTEGER NOT NULL DEFAULT 0,
+    role TEXT NOT NULL DEFAULT 'user',
+    is_active INTEGER NOT NULL DEFAULT 1,
+    full_name TEXT NOT NULL DEFAULT '',
+    has_completed_introduction INTEGER NOT NULL DEFAULT 0,
+    needs_password_change INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ideas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    short_description TEXT NOT NULL DEFAULT '',
+    full_description TEXT NOT NULL DEFAULT '',
+    expected_effect TEXT NOT NULL DEFAULT '',
+    author_id INTEGER NOT NULL DEFAULT 0,
+    category TEXT NOT NULL DEFAULT 'IT',
+    is_hidden INTEGER NOT NULL DEFAULT 0,
+    is_approved INTEGER NOT NULL DEFAULT 0,
+    votes_for INTEGER NOT NULL DEFAULT 0,
+    votes_against INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ideas_author_id ON ideas(author_id);
+CREATE INDEX IF NOT EXISTS ideas_category ON ideas(category);
+CREATE TABLE IF NOT EXISTS votes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    idea_id INTEGER NOT NULL REFERENCES ideas(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    vote TEXT NOT NULL CHECK (vote IN ('for', 'against')),
+    UNIQUE (idea_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idea_id INTEGER NOT NULL REFERENCES ideas(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS comments_idea_id ON comments(idea_id);
+CREATE TABLE IF NOT EXISTS categories (
+    position INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+#Порядок выдачи идей для фильтров списка (как IDEA_ORDERS в database.py): фильтр -> (столбцы ключа, по убыванию)
+IDEA_ORDERS = {
+    "new": (("created_at", "id"), True),
+    "popular": (("votes_for - votes_against", "-id"), True),
+}
+DEFAULT_IDEA_ORDER = (("id",), False)
+
+#Столбцы таблиц в порядке схемы (выборка страницы добавляет к ним столбцы ключа сортировки)
+IDEA_COLUMNS = ("id", "title", "short_description", "full_description", "expected_effect", "author_id",
+                "category", "is_hidden", "is_approved", "votes_for", "votes_against", "created_at")
+USER_COLUMNS = ("id", "username", "password", "plain_password", "is_temp_password", "role", "is_active",
+                "full_name", "has_completed_introduction", "needs_password_change", "created_at")
+COMMENT_COLUMNS = ("id", "idea_id", "user_id", "text", "created_at")
+
+#Поля пользователя, которые хранятся как 0/1
+USER_BOOL_FIELDS = ("is_temp_password", "is_active", "has_completed_introduction", "needs_password_change")
+
+
+class SQLiteDatabase:
+    """Хранилище на SQLite с теми же публичными методами, что и JSONDatabase"""
+
+    hash_password = JSONDatabase.hash_password
+    verify_password = JSONDatabase.verify_password
+
+    #events - шина событий (events.EventBus) для живого обновления клиентов, как у JSONDatabase,
+    #hasher - хешер паролей (passwords.PasswordHasher); по умолчанию общий хешер процесса
+    def __init__(self, db_path: str = None, events=None, hasher: PasswordHasher = None):
+        base_dir = os.path.dirname(os.path.abspath(__file__)) #Абсолютный путь к текущему файлу
+        self.db_path = db_path or os.path.join(base_dir, "data", "ideas.sqlite3") #Файл базы данных
+        self.db_folder = os.path.dirname(os.path.abspath(self.db_path)) #Папка данных (там же ключ подписи токенов)
+        os.makedirs(self.db_folder, exist_ok=True) #Создание папки, если она не существует
+        #Одно соединение на процесс, доступ к нему сериализуется блокировкой
+        #timeout - ожидание блокировки записи, которую держит другой процесс сервера
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL") #Читатели не блокируют писателя
+        self._conn.execute("PRAGMA foreign_keys=ON") #Каскадное удаление голосов и комментариев
+        self._lock = threading.RLock()
+        self._search: Optional[SearchIndex] = None #Полнотекстовый индекс, строится при первом поиске
+        self._search_version = None #PRAGMA data_version, при которой построен индекс
+        #Версия данных для ETag - общий счетчик записей всех процессов сервера (см. interprocess.py);
+        #увеличивается под межпроцессной блокировкой, чтобы одновременные записи не потеряли шаг
+        self._versions = SharedCounters(self.db_path + ".version", 1)
+        self._version_lock = FileLock(self.db_path + ".version.lock")
+        self.instance_id = self._versions.epoch
+        self.events = events
+        self.hasher = hasher or get_hasher()
+        with self._lock, self._transaction():
+            self._conn.executescript(SCHEMA)
+        self.__init__data()
+
+    #Версия данных для ETag (см. data_version в database.py): общий счетчик записей, одна версия для всех
+    #таблиц. Читается без блокировок и запросов к базе, поэтому вызывается прямо в цикле событий,
+    #и одинакова во всех процессах сервера
+    def data_version(self, *names: str) -> str:
+        return f"{self.instance_id}.{self._versions.get(0)}"
+
+    #Транзакция записи: фиксация, затем увеличение версии данных. Версия меняется после фиксации,
+    #чтобы ETag новой версии никогда не выдавался вместе со старыми данными, и только если транзакция
+    #изменила строки: неудачный голос или удаление несуществующей записи не сбрасывает ETag клиентов.
+    #Индекс поиска обновляется после выхода из транзакции - при откате он не расходится с таблицами
+    @contextmanager
+    def _transaction(self):
+        changes = self._conn.total_changes
+        with self._conn:
+            yield
+        if self._conn.total_changes != changes:
+            with self._version_lock:
+                self._versions.increment(0)
+
+    #Номер, который SQLite меняет после каждой записи других соединений (процессов) в базу
+    def _external_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    #Публикация события об изменении (после фиксации транзакции, под блокировкой - в порядке изменений)
+    def _publish(self, event_type: str, **data):
+        if self.events is not None:
+            self.events.publish(event_type, **data)
+
+    #Заполнение пустой базы значениями по умолчанию (как у JSONDatabase)
+    def __init__data(self):
+        with self._lock, self._transaction():
+            if self._conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None:
+                self._conn.execute(
+                    "INSERT INTO users (username, password, role, is_active, full_name, has_completed_introduction, "
+                    "needs_password_change, created_at) VALUES (?, ?, 'admin', 1, 'Администратор', 1, 1, ?)",
+                    ("1QsMeP23", self.hash_password("12345"), datetime.now().isoformat())
+                )
+            if self._conn.execute("SELECT 1 FROM settings LIMIT 1").fetchone() is None:
+                self._conn.executemany(
+                    "INSERT INTO categories (name) VALUES (?)",
+                    [(name,) for name in ["IT", "Документооборот", "Производство", "HR"]]
+                )
+                self._conn.executemany("INSERT INTO settings (key, value) VALUES (?, ?)", [
+                    ("default_comments_enabled", json.dumps(True)),
+                    ("items_per_page", json.dumps(20)),
+                ])
+
+    #Преобразование строки таблицы users в словарь формата JSONDatabase
+    @staticmethod
+    def _user_from_row(row: sqlite3.Row) -> Dict:
+        user = dict(row)
+        for field in USER_BOOL_FIELDS:
+            user[field] = bool(user[field])
+        if user["plain_password"] is None:
+            del user["plain_password"]
+        return user
+
+    #Сборка идей вместе с голосовавшими (запрос по idea_id идет по индексу); комментарии - через get_comments_page
+    def _ideas_from_rows(self, rows: List[sqlite3.Row]) -> List[Dict]:
+        ideas = []
+        by_id = {}
+        for row in rows:
+            idea = dict(row)
+            idea["is_hidden"] = bool(idea["is_hidden"])
+            idea["is_approved"] = bool(idea["is_approved"])
+            idea["voted_users"] = []
+            ideas.append(idea)
+            by_id[idea["id"]] = idea
+        if not ideas:
+            return ideas
+        if len(ideas) <= 500:
+            where = "WHERE idea_id IN (" + ", ".join("?" * len(ideas)) + ")"
+            params = tuple(by_id)
+        else:
+            where, params = "", () #Для большого списка дешевле прочитать таблицы одним проходом
+        for row in self._conn.execute(f"SELECT idea_id, user_id FROM votes {where} ORDER BY seq", params):
+            if row["idea_id"] in by_id:
+                by_id[row["idea_id"]]["voted_users"].append(row["user_id"])
+        return ideas
+
+    #Число комментариев к идеям: id идеи -> количество
+    def _comment_counts(self, idea_ids: List[int]) -> Dict[int, int]:
+        if not idea_ids:
+            return {}
+        if len(idea_ids) <= 500:
+            rows = self._conn.execute(
+                "SELECT idea_id, COUNT(*) AS count FROM comments WHERE idea_id IN ("
+                + ", ".join("?" * len(idea_ids)) + ") GROUP BY idea_id", tuple(idea_ids)
+            )
+        else:
+            rows = self._conn.execute("SELECT idea_id, COUNT(*) AS count FROM comments GROUP BY idea_id")
+        return {row["idea_id"]: row["count"] for row in rows}
+
+    #Получение всех идей
+    def get_all_ideas(self) -> List[Dict]:
+        with self._lock:
+            return self._ideas_from_rows(self._conn.execute("SELECT * FROM ideas ORDER BY id").fetchall())
+
+    #Ключ сортировки из курсора страницы (None - первая страница). Значения проверяются здесь,
+    #до запроса: ошибки SQLite при выборке - это сбои базы, а не неверный курсор
+    @staticmethod
+    def _page_after(cursor: Optional[str], columns: tuple) -> Optional[tuple]:
+        if not cursor:
+            return None
+        after = decode_cursor(cursor)
+        if len(after) != len(columns) or not all(
+                isinstance(value, (int, float, str)) and not isinstance(value, bool) for value in after):
+            raise ValueError("Неверный курсор страницы")
+        return after
+
+    #Выборка страницы по ключу сортировки (keyset): строки строго после ключа after, на одну больше limit
+    def _select_page(self, table: str, columns: tuple, reverse: bool, where: List[str],
+                     limit: Optional[int], after: Optional[tuple]) -> tuple:
+        where = list(where)
+        params: List = []
+        key_sql = "(" + ", ".join(columns) + ")"
+        if after is not None:
+            where.append(f"{key_sql} {'<' if reverse else '>'} (" + ", ".join("?" * len(after)) + ")")
+            params.extend(after)
+        direction = "DESC" if reverse else "ASC"
+        sql = f"SELECT *, {', '.join(columns)} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + ", ".join(f"{column} {direction}" for column in columns)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+        rows = self._conn.execute(sql, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(tuple(rows[-1][len(rows[-1]) - len(columns):]))
+        return rows, next_cursor
+
+    #Страница списка идей для фильтра (new, popular, approved, open или all)
+    def get_ideas_page(self, filter: str = "all", limit: Optional[int] = None, cursor: Optional[str] = None,
+                       include_hidden: bool = False) -> Dict[str, any]:
+        where = [] if include_hidden else ["is_hidden = 0"]
+        if filter == "approved":
+            where.append("is_approved = 1")
+        elif filter == "open":
+            where.append("is_approved = 0")
+        columns, reverse = IDEA_ORDERS.get(filter, DEFAULT_IDEA_ORDER)
+        try:
+            after = self._page_after(cursor, columns)
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+        with self._lock:
+            rows, next_cursor = self._select_page("ideas", columns, reverse, where, limit, after)
+            ideas = self._ideas_from_rows([{key: row[key] for key in IDEA_COLUMNS} for row in rows])
+        return {"success": True, "ideas": ideas, "next_cursor": next_cursor}
+
+    #Полнотекстовый поиск идей (см. search_ideas в database.py); индекс хранится в памяти процесса
+    def search_ideas(self, query: str, limit: Optional[int] = None, cursor: Optional[str] = None,
+                     include_hidden: bool = False) -> Dict[str, any]:
+        try:
+            after = decode_search_cursor(cursor)
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+        with self._lock:
+            external_version = self._external_version()
+            if self._search is not None and self._search_version != external_version:
+                self._search = None #Другой процесс изменил базу - индекс процесса устарел
+            if self._search is None:
+                self._search_version = external_version
+                self._search = SearchIndex.from_ideas(self.get_all_ideas())
+                for row in self._conn.execute("SELECT idea_id, text FROM comments"):
+                    self._search.add_comment(row["idea_id"], row["text"])
+            hidden = set() if include_hidden else {
+                row["id"] for row in self._conn.execute("SELECT id FROM ideas WHERE is_hidden = 1")
+            }
+            results, total, next_after = self._search.search(
+                query, limit, after, (lambda idea_id: idea_id not in hidden) if hidden else None
+            )
+            ids = [idea_id for _, idea_id in results]
+            if len(ids) <= 500:
+                rows = self._conn.execute(f"SELECT * FROM ideas WHERE id IN ({', '.join('?' * len(ids))})", ids)
+            else:
+                rows = self._conn.execute("SELECT * FROM ideas") #Ограничение SQLite на число параметров запроса
+            found = set(ids)
+            by_id = {idea["id"]: idea for idea in self._ideas_from_rows([row for row in rows if row["id"] in found])}
+        return {
+            "success": True,
+            "ideas": [by_id[idea_id] for _, idea_id in results if idea_id in by_id],
+            "total_found": total,
+            "next_cursor": encode_cursor(tuple(next_after)) if next_after else None
+        }
+
+    #Проекция списка идей для ответа (см. project_idea в database.py)
+    def project_ideas(self, ideas: List[Dict], summary: bool = False, user_id: Optional[int] = None,
+                      fields: Optional[List[str]] = None) -> List[Dict]:
+        with self._lock:
+            counts = self._comment_counts([idea["id"] for idea in ideas])
+        return [project_idea(idea, summary, user_id, fields, None, counts.get(idea["id"], 0)) for idea in ideas]
+
+    #Получение всех идей (включая скрытые) для администратора
+    def get_all_ideas_admin(self) -> List[Dict]:
+        return self.get_all_ideas()
+
+    #Идея с голосами (без информации об авторе)
+    def _idea_with_details(self, idea_id: int) -> Optional[Dict]:
+        with self._lock:
+            ideas = self._ideas_from_rows(self._conn.execute("SELECT * FROM ideas WHERE id = ?", (idea_id,)).fetchall())
+        return ideas[0] if ideas else None
+
+    #Получение идеи по Id (с информацией об авторе и числом комментариев)
+    def get_idea_by_id(self, idea_id: int) -> Optional[Dict]:
+        idea = self._idea_with_details(idea_id)
+        if idea is None:
+            return None
+        return self.with_authors(self.project_ideas([idea]))[0]
+
+    #Страница комментариев идеи по возрастанию id (см. get_comments_page в database.py)
+    def get_comments_page(self, idea_id: int, limit: Optional[int] = None, cursor: Optional[str] = None,
+                          include_hidden: bool = False) -> Dict[str, any]:
+        with self._lock:
+            idea = self._conn.execute("SELECT is_hidden FROM ideas WHERE id = ?", (idea_id,)).fetchone()
+            if idea is None or (idea["is_hidden"] and not include_hidden):
+                return {"success": False, "message": "Идея не найдена"}
+            try:
+                after = self._page_after(cursor, ("id",))
+            except ValueError as e:
+                return {"success": False, "message": str(e)}
+            rows, next_cursor = self._select_page("comments", ("id",), False, [f"idea_id = {int(idea_id)}"],
+                                                  limit, after)
+            total = self._conn.execute("SELECT COUNT(*) FROM comments WHERE idea_id = ?", (idea_id,)).fetchone()[0]
+        return {
+            "success": True,
+            "comments": [{key: row[key] for key in COMMENT_COLUMNS} for row in rows],
+            "total": total,
+            "next_cursor": next_cursor
+        }
+
+    #Создание новой идеи
+    def create_idea(self, idea_data: Dict) -> int:
+        with self._lock:
+            with self._transaction():
+                cursor = self._conn.execute(
+                    "INSERT INTO ideas (title, short_description, full_description, expected_effect, author_id, "
+                    "category, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        idea_data["title"],
+                        idea_data.get("short_description", ""),
+                        idea_data.get("full_description", ""),
+                        idea_data.get("expected_effect", ""),
+                        idea_data.get("author_id", 0),
+                        idea_data.get("category", "IT"),
+                        datetime.now().isoformat(),
+                    )
+                )
+                idea_id = cursor.lastrowid
+            if self._search is not None:
+                self._search.add_idea({"id": idea_id, **idea_data})
+            #Событие публикуется после фиксации транзакции, но еще под блокировкой - в порядке изменений
+            self._publish("idea_created", idea=self._idea_with_details(idea_id))
+            return idea_id
+
+    #Голосование за идею: уникальность голоса обеспечивает ограничение UNIQUE (idea_id, user_id)
+    def vote_for_idea(self, idea_id: int, user_id: int, vote: str) -> Dict:
+        with self._lock:
+            with self._transaction():
+                idea = self._conn.execute("SELECT is_hidden FROM ideas WHERE id = ?", (idea_id,)).fetchone()
+                if idea is None:
+                    return {"success": False, "message": "Идея не найдена."}
+                if idea["is_hidden"]:
+                    return {"success": False, "message": "Идея скрыта и недоступна для голосования."}
+                if vote not in ("for", "against"):
+                    return {"success": False, "message": "Неверный тип голоса. Используйте 'for' или 'against'."}
+                try:
+                    self._conn.execute(
+                        "INSERT INTO votes (idea_id, user_id, vote) VALUES (?, ?, ?)", (idea_id, user_id, vote)
+                    )
+                except sqlite3.IntegrityError:
+                    return {"success": False, "message": "Пользователь уже голосовал за эту идею."}
+                column = "votes_for" if vote == "for" else "votes_against"
+                self._conn.execute(f"UPDATE ideas SET {column} = {column} + 1 WHERE id = ?", (idea_id,))
+                counts = self._conn.execute(
+                    "SELECT votes_for, votes_against FROM ideas WHERE id = ?", (idea_id,)
+                ).fetchone()
+            self._publish("votes_changed", idea_id=idea_id, user_id=user_id,
+                          votes_for=counts["votes_for"], votes_against=counts["votes_against"])
+        return {
+            "success": True,
+            "message": "Голос учтён.",
+            "votes_for": counts["votes_for"],
+            "votes_against": counts["votes_against"]
+        }
+
+    #Добавление комментария к идее
+    def add_comment(self, idea_id: int, user_id: int, text: str) -> Optional[int]:
+        with self._lock:
+            with self._transaction():
+                idea = self._conn.execute("SELECT is_hidden FROM ideas WHERE id = ?", (idea_id,)).fetchone()
+                if idea is None:
+                    return None
+                created_at = datetime.now().isoformat()
+                cursor = self._conn.execute(
+                    "INSERT INTO comments (idea_id, user_id, text, created_at) VALUES (?, ?, ?, ?)",
+                    (idea_id, user_id, text, created_at)
+                )
+                comment_id = cursor.lastrowid
+            if self._search is not None:
+                self._search.add_comment(idea_id, text)
+            comment = {"id": comment_id, "idea_id": idea_id, "user_id": user_id, "text": text, "created_at": created_at}
+            if not idea["is_hidden"]:
+                self._publish("comment_added", idea_id=idea_id, comment=comment,
+                              comment_count=self._comment_counts([idea_id]).get(idea_id, 0))
+            return comment_id
+
+    #Изменение флага идеи (одобрение, скрытие) и публикация события
+    def _set_idea_flag(self, idea_id: int, column: str, value: bool, event_type: str) -> bool:
+        with self._lock:
+            with self._transaction():
+                cursor = self._conn.execute(f"UPDATE ideas SET {column} = ? WHERE id = ?", (int(value), idea_id))
+            if cursor.rowcount == 0:
+                return False
+            if event_type == "idea_unhidden":
+                self._publish(event_type, idea=self.project_ideas([self._idea_with_details(idea_id)])[0])  #Клиенты добавляют идею обратно в список
+            else:
+                self._publish(event_type, idea_id=idea_id)
+            return True
+
+    def approve_idea(self, idea_id: int) -> bool:
+        return self._set_idea_flag(idea_id, "is_approved", True, "idea_approved")
+
+    def hide_idea(self, idea_id: int) -> bool:
+        return self._set_idea_flag(idea_id, "is_hidden", True, "idea_hidden")
+
+    def unhide_idea(self, idea_id: int) -> bool:
+        return self._set_idea_flag(idea_id, "is_hidden", False, "idea_unhidden")
+
+    #Массовая модерация идей в одной транзакции (см. moderate_ideas в database.py)
+    def moderate_ideas(self, idea_ids: List[int], action: str) -> Dict[str, any]:
+        if action not in MODERATION_ACTIONS:
+            return {"success": False, "message": "Неизвестное действие модерации"}
+        column, value, event_type = MODERATION_ACTIONS[action]
+        results, changed = [], []
+        with self._lock:
+            with self._transaction():
+                for idea_id in dict.fromkeys(idea_ids):
+                    row = self._conn.execute(f"SELECT {column} FROM ideas WHERE id = ?", (idea_id,)).fetchone()
+                    if row is None:
+                        results.append({"idea_id": idea_id, "success": False, "message": "Идея не найдена."})
+                        continue
+                    results.append({"idea_id": idea_id, "success": True})
+                    if bool(row[column]) != value:
+                        self._conn.execute(f"UPDATE ideas SET {column} = ? WHERE id = ?", (int(value), idea_id))
+                        changed.append(idea_id)
+            for idea_id in changed:
+                if event_type == "idea_unhidden":
+                    self._publish(event_type, idea=self.project_ideas([self._idea_with_details(idea_id)])[0])
+                else:
+                    self._publish(event_type, idea_id=idea_id)
+        return {"success": True, "results": results}
+
+    #Массовое удаление комментариев в одной транзакции (см. delete_comments в database.py)
+    def delete_comments(self, comments: List[tuple]) -> Dict[str, any]:
+        results, removed = [], []
+        with self._lock:
+            with self._transaction():
+                for idea_id, comment_id in comments:
+                    if self._conn.execute("SELECT 1 FROM ideas WHERE id = ?", (idea_id,)).fetchone() is None:
+                        results.append({"idea_id": idea_id, "comment_id": comment_id, "success": False, "message": "Идея не найдена"})
+                        continue
+                    comment = self._conn.execute(
+                        "SELECT text FROM comments WHERE id = ? AND idea_id = ?", (comment_id, idea_id)
+                    ).fetchone()
+                    if comment is None:
+                        results.append({"idea_id": idea_id, "comment_id": comment_id, "success": False, "message": "Комментарий не найден"})
+                        continue
+                    self._conn.execute("DELETE FROM comments WHERE id = ?", (comment_id,))
+                    results.append({"idea_id": idea_id, "comment_id": comment_id, "success": True})
+                    removed.append((idea_id, comment_id, comment["text"]))
+            if self._search is not None:
+                for idea_id, _, text in removed:
+                    self._search.remove_comment(idea_id, text)
+            counts = self._comment_counts(list({idea_id for idea_id, _, _ in removed}))
+            for idea_id, comment_id, _ in removed:
+                self._publish("comment_deleted", idea_id=idea_id, comment_id=comment_id,
+                              comment_count=counts.get(idea_id, 0))
+        return {"success": True, "results": results}
+
+    #Удаление комментария (админ)
+    def delete_comment(self, idea_id: int, comment_id: int) -> Dict[str, any]:
+        with self._lock:
+            with self._transaction():
+                if self._conn.execute("SELECT 1 FROM ideas WHERE id = ?", (idea_id,)).fetchone() is None:
+                    return {"success": False, "message": "Идея не найдена"}
+                comment = self._conn.execute(
+                    "SELECT text FROM comments WHERE id = ? AND idea_id = ?", (comment_id, idea_id)
+                ).fetchone()
+                if comment is None:
+                    return {"success": False, "message": "Комментарий не найден"}
+                self._conn.execute("DELETE FROM comments WHERE id = ?", (comment_id,))
+            if self._search is not None:
+                self._search.remove_comment(idea_id, comment["text"])
+            self._publish("comment_deleted", idea_id=idea_id, comment_id=comment_id,
+                          comment_count=self._comment_counts([idea_id]).get(idea_id, 0))
+        return {"success": True, "message": f"Комментарий #{comment_id} удалён"}
+
+    #Создание пользователя (обычного или с временным открытым паролем); хеш вычисляется до блокировки
+    def _insert_user(self, username: str, password: str, role: str, temp_password: bool) -> Optional[int]:
+        if self._get_user_record_by_username(username) is not None:
+            return None #Логин уже занят - хешировать незачем
+        password_hash = self.hash_password(password)
+        try:
+            with self._lock, self._transaction():
+                return self._insert_user_row(username, password, password_hash, role, temp_password,
+                                             datetime.now().isoformat())
+        except sqlite3.IntegrityError:
+            return None #Логин уже занят
+
+    #Вставка строки пользователя (вызывается внутри транзакции), возвращает id
+    def _insert_user_row(self, username: str, password: str, password_hash: str, role: str, temp_password: bool,
+                         created_at: str) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO users (username, password, plain_password, is_temp_password, role, "
+            "needs_password_change, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                username,
+                password_hash,
+                password if temp_password else None,
+                int(temp_password),
+                role,
+                int(role == "admin"),
+                created_at,
+            )
+        )
+        return cursor.lastrowid
+
+    #Массовое создание пользователей в одной транзакции (см. create_users_bulk в database.py)
+    def create_users_bulk(self, count: int, make_username: Callable[[], str], make_password: Callable[[], str],
+                          role: str = "user", temp_password: bool = False) -> Dict[str, any]:
+        passwords = [make_password() for _ in range(count)]
+        hashes = self.hasher.hash_many(passwords)  #До блокировки, всей партией
+        created_at = datetime.now().isoformat()
+        created = []
+        with self._lock, self._transaction():
+            taken = {row["username"] for row in self._conn.execute("SELECT username FROM users")}
+            for password, password_hash in zip(passwords, hashes):
+                username = make_username()
+                while username in taken:  #Логин занят - генерируем другой
+                    username = make_username()
+                taken.add(username)
+                user_id = self._insert_user_row(username, password, password_hash, role, temp_password, created_at)
+                created.append({"id": user_id, "username": username, "password": password})
+        return {"success": True, "users": created}
+
+    def create_user(self, username: str, password: str, role: str = "user") -> Dict[str, any]:
+        user_id = self._insert_user(username, password, role, temp_password=False)
+        if user_id is None:
+            return {"success": False, "message": "Пользователь с таким именем уже существует"}
+        return {"success": True, "user_id": user_id}
+
+    def create_user_temp_password(self, username: str, password: str, role: str = "user") -> Dict[str, any]:
+        user_id = self._insert_user(username, password, role, temp_password=True)
+        if user_id is None:
+            return {"success": False, "message": "Пользователь с таким именем уже существует"}
+        return {"success": True, "user_id": user_id, "username": username, "password": password}
+
+    #Поиск записи пользователя (с паролем) по логину
+    def _get_user_record_by_username(self, username: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+        return self._user_from_row(row) if row else None
+
+    #Получение пользователя по ID (без паролей)
+    def get_user_by_id(self, user_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        user = self._user_from_row(row)
+        user.pop("password", None)
+        user.pop("plain_password", None)
+        return user
+
+    #Получение нескольких пользователей (без паролей) одним запросом: id -> пользователь
+    def get_users_by_ids(self, user_ids) -> Dict[int, Dict]:
+        ids = list(set(user_ids))
+        users = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):  #Ограничение SQLite на число параметров запроса
+                chunk = ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT * FROM users WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for row in rows:
+                    user = self._user_from_row(row)
+                    user.pop("password", None)
+                    user.pop("plain_password", None)
+                    users[user["id"]] = user
+        return users
+
+    #Добавление информации об авторах к списку идей
+    def with_authors(self, ideas: List[Dict]) -> List[Dict]:
+        authors = self.get_users_by_ids(idea["author_id"] for idea in ideas if idea.get("author_id"))
+        return attach_authors(ideas, authors)
+
+    #Получение списка всех пользователей (без паролей)
+    def get_all_users(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM users ORDER BY id").fetchall()
+        users = []
+        for row in rows:
+            user = self._user_from_row(row)
+            del user["password"]
+            users.append(user)
+        return users
+
+    #Страница списка пользователей (без паролей) в порядке id
+    def get_users_page(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> Dict[str, any]:
+        try:
+            after = self._page_after(cursor, ("id",))
+        except ValueError as e:
+            return {"success": False, "message": str(e)}
+        with self._lock:
+            rows, next_cursor = self._select_page("users", ("id",), False, [], limit, after)
+        users = []
+        for row in rows:
+            user = self._user_from_row({key: row[key] for key in USER_COLUMNS})
+            del user["password"]
+            users.append(user)
+        return {"success": True, "users": users, "next_cursor": next_cursor}
+
+    def get_temp_password_users(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, username, password, role, created_at FROM users WHERE is_temp_password = 1 ORDER BY id"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    #Хеширование временного пароля пользователя (при первом входе)
+    def confirm_temp_password(self, user_id: int, plain_password: str) -> bool:
+        password_hash = self.hash_password(plain_password)
+        with self._lock, self._transaction():
+            cursor = self._conn.execute(
+                "UPDATE users SET password = ?, plain_password = NULL, is_temp_password = 0 "
+                "WHERE id = ? AND is_temp_password = 1",
+                (password_hash, user_id)
+            )
+            return cursor.rowcount > 0
+
+    #Замена устаревшего хеша пароля новым, если хеш не изменился с момента проверки
+    def upgrade_password_hash(self, user_id: int, old_hash: str, new_hash: str) -> bool:
+        with self._lock, self._transaction():
+            cursor = self._conn.execute(
+                "UPDATE users SET password = ? WHERE id = ? AND password = ?", (new_hash, user_id, old_hash)
+            )
+            return cursor.rowcount > 0
+
+    def hash_temp_passwords(self) -> Dict[str, any]:
+        with self._lock, self._transaction():
+            cursor = self._conn.execute(
+                "UPDATE users SET plain_password = NULL, is_temp_password = 0 "
+                "WHERE is_temp_password = 1 AND plain_password IS NOT NULL"
+            )
+            hashed_count = cursor.rowcount
+        return {
+            "success": True,
+            "message": f"Удалено {hashed_count} открытых паролей",
+            "hashed_count": hashed_count
+        }
+
+    #Завершение представления пользователя (ввод ФИО)
+    def complete_user_introduction(self, user_id: int, full_name: str) -> Dict[str, any]:
+        with self._lock, self._transaction():
+            cursor = self._conn.execute(
+                "UPDATE users SET full_name = ?, has_completed_introduction = 1 WHERE id = ?",
+                (full_name.strip(), user_id)
+            )
+        if cursor.rowcount == 0:
+            return {"success": False, "message": "Пользователь не найден"}
+        return {"success": True}
+
+    #Смена пароля администратора (хеширование - без блокировки, см. database.py)
+    def change_admin_password(self, user_id: int, current_password: str, new_password: str) -> Dict[str, any]:
+        with self._lock:
+            user = self._conn.execute("SELECT role, password FROM users WHERE id = ?", (user_id,)).fetchone()
+        if user is None:
+            return {"success": False, "message": "Пользователь не найден"}
+        if user["role"] != "admin":
+            return {"success": False, "message": "Доступ запрещён. Требуются права администратора."}
+        if not self.verify_password(current_password, user["password"]):
+            return {"success": False, "message": "Текущий пароль неверен."}
+        if len(new_password) < 4:
+            return {"success": False, "message": "Новый пароль должен содержать минимум 4 символа."}
+        new_hash = self.hash_password(new_password)
+        with self._lock, self._transaction():
+            cursor = self._conn.execute(
+                "UPDATE users SET password = ?, needs_password_change = 0 WHERE id = ? AND password = ?",
+                (new_hash, user_id, user["password"])
+            )
+        if cursor.rowcount == 0:
+            return {"success": False, "message": "Пароль был изменён. Попробуйте снова."}
+        return {"success": True}
+
+    #Блокировка/разблокировка пользователя
+    def _set_user_active(self, user_id: int, is_active: bool) -> Dict[str, any]:
+        with self._lock, self._transaction():
+            user = self._conn.execute("SELECT role FROM users WHERE id = ?", (user_id,)).fetchone()
+            if user is None:
+                return {"success": False, "message": "Пользователь не найден"}
+            if not is_active and user["role"] == "admin":
+                return {"success": False, "message": "Нельзя заблокировать администратора"}
+            self._conn.execute("UPDATE users SET is_active = ? WHERE id = ?", (int(is_active), user_id))
+        return {"success": True}
+
+    def block_user(self, user_id: int) -> Dict[str, any]:
+        return self._set_user_active(user_id, False)
+
+    def unblock_user(self, user_id: int) -> Dict[str, any]:
+        return self._set_user_active(user_id, True)
+
+    #Удаление пользователя вместе с его идеями (голоса и комментарии к идеям удаляются каскадно)
+    def delete_user(self, user_id: int) -> Dict[str, any]:
+        with self._lock:
+            with self._transaction():
+                user = self._conn.execute("SELECT role FROM users WHERE id = ?", (user_id,)).fetchone()
+                if user is None:
+                    return {"success": False, "message": "Пользователь не найден"}
+                if user["role"] == "admin":
+                    return {"success": False, "message": "Нельзя удалить администратора"}
+                self._conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+                removed_ids = [row["id"] for row in self._conn.execute("SELECT id FROM ideas WHERE author_id = ?", (user_id,))]
+                self._conn.execute("DELETE FROM ideas WHERE author_id = ?", (user_id,))
+            self._search = None #Индекс поиска перестроится при следующем запросе
+            if removed_ids:
+                self._publish("ideas_deleted", idea_ids=removed_ids)
+        return {"success": True}
+
+    #Получение списка категорий
+    def get_categories(self) -> List[str]:
+        with self._lock:
+            return [row["name"] for row in self._conn.execute("SELECT name FROM categories ORDER BY position")]
+
+    #Получение настроек приложения (items_per_page и т.д.)
+    def get_settings(self) -> Dict[str, any]:
+        with self._lock:
+            return {row["key"]: json.loads(row["value"]) for row in self._conn.execute("SELECT key, value FROM settings")}
+
+    #Добавление новой категории (админ)
+    def add_category(self, category_name: str) -> Dict[str, any]:
+        if not category_name.strip():
+            return {"success": False, "message": "Название категории не может быть пустым"}
+        try:
+            with self._lock, self._transaction():
+                self._conn.execute("INSERT INTO categories (name) VALUES (?)", (category_name.strip(),))
+        except sqlite3.IntegrityError:
+            return {"success": False, "message": "Категория с таким названием уже существует"}
+        return {"success": True, "message": f"Категория '{category_name}' успешно добавлена"}
+
+    #Обновление названия категории вместе с идеями в одной транзакции (админ)
+    def update_category(self, old_name: str, new_name: str) -> Dict[str, any]:
+        if not new_name.strip():
+            return {"success": False, "message": "Новое название категории не может быть пустым"}
+        with self._lock, self._transaction():
+            if self._conn.execute("SELECT 1 FROM categories WHERE name = ?", (old_name,)).fetchone() is None:
+                return {"success": False, "message": "Категория не найдена"}
+            if new_name != old_name and self._conn.execute(
+                "SELECT 1 FROM categories WHERE name = ?", (new_name,)
+            ).fetchone() is not None:
+                return {"success": False, "message": "Категория с таким названием уже существует"}
+            self._conn.execute("UPDATE categories SET name = ? WHERE name = ?", (new_name.strip(), old_name))
+            self._conn.execute("UPDATE ideas SET category = ? WHERE category = ?", (new_name.strip(), old_name))
+        return {"success": True, "message": f"Категория '{old_name}' успешно изменена на '{new_name}'"}
+
+    #Удаление категории (админ)
+    def delete_category(self, category_name: str) -> Dict[str, any]:
+        with self._lock, self._transaction():
+            if self._conn.execute("SELECT 1 FROM categories WHERE name = ?", (category_name,)).fetchone() is None:
+                return {"success": False, "message": "Категория не найдена"}
+            count = self._conn.execute(
+                "SELECT COUNT(*) FROM ideas WHERE category = ?", (category_name,)
+            ).fetchone()[0]
+            if count:
+                return {
+                    "success": False,
+                    "message": f"Невозможно удалить категорию. Существуют идеи ({count}) с этой категорией"
+                }
+            self._conn.execute("DELETE FROM categories WHERE name = ?", (category_name,))
+        return {"success": True, "message": f"Категория '{category_name}' успешно удалена"}
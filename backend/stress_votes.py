@@ -0,0 +1,87 @@
+"""
+Стресс-проверка отсутствия потерянных изменений при параллельной работе с базой.
+
+100 клиентов (потоков) одновременно голосуют за одни и те же идеи и создают новые идеи,
+после чего проверяется, что ни один голос и ни одна идея не потерялись, в том числе после
+повторного чтения данных с диска. Запуск из папки backend:
+    python stress_votes.py [--clients 100] [--ideas 5] [--journal] [--backend json|sqlite]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+
+from database import JSONDatabase
+from sqlite_database import SQLiteDatabase
+
+
+def open_db(backend: str, folder: str, journal: bool):
+    if backend == "sqlite":
+        return SQLiteDatabase(os.path.join(folder, "stress.sqlite3"))
+    return JSONDatabase(folder, journal=journal)
+
+
+def run(clients: int, ideas_count: int, backend: str, journal: bool) -> list:
+    folder = tempfile.mkdtemp(prefix="stress_votes_")
+    db = open_db(backend, folder, journal)
+    idea_ids = [db.create_idea({"title": f"Идея {i}", "author_id": 1}) for i in range(ideas_count)]
+
+    barrier = threading.Barrier(clients) #Все клиенты стартуют одновременно
+    failures = []
+    created_ids = []
+
+    def client(user_id: int):
+        barrier.wait()
+        for idea_id in idea_ids:
+            result = db.vote_for_idea(idea_id, user_id, "for" if user_id % 2 else "against")
+            if not result["success"]:
+                failures.append(f"голос {user_id} за идею {idea_id} отклонен: {result['message']}")
+        created_ids.append(db.create_idea({"title": f"Идея клиента {user_id}", "author_id": user_id}))
+        #Повторный голос того же клиента должен быть отклонен
+        if db.vote_for_idea(idea_ids[0], user_id, "for")["success"]:
+            failures.append(f"повторный голос {user_id} принят")
+
+    threads = [threading.Thread(target=client, args=(user_id,)) for user_id in range(1, clients + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    errors = list(failures)
+    #Проверяем данные в памяти процесса и заново прочитанные с диска
+    for label, check_db in (("в памяти", db), ("с диска", open_db(backend, folder, journal))):
+        ideas = {idea["id"]: idea for idea in check_db.get_all_ideas()}
+        for idea_id in idea_ids:
+            idea = ideas.get(idea_id)
+            if idea is None:
+                errors.append(f"{label}: идея {idea_id} потеряна")
+                continue
+            total = idea["votes_for"] + idea["votes_against"]
+            if total != clients or len(idea["voted_users"]) != clients or len(set(idea["voted_users"])) != clients:
+                errors.append(
+                    f"{label}: идея {idea_id}: голосов {total}, проголосовавших {len(idea['voted_users'])}, ожидалось {clients}"
+                )
+        if len(set(created_ids)) != clients:
+            errors.append(f"{label}: выданы повторяющиеся id идей")
+        missing = set(created_ids) - set(ideas)
+        if missing:
+            errors.append(f"{label}: потеряны созданные идеи {sorted(missing)[:10]}")
+    return errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Стресс-проверка параллельных голосов")
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--ideas", type=int, default=5)
+    parser.add_argument("--journal", action="store_true", help="режим журнала JSONDatabase")
+    parser.add_argument("--backend", choices=["json", "sqlite"], default="json")
+    args = parser.parse_args()
+
+    errors = run(args.clients, args.ideas, args.backend, args.journal)
+    if errors:
+        print("Обнаружены потерянные изменения:")
+        for error in errors:
+            print(" -", error)
+        sys.exit(1)
+    print(f"OK: {args.clients} клиентов, {args.ideas} идей - потерянных голосов и идей нет")
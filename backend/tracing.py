@@ -0,0 +1,117 @@
+"""
+Учет работы хранилища в рамках одного запроса (по запросу клиента или для медленных запросов).
+
+Трассировка включается заголовком X-Debug-Timing: 1 или параметром ?debug_timing=1 и считает
+все загрузки (_load_json) и записи (_save_json, журнал) файлов за время запроса: сколько раз,
+сколько байт и сколько времени. Итог возвращается в заголовке Server-Timing (виден во вкладке
+Network браузера), поэтому лишние разборы users.json или ideas.json в одном запросе (N+1) видны сразу.
+При SLOW_REQUEST_MS трассируются все запросы, а запросы дольше порога пишутся в лог.
+
+Текущая трассировка хранится в contextvars: AsyncStorage передает контекст в потоки хранилища.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger("slow_requests")
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_trace", default=None)
+
+
+#Трассировка текущего запроса (None - запрос не трассируется)
+def current_trace() -> Optional["RequestTrace"]:
+    return _current.get()
+
+
+class RequestTrace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock() #Потоки хранилища могут обновлять трассировку одновременно
+        self.loads = 0 #Вызовы _load_json
+        self.reads = 0 #Чтения файлов с диска (данных не было в кэше или дописан журнал)
+        self.read_bytes = 0
+        self.read_seconds = 0.0 #Чтение с диска и разбор JSON
+        self.saves = 0 #Сохранения снимков и записи в журнал
+        self.written_bytes = 0
+        self.write_seconds = 0.0 #Сериализация и запись на диск
+
+    def load(self):
+        with self._lock:
+            self.loads += 1
+
+    def read(self, size: int, seconds: float):
+        with self._lock:
+            self.reads += 1
+            self.read_bytes += size
+            self.read_seconds += seconds
+
+    def write(self, size: int, seconds: float):
+        with self._lock:
+            self.saves += 1
+            self.written_bytes += size
+            self.write_seconds += seconds
+
+    #Значение заголовка Server-Timing; total - время запроса до начала ответа, секунды
+    def server_timing(self, total: float) -> str:
+        return ", ".join([
+            f'storage-read;dur={self.read_seconds * 1000:.2f};desc="{self.loads} loads, {self.reads} file reads, '
+            f'{self.read_bytes} B"',
+            f'storage-write;dur={self.write_seconds * 1000:.2f};desc="{self.saves} writes, {self.written_bytes} B"',
+            f"total;dur={total * 1000:.2f}",
+        ])
+
+    def summary(self) -> Dict[str, float]:
+        return {"loads": self.loads, "reads": self.reads, "read_bytes": self.read_bytes,
+                "read_ms": round(self.read_seconds * 1000, 2), "writes": self.saves,
+                "written_bytes": self.written_bytes, "write_ms": round(self.write_seconds * 1000, 2)}
+
+
+#ASGI-middleware трассировки: заводит RequestTrace для запроса, добавляет Server-Timing к ответу,
+#пишет в лог запросы дольше slow_ms (по умолчанию SLOW_REQUEST_MS; 0 - не писать).
+#Для потоковых ответов учитывается работа до отправки заголовков
+class TraceMiddleware:
+    def __init__(self, app, slow_ms: float = None):
+        self.app = app
+        self.slow_ms = float(os.environ.get("SLOW_REQUEST_MS", 0)) if slow_ms is None else slow_ms
+
+    @staticmethod
+    def _requested(scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == b"x-debug-timing":
+                return value.strip() not in (b"", b"0")
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        return query.get("debug_timing", ["0"])[0] not in ("", "0")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = self._requested(scope)
+        if not requested and not self.slow_ms:
+            await self.app(scope, receive, send)
+            return
+        trace = RequestTrace()
+        token = _current.set(trace)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and requested:
+                headers = list(message.get("headers", []))
+                timing = trace.server_timing(time.perf_counter() - trace.started)
+                headers.append((b"server-timing", timing.encode("latin-1")))
+                headers.append((b"timing-allow-origin", b"*")) #Server-Timing доступен странице с другого домена
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            elapsed = (time.perf_counter() - trace.started) * 1000
+            if self.slow_ms and elapsed >= self.slow_ms:
+                path = scope["path"] + ("?" + scope["query_string"].decode("latin-1") if scope.get("query_string") else "")
+                logger.warning("Медленный запрос %s %s: %.1f мс, хранилище %s", scope["method"], path, elapsed,
+                               trace.summary())
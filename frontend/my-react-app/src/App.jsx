@@ -3,7 +3,7 @@ import { useEffect, useState } from "react";
 import Home from "./pages/Home";
 import Login from "./pages/Login";
 import AdminDashboard from "./pages/AdminDashboard";
-import { checkServerHealth } from "./api/api";
+import { checkServerHealth, clearToken, getToken } from "./api/api";
 import styles from "./App.module.scss";
 
 function Header({ user, setUser }) {
@@ -27,6 +27,7 @@ function Header({ user, setUser }) {
           <button 
             onClick={() => {
               localStorage.removeItem("user");//Удаляем пользователя из хранилища
+              clearToken();//И токен, с которым выполнялись запросы
               setUser(null);//Сбрасываем состояние пользователя
             }}
             className={styles.logoutBtn}
@@ -72,8 +73,9 @@ function AppContent() {
         setServerStatus(health.status === "ok" ? "connected" : "error");
         
         //Только после проверки сервера загружаем пользователя
+        //Без токена сохраненный пользователь не сможет выполнять запросы - нужен повторный вход
         const savedUser = localStorage.getItem("user");
-        if (savedUser) {
+        if (savedUser && getToken()) {
           try {
             setUser(JSON.parse(savedUser));
           } catch {
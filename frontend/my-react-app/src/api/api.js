@@ -1,10 +1,31 @@
 const API_BASE = "/api";
 
+//Токен, выданный сервером при входе; передается в заголовке Authorization каждого запроса
+const TOKEN_KEY = "token";
+
+export const getToken = () => localStorage.getItem(TOKEN_KEY);
+
+export const clearToken = () => localStorage.removeItem(TOKEN_KEY);
+
+//fetch с токеном пользователя. Если сервер отверг токен (истек срок, пользователь заблокирован),
+//данные входа удаляются и открывается страница входа
+const apiFetch = async (url, options = {}) => {
+  const token = getToken();
+  const headers = token ? { ...options.headers, Authorization: `Bearer ${token}` } : options.headers;
+  const response = await fetch(url, { ...options, headers });
+  if (response.status === 401 && token) {
+    clearToken();
+    localStorage.removeItem("user");
+    window.location.assign("/login");
+  }
+  return response;
+};
+
 //Функция для авторизации пользователя
 export const login = async (username, password) => {
   try {
     //Отправляем POST запрос на эндпоинт /login
-    const response = await fetch(`${API_BASE}/login`, {
+    const response = await apiFetch(`${API_BASE}/login`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",//Указываем что отправляем JSON
@@ -24,6 +45,9 @@ export const login = async (username, password) => {
     //Парсим JSON ответ
     const result = await response.json();
     console.log('Login success:', result);//Логируем успешный результат
+    if (result.success && result.token) {
+      localStorage.setItem(TOKEN_KEY, result.token);//Сохраняем токен для следующих запросов
+    }
     return result;//Возвращаем результат
   } catch (error) {
     //Обрабатываем ошибки соединения
@@ -39,7 +63,7 @@ export const login = async (username, password) => {
 export const changePassword = async (currentPassword, newPassword) => {
   try {
     //Отправляем POST запрос на эндпоинт /change-password
-    const response = await fetch(`${API_BASE}/change-password`, {
+    const response = await apiFetch(`${API_BASE}/change-password`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -84,7 +108,7 @@ export const changePassword = async (currentPassword, newPassword) => {
 export const completeIntroduction = async (fullName) => {
   try {
     //Отправляем POST запрос на эндпоинт /complete-introduction
-    const response = await fetch(`${API_BASE}/complete-introduction`, {
+    const response = await apiFetch(`${API_BASE}/complete-introduction`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -115,7 +139,7 @@ export const completeIntroduction = async (fullName) => {
 export const getIdeas = async (filter = "open") => {
   try {
     //Отправляем GET запрос на эндпоинт /ideas с параметром фильтра
-    const response = await fetch(`${API_BASE}/ideas?filter=${filter}`);
+    const response = await apiFetch(`${API_BASE}/ideas?filter=${filter}`);
     if (!response.ok) throw new Error('Network response was not ok');
     return await response.json();//Возвращаем список идей
   } catch (error) {
@@ -128,7 +152,7 @@ export const getIdeas = async (filter = "open") => {
 export const getAdminIdeas = async () => {
   try {
     //Отправляем GET запрос на админский эндпоинт /admin/ideas
-    const response = await fetch(`${API_BASE}/admin/ideas`);
+    const response = await apiFetch(`${API_BASE}/admin/ideas`);
     if (!response.ok) throw new Error('Network response was not ok');
     return await response.json();
   } catch (error) {
@@ -141,7 +165,7 @@ export const getAdminIdeas = async () => {
 export const getAdminIdeasWithAuthors = async () => {
   try {
     // Сначала пробуем новый эндпоинт
-    const response = await fetch(`${API_BASE}/admin/ideas-with-authors`);
+    const response = await apiFetch(`${API_BASE}/admin/ideas-with-authors`);
     
     if (!response.ok) {
       // Если новый эндпоинт не найден, используем старый
@@ -164,7 +188,7 @@ export const getAdminIdeasWithAuthors = async () => {
 export const getIdea = async (id) => {
   try {
     //Отправляем GET запрос на эндпоинт /idea/{id}
-    const response = await fetch(`${API_BASE}/idea/${id}`);
+    const response = await apiFetch(`${API_BASE}/idea/${id}`);
     if (!response.ok) throw new Error("Идея не найдена");
     return await response.json();
   } catch (error) {
@@ -173,11 +197,26 @@ export const getIdea = async (id) => {
   }
 };
 
+//Функция для получения страницы комментариев идеи (cursor - из next_cursor предыдущей страницы)
+export const getIdeaComments = async (ideaId, cursor = null, limit = 20, admin = false) => {
+  try {
+    const params = new URLSearchParams({ limit });
+    if (cursor) params.set("cursor", cursor);
+    //Отправляем GET запрос на эндпоинт /idea/{id}/comments (админ видит и комментарии скрытых идей)
+    const response = await apiFetch(`${API_BASE}${admin ? "/admin" : ""}/idea/${ideaId}/comments?${params}`);
+    if (!response.ok) throw new Error("Не удалось загрузить комментарии");
+    return await response.json();
+  } catch (error) {
+    console.error('Get comments error:', error);
+    return { success: false, comments: [], next_cursor: null, total: 0 };
+  }
+};
+
 //Функция для создания новой идеи
 export const createIdea = async (ideaData) => {
   try {
     //Отправляем POST запрос на эндпоинт /idea
-    const response = await fetch(`${API_BASE}/idea`, {
+    const response = await apiFetch(`${API_BASE}/idea`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -214,7 +253,7 @@ export const voteIdea = async (ideaId, userId, vote) => {
     });
     
     //Отправляем POST запрос на эндпоинт /idea/{id}/vote
-    const response = await fetch(`${API_BASE}/idea/${ideaId}/vote`, {
+    const response = await apiFetch(`${API_BASE}/idea/${ideaId}/vote`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -266,7 +305,7 @@ export const addComment = async (ideaId, userId, text) => {
     }
     
     //Отправляем POST запрос на эндпоинт /idea/{id}/comment
-    const response = await fetch(`${API_BASE}/idea/${ideaId}/comment`, {
+    const response = await apiFetch(`${API_BASE}/idea/${ideaId}/comment`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -295,7 +334,7 @@ export const addComment = async (ideaId, userId, text) => {
 export const getAllUsers = async () => {
   try {
     //Отправляем GET запрос на админский эндпоинт /admin/users
-    const response = await fetch(`${API_BASE}/admin/users`);
+    const response = await apiFetch(`${API_BASE}/admin/users`);
     if (!response.ok) throw new Error('Network response was not ok');
     return await response.json();
   } catch (error) {
@@ -308,7 +347,7 @@ export const getAllUsers = async () => {
 export const blockUser = async (userId) => {
   try {
     //Отправляем POST запрос на эндпоинт /admin/users/{id}/block
-    const response = await fetch(`${API_BASE}/admin/users/${userId}/block`, {
+    const response = await apiFetch(`${API_BASE}/admin/users/${userId}/block`, {
       method: "POST",
     });
     return await response.json();
@@ -322,7 +361,7 @@ export const blockUser = async (userId) => {
 export const unblockUser = async (userId) => {
   try {
     //Отправляем POST запрос на эндпоинт /admin/users/{id}/unblock
-    const response = await fetch(`${API_BASE}/admin/users/${userId}/unblock`, {
+    const response = await apiFetch(`${API_BASE}/admin/users/${userId}/unblock`, {
       method: "POST",
     });
     return await response.json();
@@ -336,7 +375,7 @@ export const unblockUser = async (userId) => {
 export const approveIdea = async (ideaId) => {
   try {
     //Отправляем POST запрос на эндпоинт /admin/idea/{id}/approve
-    const response = await fetch(`${API_BASE}/admin/idea/${ideaId}/approve`, {
+    const response = await apiFetch(`${API_BASE}/admin/idea/${ideaId}/approve`, {
       method: "POST",
     });
     return await response.json();
@@ -350,7 +389,7 @@ export const approveIdea = async (ideaId) => {
 export const hideIdea = async (ideaId) => {
   try {
     //Отправляем POST запрос на эндпоинт /admin/idea/{id}/hide
-    const response = await fetch(`${API_BASE}/admin/idea/${ideaId}/hide`, {
+    const response = await apiFetch(`${API_BASE}/admin/idea/${ideaId}/hide`, {
       method: "POST",
     });
     return await response.json();
@@ -360,11 +399,29 @@ export const hideIdea = async (ideaId) => {
   }
 };
 
+//Функция для массовой модерации идей одним запросом (action - approve, hide или unhide)
+export const moderateIdeas = async (action, ideaIds) => {
+  try {
+    //Отправляем POST запрос на эндпоинт /admin/ideas/bulk, в ответе - результат по каждой идее
+    const response = await apiFetch(`${API_BASE}/admin/ideas/bulk`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ action, idea_ids: ideaIds }),
+    });
+    const result = await response.json();
+    if (!response.ok) return { success: false, message: result.detail || "Ошибка модерации идей" };
+    return result;
+  } catch (error) {
+    console.error('Moderate ideas error:', error);
+    return { success: false, message: "Ошибка модерации идей" };
+  }
+};
+
 //Функция для отображения скрытой идеи (админская)
 export const unhideIdea = async (ideaId) => {
   try {
     //Отправляем POST запрос на эндпоинт /admin/idea/{id}/unhide
-    const response = await fetch(`${API_BASE}/admin/idea/${ideaId}/unhide`, {
+    const response = await apiFetch(`${API_BASE}/admin/idea/${ideaId}/unhide`, {
       method: "POST",
     });
     return await response.json();
@@ -378,7 +435,7 @@ export const unhideIdea = async (ideaId) => {
 export const generateRandomUsers = async (count) => {
   try {
     //Отправляем POST запрос на эндпоинт /admin/generate-users с параметром count
-    const response = await fetch(`${API_BASE}/admin/generate-users?count=${count}`, {
+    const response = await apiFetch(`${API_BASE}/admin/generate-users?count=${count}`, {
       method: "POST",
     });
     return await response.json();
@@ -388,11 +445,38 @@ export const generateRandomUsers = async (count) => {
   }
 };
 
+//Функция для массового создания пользователей: логины и пароли скачиваются CSV-файлом
+export const provisionUsersCsv = async (count) => {
+  try {
+    //Отправляем POST запрос на эндпоинт /admin/provision-users, ответ - CSV (id,username,password)
+    const response = await apiFetch(`${API_BASE}/admin/provision-users?count=${count}`, {
+      method: "POST",
+    });
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}));
+      return { success: false, message: error.detail || "Ошибка создания пользователей" };
+    }
+    const blob = await response.blob();
+    const url = URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.setAttribute('href', url);
+    link.setAttribute('download', `users_${new Date().toISOString().split('T')[0]}.csv`);
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    URL.revokeObjectURL(url);
+    return { success: true };
+  } catch (error) {
+    console.error('Provision users error:', error);
+    return { success: false, message: "Ошибка создания пользователей" };
+  }
+};
+
 // НОВАЯ ФУНКЦИЯ: Генерация пользователей с возвратом паролей
 export const generateUsersWithPasswords = async (count) => {
   try {
     // Отправляем POST запрос на новый эндпоинт /admin/generate-users-with-passwords
-    const response = await fetch(`${API_BASE}/admin/generate-users-with-passwords?count=${count}`, {
+    const response = await apiFetch(`${API_BASE}/admin/generate-users-with-passwords?count=${count}`, {
       method: "POST",
     });
     
@@ -427,7 +511,7 @@ export const generateUsersWithPasswords = async (count) => {
 export const hashTempPasswords = async () => {
   try {
     // Отправляем POST запрос на эндпоинт /admin/hash-temp-passwords
-    const response = await fetch(`${API_BASE}/admin/hash-temp-passwords`, {
+    const response = await apiFetch(`${API_BASE}/admin/hash-temp-passwords`, {
       method: "POST",
     });
     
@@ -454,7 +538,7 @@ export const hashTempPasswords = async () => {
 export const getTempPasswordUsers = async () => {
   try {
     // Отправляем GET запрос на эндпоинт /admin/temp-password-users
-    const response = await fetch(`${API_BASE}/admin/temp-password-users`);
+    const response = await apiFetch(`${API_BASE}/admin/temp-password-users`);
     
     if (!response.ok) {
       // Если эндпоинт не найден, возвращаем пустой список
@@ -479,7 +563,7 @@ export const getTempPasswordUsers = async () => {
 export const getCategories = async () => {
   try {
     //Отправляем GET запрос на эндпоинт /categories
-    const response = await fetch(`${API_BASE}/categories`);
+    const response = await apiFetch(`${API_BASE}/categories`);
     if (!response.ok) throw new Error('Network response was not ok');
     return await response.json();
   } catch (error) {
@@ -492,7 +576,7 @@ export const getCategories = async () => {
 export const getAdminCategories = async () => {
   try {
     //Отправляем GET запрос на админский эндпоинт /admin/categories
-    const response = await fetch(`${API_BASE}/admin/categories`);
+    const response = await apiFetch(`${API_BASE}/admin/categories`);
     if (!response.ok) throw new Error('Network response was not ok');
     return await response.json();
   } catch (error) {
@@ -505,7 +589,7 @@ export const getAdminCategories = async () => {
 export const addCategory = async (categoryName) => {
   try {
     //Отправляем POST запрос на эндпоинт /admin/categories
-    const response = await fetch(`${API_BASE}/admin/categories`, {
+    const response = await apiFetch(`${API_BASE}/admin/categories`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
@@ -523,7 +607,7 @@ export const addCategory = async (categoryName) => {
 export const updateCategory = async (oldName, newName) => {
   try {
     //Отправляем PUT запрос на эндпоинт /admin/categories
-    const response = await fetch(`${API_BASE}/admin/categories`, {
+    const response = await apiFetch(`${API_BASE}/admin/categories`, {
       method: "PUT",
       headers: {
         "Content-Type": "application/json",
@@ -541,7 +625,7 @@ export const updateCategory = async (oldName, newName) => {
 export const deleteCategory = async (categoryName) => {
   try {
     //Отправляем DELETE запрос на эндпоинт /admin/categories
-    const response = await fetch(`${API_BASE}/admin/categories`, {
+    const response = await apiFetch(`${API_BASE}/admin/categories`, {
       method: "DELETE",
       headers: {
         "Content-Type": "application/json",
@@ -559,7 +643,7 @@ export const deleteCategory = async (categoryName) => {
 export const checkServerHealth = async () => {
   try {
     //Отправляем GET запрос на эндпоинт /health
-    const response = await fetch(`${API_BASE}/health`);
+    const response = await apiFetch(`${API_BASE}/health`);
     return await response.json();
   } catch (error) {
     console.error('Server health check failed:', error);
@@ -571,7 +655,7 @@ export const checkServerHealth = async () => {
 export const deleteUser = async (userId) => {
   try {
     //Отправляем DELETE запрос на эндпоинт /admin/users/{id}
-    const response = await fetch(`${API_BASE}/admin/users/${userId}`, {
+    const response = await apiFetch(`${API_BASE}/admin/users/${userId}`, {
       method: "DELETE",
     });
     return await response.json();
@@ -585,7 +669,7 @@ export const deleteUser = async (userId) => {
 export const adminRegisterUser = async (username, password, role = "user") => {
   try {
     //Отправляем POST запрос на эндпоинт /admin/register с query параметрами
-    const response = await fetch(`${API_BASE}/admin/register?username=${username}&password=${password}&role=${role}`, {
+    const response = await apiFetch(`${API_BASE}/admin/register?username=${username}&password=${password}&role=${role}`, {
       method: "POST",
     });
     return await response.json();
@@ -599,7 +683,7 @@ export const adminRegisterUser = async (username, password, role = "user") => {
 export const searchIdeas = async (query) => {
   try {
     //Отправляем GET запрос на эндпоинт /admin/ideas/search с параметром query
-    const response = await fetch(`${API_BASE}/admin/ideas/search?query=${encodeURIComponent(query)}`);
+    const response = await apiFetch(`${API_BASE}/admin/ideas/search?query=${encodeURIComponent(query)}`);
     if (!response.ok) throw new Error('Network response was not ok');
     return await response.json();
   } catch (error) {
@@ -612,7 +696,7 @@ export const searchIdeas = async (query) => {
 export const deleteComment = async (ideaId, commentId) => {
   try {
     //Отправляем DELETE запрос на эндпоинт
-    const response = await fetch(`${API_BASE}/admin/idea/${ideaId}/comment/${commentId}`, {
+    const response = await apiFetch(`${API_BASE}/admin/idea/${ideaId}/comment/${commentId}`, {
       method: "DELETE",
     });
     return await response.json();
@@ -626,12 +710,29 @@ export const deleteComment = async (ideaId, commentId) => {
 export const logout = async () => {
   try {
     //Отправляем POST запрос на эндпоинт /logout
-    const response = await fetch(`${API_BASE}/logout`, {
+    const response = await apiFetch(`${API_BASE}/logout`, {
       method: "POST",
     });
+    clearToken();//Сессий на сервере нет - достаточно забыть токен
     return await response.json();
   } catch (error) {
     console.error('Logout error:', error);
     return { success: false, message: "Ошибка выхода из системы" };
   }
-};
\ No newline at end of file
+};
+//Типы событий потока /events
+const IDEA_EVENT_TYPES = [
+  "idea_created", "votes_changed", "comment_added", "comment_deleted",
+  "idea_approved", "idea_hidden", "idea_unhidden", "ideas_deleted", "resync",
+];
+
+//Подписка на живые изменения идей (Server-Sent Events)
+//onEvent(type, data) вызывается на каждое событие; возвращает функцию для отписки
+export const subscribeIdeaEvents = (onEvent) => {
+  //EventSource сам переподключается и присылает Last-Event-ID, чтобы сервер дослал пропущенное
+  const source = new EventSource(`${API_BASE}/events`);
+  IDEA_EVENT_TYPES.forEach((type) => {
+    source.addEventListener(type, (event) => onEvent(type, JSON.parse(event.data)));
+  });
+  return () => source.close();
+};
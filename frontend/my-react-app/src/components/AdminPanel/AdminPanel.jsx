@@ -7,11 +7,16 @@ import {
   deleteUser,
   onRefres,
   generateUsersWithPasswords,  
-  hashTempPasswords            
+  hashTempPasswords,
+  provisionUsersCsv
 } from "../../api/api";
 import styles from './AdminPanel.module.scss';
 import PasswordModal from "../PasswordModal/PasswordModal"; 
 
+//Наибольшее количество пользователей за один запрос и сколько из них еще показывается в модальном окне
+const MAX_GENERATED_USERS = 50000;
+const MAX_MODAL_USERS = 100;
+
 export default function AdminPanel({ users, onBlock, onUnblock, onDelete, onRefresh }) {
   const [userCount, setUserCount] = useState(10);
   const [isGenerating, setIsGenerating] = useState(false);
@@ -46,13 +51,24 @@ export default function AdminPanel({ users, onBlock, onUnblock, onDelete, onRefr
 
   // НОВЫЙ МЕТОД: Генерация пользователей с показом паролей
   const handleGenerateUsersWithPasswords = async () => {
-    if (userCount < 1 || userCount > 100) {
-      alert("Количество пользователей должно быть от 1 до 100");
+    if (userCount < 1 || userCount > MAX_GENERATED_USERS) {
+      alert(`Количество пользователей должно быть от 1 до ${MAX_GENERATED_USERS}`);
       return;
     }
     
     setIsGenerating(true);
     try {
+      //Большую партию не показываем в окне, а сразу скачиваем CSV с логинами и паролями
+      if (userCount > MAX_MODAL_USERS) {
+        const result = await provisionUsersCsv(userCount);
+        if (result.success) {
+          await loadUsers();
+          if (onRefresh) await onRefresh();
+        } else {
+          alert(result.message);
+        }
+        return;
+      }
       // Используем новый API метод
       const result = await generateUsersWithPasswords(userCount);
       if (result.success && result.users) {
@@ -214,7 +230,7 @@ export default function AdminPanel({ users, onBlock, onUnblock, onDelete, onRefr
                 id="userCount"
                 type="number"
                 min="1"
-                max="100"
+                max={MAX_GENERATED_USERS}
                 value={userCount}
                 onChange={(e) => setUserCount(parseInt(e.target.value) || 1)}
                 className={styles.countInput}/>
@@ -228,7 +244,7 @@ export default function AdminPanel({ users, onBlock, onUnblock, onDelete, onRefr
             </button>
           </div>
           <p className={styles.generationHint}>
-            Будут созданы случайные пользователи. Пароли будут показаны в модальном окне перед сохранением.
+            Будут созданы случайные пользователи. До {MAX_MODAL_USERS} пользователей пароли показываются в модальном окне перед сохранением, для большего количества скачивается CSV-файл.
           </p>
         </div>
       </div>
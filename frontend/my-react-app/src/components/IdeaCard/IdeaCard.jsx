@@ -9,7 +9,9 @@ export default function IdeaCard({
   onHide, 
   onUnhide, 
   searchQuery, 
-  onIdeaClick 
+  onIdeaClick,
+  selected = false, //Отмечена ли идея для массовой модерации
+  onSelect //Если передан, на карточке показывается флажок выбора
 }) {
   //Если идея не передана, отображаем сообщение об ошибке
   if (!idea) {
@@ -85,6 +87,15 @@ export default function IdeaCard({
     <div className={cardClass} onClick={handleCardClick} style={{ cursor: 'pointer' }}>
       {/*Шапка карточки с заголовком и ID*/}
       <div className={styles.header}>
+        {onSelect && (
+          <input
+            type="checkbox"
+            checked={selected}
+            onClick={(e) => e.stopPropagation()}
+            onChange={() => onSelect(idea.id)}
+            className={styles.selectBox}
+            title="Выбрать идею"/>
+        )}
         <h3>{renderHighlightedTitle()}</h3>
         <span className={styles.ideaId}>#{idea.id}</span>
       </div>
@@ -120,7 +131,7 @@ export default function IdeaCard({
           <span className={styles.totalRating}>Рейтинг: {getVoteCount()}</span>
         </div>
         <span className={styles.commentsCount}>
-          💬 {Array.isArray(idea.comments) ? idea.comments.length : 0}
+          💬 {idea.comment_count ?? 0}
         </span>
       </div>
       
@@ -13,6 +13,8 @@ import {
   voteIdea,
   addComment,
   deleteComment,
+  getIdeaComments,
+  moderateIdeas,
 } from "../api/api";
 import AdminPanel from "../components/AdminPanel/AdminPanel";
 import CategoryManager from "../components/CategoryManager/CategoryManager";
@@ -43,10 +45,31 @@ export default function AdminDashboard({ user }) {
   const [showModal, setShowModal] = useState(false);
   //Состояние для текста нового комментария
   const [commentText, setCommentText] = useState("");
+  //Идеи, отмеченные для массовой модерации
+  const [selectedIds, setSelectedIds] = useState([]);
+  //Загруженные комментарии открытой идеи (постранично) и курсор следующей страницы
+  const [comments, setComments] = useState({ ideaId: null, items: [], nextCursor: null });
   //Состояние для отслеживания отправки комментария
   const [isSubmittingComment, setIsSubmittingComment] = useState(false);
   const [isTitleExpanded, setIsTitleExpanded] = useState(false);
 
+  //Загрузка комментариев идеи (включая скрытые идеи): без cursor - первая страница, с cursor - продолжение
+  const loadComments = async (ideaId, cursor = null) => {
+    const page = await getIdeaComments(ideaId, cursor, 20, true);
+    setComments(current => ({
+      ideaId,
+      items: cursor && current.ideaId === ideaId ? [...current.items, ...page.comments] : page.comments,
+      nextCursor: page.next_cursor,
+    }));
+  };
+
+  //Комментарии загружаются при открытии идеи
+  useEffect(() => {
+    if (showModal && selectedIdea) {
+      loadComments(selectedIdea.id);
+    }
+  }, [showModal, selectedIdea?.id]);
+
   //Функция обновления списка пользователей
   const refreshUsers = async () => {
     try {
@@ -154,6 +177,7 @@ export default function AdminDashboard({ user }) {
   const handleCloseModal = () => {
     setShowModal(false);
     setSelectedIdea(null);
+    setComments({ ideaId: null, items: [], nextCursor: null });
     setCommentText("");
     setIsTitleExpanded(false);
   };
@@ -195,6 +219,28 @@ export default function AdminDashboard({ user }) {
     }
   };
 
+  //Отметка идеи для массовой модерации
+  const toggleIdeaSelection = (ideaId) => {
+    setSelectedIds(current =>
+      current.includes(ideaId) ? current.filter(id => id !== ideaId) : [...current, ideaId]
+    );
+  };
+
+  //Массовая модерация отмеченных идей одним запросом
+  const handleBulkModeration = async (action) => {
+    const result = await moderateIdeas(action, selectedIds);
+    if (result.success) {
+      const failed = result.results.filter(item => !item.success);
+      setSelectedIds([]);
+      await refreshIdeas();
+      if (failed.length > 0) {
+        alert(`Не удалось обработать идеи: ${failed.map(item => `#${item.idea_id}`).join(", ")}`);
+      }
+    } else {
+      alert(result.message || "Ошибка массовой модерации");
+    }
+  };
+
   //Обработчик одобрения идеи
   const handleApproveIdea = async (ideaId) => {
     const result = await approveIdea(ideaId);
@@ -261,6 +307,7 @@ export default function AdminDashboard({ user }) {
       const result = await addComment(selectedIdea.id, user.id, commentText);
       if (result.success) {
         setCommentText("");
+        await loadComments(selectedIdea.id);
         await refreshIdeas();
         const result = await getAdminIdeasWithAuthors();
         if (result.success) {
@@ -289,6 +336,7 @@ export default function AdminDashboard({ user }) {
     try {
       const result = await deleteComment(selectedIdea.id, commentId);
       if (result.success) {
+        await loadComments(selectedIdea.id);
         await refreshIdeas();
         const result = await getAdminIdeasWithAuthors();
         if (result.success) {
@@ -399,6 +447,22 @@ export default function AdminDashboard({ user }) {
           <section className={styles.section}>
             <div className={styles.ideasHeader}>
               <h2>Управление идеями</h2>
+              {/*Массовая модерация отмеченных идей*/}
+              <div className={styles.bulkActions}>
+                {selectedIds.length > 0 ? (
+                  <>
+                    <span>Выбрано: {selectedIds.length}</span>
+                    <button onClick={() => handleBulkModeration("approve")} className={styles.approveBtn}>Одобрить</button>
+                    <button onClick={() => handleBulkModeration("hide")} className={styles.hideBtn}>Скрыть</button>
+                    <button onClick={() => handleBulkModeration("unhide")} className={styles.showBtn}>Показать</button>
+                    <button onClick={() => setSelectedIds([])} className={styles.clearSelectionBtn}>Снять выбор</button>
+                  </>
+                ) : ideas.length > 0 && (
+                  <button onClick={() => setSelectedIds(ideas.map(idea => idea.id))} className={styles.clearSelectionBtn}>
+                    Выбрать все
+                  </button>
+                )}
+              </div>
             </div>
             
             {/* Поисковая строка */}
@@ -471,6 +535,8 @@ export default function AdminDashboard({ user }) {
                     onUnhide={handleUnhideIdea}
                     searchQuery={searchQuery}
                     onIdeaClick={handleIdeaClick}
+                    selected={selectedIds.includes(idea.id)}
+                    onSelect={toggleIdeaSelection}
                   />
                 ))}
               </div>
@@ -609,18 +675,18 @@ export default function AdminDashboard({ user }) {
                   <span className={styles.statLabel}>Рейтинг</span>
                 </div>
                 <div className={styles.stat}>
-                  <span className={styles.statValue}> {Array.isArray(selectedIdea.comments) ? selectedIdea.comments.length : 0}</span>
+                  <span className={styles.statValue}> {selectedIdea.comment_count ?? 0}</span>
                   <span className={styles.statLabel}>Комментарии</span>
                 </div>
               </div>
 
               {/*Секция комментариев*/}
               <div className={styles.commentsSection}>
-                <h3>Комментарии ({Array.isArray(selectedIdea.comments) ? selectedIdea.comments.length : 0})</h3>
+                <h3>Комментарии ({selectedIdea.comment_count ?? 0})</h3>
                 
-                {Array.isArray(selectedIdea.comments) && selectedIdea.comments.length > 0 ? (
+                {comments.items.length > 0 ? (
                   <div className={styles.commentsList}>
-                    {selectedIdea.comments.map((comment) => (
+                    {comments.items.map((comment) => (
                       <div key={`comment-${comment.id}-${selectedIdea.id}`} className={styles.comment}>
                         <div className={styles.commentMeta}>
                           <div>
@@ -639,6 +705,13 @@ export default function AdminDashboard({ user }) {
                         <p className={styles.commentText}>{comment.text}</p>
                       </div>
                     ))}
+                    {comments.nextCursor && (
+                      <button
+                        onClick={() => loadComments(selectedIdea.id, comments.nextCursor)}
+                        className={styles.loadMoreCommentsBtn}>
+                        Показать ещё
+                      </button>
+                    )}
                   </div>
                 ) : (
                   <p className={styles.noComments}>Пока нет комментариев</p>
@@ -1,9 +1,65 @@
 import { useEffect, useState } from "react";
-import { getIdeas, voteIdea, addComment, getCategories, deleteComment } from "../api/api";
+import { getIdeas, voteIdea, addComment, getCategories, deleteComment, getIdeaComments, subscribeIdeaEvents } from "../api/api";
 import IdeaCard from "../components/IdeaCard/IdeaCard";
 import IdeaForm from "../components/IdeaForm/IdeaForm";
 import styles from "./Home.module.scss";
 
+//Подходит ли идея под фильтр списка (open - только неодобренные, approved - только одобренные)
+const matchesFilter = (idea, filter) => {
+  if (filter === "approved") return idea.is_approved;
+  if (filter === "open") return !idea.is_approved;
+  return true;
+};
+
+//Применение события с сервера к списку идей (возвращает новый список);
+//filter - фильтр списка: идеи, которые под него не подходят, в список не добавляются
+const applyIdeaEvent = (ideas, type, data, filter = "all") => {
+  const updateIdea = (ideaId, update) =>
+    ideas.map(idea => idea.id === ideaId ? { ...idea, ...update(idea) } : idea);
+
+  switch (type) {
+    case "idea_created":
+    case "idea_unhidden":
+      if (!matchesFilter(data.idea, filter)) return ideas;
+      return ideas.some(idea => idea.id === data.idea.id) ? ideas : [...ideas, data.idea];
+    case "votes_changed":
+      return updateIdea(data.idea_id, (idea) => ({
+        votes_for: data.votes_for,
+        votes_against: data.votes_against,
+        voted_users: (idea.voted_users || []).includes(data.user_id)
+          ? idea.voted_users
+          : [...(idea.voted_users || []), data.user_id],
+      }));
+    case "comment_added":
+    case "comment_deleted":
+      return updateIdea(data.idea_id, () => ({ comment_count: data.comment_count }));
+    case "idea_approved":
+      //Одобренная идея уходит из списка открытых
+      if (filter === "open") return ideas.filter(idea => idea.id !== data.idea_id);
+      return updateIdea(data.idea_id, () => ({ is_approved: true }));
+    case "idea_hidden":
+      return ideas.filter(idea => idea.id !== data.idea_id);
+    case "ideas_deleted":
+      return ideas.filter(idea => !data.idea_ids.includes(idea.id));
+    default:
+      return ideas;
+  }
+};
+
+//Применение события к загруженным комментариям открытой идеи
+const applyCommentEvent = (comments, type, data) => {
+  if (data.idea_id !== comments.ideaId) return comments;
+  if (type === "comment_added") {
+    //Новый комментарий дописываем в конец, только если все более ранние уже загружены
+    if (comments.nextCursor || comments.items.some(c => c.id === data.comment.id)) return comments;
+    return { ...comments, items: [...comments.items, data.comment] };
+  }
+  if (type === "comment_deleted") {
+    return { ...comments, items: comments.items.filter(c => c.id !== data.comment_id) };
+  }
+  return comments;
+};
+
 //Главный компонент домашней страницы (список идей)
 export default function Home({ user }) {
   //Состояние для хранения списка идей
@@ -20,6 +76,8 @@ export default function Home({ user }) {
   const [showModal, setShowModal] = useState(false);
   //Состояние для текста нового комментария
   const [commentText, setCommentText] = useState("");
+  //Загруженные комментарии открытой идеи (постранично) и курсор следующей страницы
+  const [comments, setComments] = useState({ ideaId: null, items: [], nextCursor: null });
   //Состояние для отслеживания отправки комментария
   const [isSubmittingComment, setIsSubmittingComment] = useState(false);
   //Состояние для отслеживания загрузки категорий
@@ -49,6 +107,23 @@ export default function Home({ user }) {
     }
   };
 
+  //Загрузка комментариев идеи: без cursor - первая страница, с cursor - следующая страница в конец списка
+  const loadComments = async (ideaId, cursor = null) => {
+    const page = await getIdeaComments(ideaId, cursor);
+    setComments(current => ({
+      ideaId,
+      items: cursor && current.ideaId === ideaId ? [...current.items, ...page.comments] : page.comments,
+      nextCursor: page.next_cursor,
+    }));
+  };
+
+  //Комментарии загружаются при открытии идеи
+  useEffect(() => {
+    if (showModal && selectedIdea) {
+      loadComments(selectedIdea.id);
+    }
+  }, [showModal, selectedIdea?.id]);
+
   //Функция обновления списка идей
   const refresh = async () => {
     try {
@@ -65,6 +140,21 @@ export default function Home({ user }) {
     refresh();
   }, [filter]);
 
+  //Живое обновление: голоса, комментарии и новые идеи приходят с сервера без перезагрузки списка
+  useEffect(() => {
+    const unsubscribe = subscribeIdeaEvents((type, data) => {
+      if (type === "resync") {
+        refresh(); //Часть событий пропущена - загружаем список заново
+        return;
+      }
+      setIdeas(current => applyIdeaEvent(current, type, data, filter));
+      //Открытая в модальном окне идея тоже обновляется (но не закрывается, если ее скрыли)
+      setSelectedIdea(current => current && (applyIdeaEvent([current], type, data)[0] || current));
+      setComments(current => applyCommentEvent(current, type, data));
+    });
+    return unsubscribe;
+  }, [filter]);
+
   //Функция для сортировки идей по популярности
   const getPopularIdeas = () => {
     return [...ideas].sort((a, b) => {
@@ -111,6 +201,7 @@ const handleOpenModal = (idea) => {
   const handleCloseModal = () => {
     setShowModal(false);
     setSelectedIdea(null);
+    setComments({ ideaId: null, items: [], nextCursor: null });
     setCommentText("");
   };
 
@@ -158,6 +249,7 @@ const handleOpenModal = (idea) => {
       const result = await addComment(selectedIdea.id, user.id, commentText);
       if (result.success) {
         setCommentText("");
+        await loadComments(selectedIdea.id);
         await refresh();
         const updatedIdeas = await getIdeas(filter);
         const updatedIdea = updatedIdeas.find(idea => idea.id === selectedIdea.id);
@@ -184,6 +276,7 @@ const handleOpenModal = (idea) => {
     try {
       const result = await deleteComment(selectedIdea.id, commentId);
       if (result.success) {
+        await loadComments(selectedIdea.id);
         await refresh();
         const updatedIdeas = await getIdeas(filter);
         const updatedIdea = updatedIdeas.find(idea => idea.id === selectedIdea.id);
@@ -393,18 +486,18 @@ const handleOpenModal = (idea) => {
                   <span className={styles.statLabel}>Рейтинг</span>
                 </div>
                 <div className={styles.stat}>
-                  <span className={styles.statValue}> {Array.isArray(selectedIdea.comments) ? selectedIdea.comments.length : 0}</span>
+                  <span className={styles.statValue}> {selectedIdea.comment_count ?? 0}</span>
                   <span className={styles.statLabel}>Комментарии</span>
                 </div>
               </div>
 
               {/*Секция комментариев*/}
               <div className={styles.commentsSection}>
-                <h3>Комментарии ({Array.isArray(selectedIdea.comments) ? selectedIdea.comments.length : 0})</h3>
+                <h3>Комментарии ({selectedIdea.comment_count ?? 0})</h3>
                 
-                {Array.isArray(selectedIdea.comments) && selectedIdea.comments.length > 0 ? (
+                {comments.items.length > 0 ? (
                   <div className={styles.commentsList}>
-                    {selectedIdea.comments.map((comment) => (
+                    {comments.items.map((comment) => (
                       <div key={comment.id} className={styles.comment}>
                         <div className={styles.commentMeta}>
                           <div>
@@ -425,6 +518,13 @@ const handleOpenModal = (idea) => {
                         <p className={styles.commentText}>{comment.text}</p>
                       </div>
                     ))}
+                    {comments.nextCursor && (
+                      <button
+                        onClick={() => loadComments(selectedIdea.id, comments.nextCursor)}
+                        className={styles.loadMoreCommentsBtn}>
+                        Показать ещё
+                      </button>
+                    )}
                   </div>
                 ) : (
                   <p className={styles.noComments}>Пока нет комментариев</p>